@@ -7,19 +7,469 @@ Nehir Gürsoy 122200051
 import streamlit as st
 import sqlite3
 import pandas as pd
+import numpy as np
+import altair as alt
 from datetime import datetime, date, timedelta
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+import argparse
+import bisect
+import configparser
+import csv
+import heapq
+import json
+import logging
 import os
+import queue
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import weakref
+
+# CONFIGURATION
+
+# Every setting can come from the [database] section of gym_config.ini (or the
+# file named by GYM_CONFIG) and be overridden by a GYM_<SETTING> env variable.
+CONFIG_FILE = os.environ.get('GYM_CONFIG', 'gym_config.ini')
+
+logger = logging.getLogger('gym_management')
+
+DEFAULT_CONFIG = {
+    'db_path': 'gym_management.db',
+    'pool_size': 4,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size_kb': 65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+    'busy_timeout_ms': 5000,
+    # Seconds between background membership expiry runs; 0 leaves it to cron
+    'expiry_interval_seconds': 0,
+    # Seconds between background change log prunes; 0 leaves it to cron (changes --prune)
+    'change_log_prune_interval_seconds': 300,
+    # Statements slower than this are logged with their query plan
+    'slow_query_ms': 200,
+    # Latest timings kept per statement for the percentiles
+    'query_stats_window': 1000,
+    # Days ahead that Class_Sessions are generated, i.e. how far ahead bookings are open
+    'session_window_days': 56,
+}
+
+ALLOWED_PRAGMA_VALUES = {
+    'journal_mode': ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'),
+    'synchronous': ('OFF', 'NORMAL', 'FULL', 'EXTRA'),
+    'temp_store': ('DEFAULT', 'FILE', 'MEMORY'),
+}
+
+def load_config(path=CONFIG_FILE):
+    """Build the startup configuration: defaults < config file < environment"""
+    config = dict(DEFAULT_CONFIG)
+
+    if path and os.path.exists(path):
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        if parser.has_section('database'):
+            for key, value in parser.items('database'):
+                if key in config:
+                    config[key] = value
+
+    for key in config:
+        env_value = os.environ.get(f'GYM_{key.upper()}')
+        if env_value is not None:
+            config[key] = env_value
+
+    for key, default in DEFAULT_CONFIG.items():
+        if isinstance(default, int):
+            config[key] = int(config[key])
+    for key, allowed in ALLOWED_PRAGMA_VALUES.items():
+        config[key] = str(config[key]).upper()
+        if config[key] not in allowed:
+            raise ValueError(f"Invalid {key} '{config[key]}' (expected one of {', '.join(allowed)})")
+    return config
+
+CONFIG = load_config()
+
+def apply_pragmas(conn, config):
+    """Per-connection tuning; journal_mode=WAL is persistent, the rest are not"""
+    conn.execute(f"PRAGMA busy_timeout = {config['busy_timeout_ms']}")
+    conn.execute(f"PRAGMA journal_mode = {config['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {config['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = -{config['cache_size_kb']}")
+    conn.execute(f"PRAGMA mmap_size = {config['mmap_size']}")
+    conn.execute(f"PRAGMA temp_store = {config['temp_store']}")
+    conn.execute('PRAGMA foreign_keys = ON')
+
+# The settings apply_pragmas reads, i.e. everything a pooled connection depends on
+PRAGMA_SETTINGS = ('busy_timeout_ms', 'journal_mode', 'synchronous', 'cache_size_kb', 'mmap_size', 'temp_store')
+
+def pragma_key(config):
+    """Hashable snapshot of the connection settings in config"""
+    return tuple((name, config[name]) for name in PRAGMA_SETTINGS)
+
+# QUERY INSTRUMENTATION
+
+# Literals are masked so the same statement with different values is counted once
+QUERY_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?, ...)'),
+    (re.compile(r'\s+'), ' '),
+]
+SLOW_QUERY_LOG_SIZE = 50
+EXPLAINABLE_STATEMENTS = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+# Walking the stack for the calling function is costly, so only every Nth
+# statement on a connection records it
+QUERY_CALLER_SAMPLE = 20
+# Frames skipped when looking for the app function that issued a query
+INSTRUMENTATION_FRAMES = {'_start', 'execute', 'executemany', 'cursor', 'run_query'}
+
+@lru_cache(maxsize=2048)
+def query_fingerprint(sql):
+    """Statement text with literals, IN lists and whitespace normalised"""
+    for pattern, replacement in QUERY_FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+def _query_caller():
+    # Nearest function of this module outside the instrumentation (and pandas)
+    frame = sys._getframe(1)
+    this_file = frame.f_code.co_filename
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename == this_file and code.co_name not in INSTRUMENTATION_FRAMES:
+            return f'{code.co_name}:{frame.f_lineno}'
+        frame = frame.f_back
+    return '?'
+
+
+class QueryStats:
+    """Rolling per-statement timings, shared by every pooled connection"""
+
+    def __init__(self, window):
+        self._lock = threading.Lock()
+        self.window = window
+        self.statements = {}
+        self.slow = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self.since = datetime.now()
+
+    def record(self, fingerprint, ms, rows, caller):
+        with self._lock:
+            entry = self.statements.get(fingerprint)
+            if entry is None:
+                entry = self.statements[fingerprint] = {
+                    'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                    'samples': deque(maxlen=self.window), 'callers': {},
+                }
+            entry['calls'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['rows'] += rows
+            entry['samples'].append(ms)
+            if caller is not None:
+                entry['callers'][caller] = entry['callers'].get(caller, 0) + 1
+
+    def record_slow(self, slow_query):
+        with self._lock:
+            self.slow.append(slow_query)
+
+    def summary(self):
+        """One row per statement, most total time first; percentiles cover the last `window` calls"""
+        with self._lock:
+            entries = [(fingerprint, dict(entry, samples=list(entry['samples']), callers=dict(entry['callers'])))
+                       for fingerprint, entry in self.statements.items()]
+        rows = []
+        for fingerprint, entry in entries:
+            samples = entry['samples']
+            cuts = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+            rows.append({
+                'Statement': fingerprint,
+                'Calls': entry['calls'],
+                'Total_ms': round(entry['total_ms'], 1),
+                'p50_ms': round(cuts[49], 3),
+                'p95_ms': round(cuts[94], 3),
+                'p99_ms': round(cuts[98], 3),
+                'Max_ms': round(entry['max_ms'], 3),
+                'Avg_Rows': round(entry['rows'] / entry['calls'], 1),
+                'Top_Caller': max(entry['callers'], key=entry['callers'].get) if entry['callers'] else '?',
+            })
+        rows.sort(key=lambda row: row['Total_ms'], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self.statements = {}
+            self.slow.clear()
+            self.since = datetime.now()
+
+
+@st.cache_resource
+def _shared_query_stats(window):
+    return QueryStats(window)
+
+def get_query_stats():
+    return _shared_query_stats(CONFIG['query_stats_window'])
+
+def _explain(conn, sql, parameters):
+    if not sql.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS):
+        return []
+    try:
+        # A plain cursor, so the EXPLAIN itself is not recorded
+        cursor = sqlite3.Cursor(conn)
+        return [row[3] for row in cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+    except sqlite3.Error:
+        return []
+
+def record_query(conn, sql, parameters, ms, rows, caller, many=False, explain=True):
+    fingerprint = query_fingerprint(sql)
+    stats = conn.query_stats
+    stats.record(fingerprint, ms, rows, caller)
+    if ms < CONFIG['slow_query_ms']:
+        return
+    plan = _explain(conn, sql, parameters) if explain and not many else []
+    stats.record_slow({'at': datetime.now().isoformat(timespec='seconds'), 'statement': fingerprint,
+                       'ms': round(ms, 1), 'rows': rows, 'caller': caller or '?', 'plan': plan})
+    logger.warning("Slow query (%.1fms, %d rows) from %s: %s%s", ms, rows, caller, fingerprint,
+                   ''.join(f'\n    {line}' for line in plan))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Times each statement from execute() until its rows have been read.
+
+    The timing is recorded when the cursor runs its next statement, is closed
+    or its connection goes back to the pool, so lazily iterated results are
+    included. A cursor collected before then records its timing without a
+    query plan: the connection may already belong to another thread.
+    """
+
+    _pending = None
+
+    def _start(self, sql, parameters, many):
+        self._finish()
+        conn = self.connection
+        conn.statements += 1
+        caller = _query_caller() if conn.statements % QUERY_CALLER_SAMPLE == 1 else None
+        self._pending = [sql, None if many else parameters, 0.0, 0, caller, many]
+        conn.open_cursors.add(self)
+
+    def _timed(self, started, rows=0):
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - started
+            self._pending[3] += rows
+
+    def _finish(self, explain=True):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, parameters, seconds, rows, caller, many = pending
+        if not rows and self.rowcount > 0:
+            rows = self.rowcount
+        record_query(self.connection, sql, parameters or (), seconds * 1000, rows, caller, many, explain)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters, False)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._timed(started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None, True)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._timed(started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._timed(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._timed(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._timed(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._timed(started)
+            raise
+        self._timed(started, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish(explain=False)
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose statements (including pandas reads) go through InstrumentedCursor"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Held directly so recording a statement skips the cache_resource lookup
+        self.query_stats = get_query_stats()
+        self.statements = 0
+        self.open_cursors = weakref.WeakSet()
+
+    def finish_statements(self):
+        """Record every statement still pending; call before handing the connection back"""
+        cursors, self.open_cursors = list(self.open_cursors), weakref.WeakSet()
+        for cursor in cursors:
+            cursor._finish()
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
 
 # DATABASE SETUP & CONNECTION
 
+DB_PATH = CONFIG['db_path']
+POOL_SIZE = CONFIG['pool_size']
+
+_local = threading.local()
+
+
+class ConnectionPool:
+    """Small bounded pool of long-lived SQLite connections shared by all sessions"""
+
+    def __init__(self, db_path, size=POOL_SIZE, config=None):
+        self.db_path = db_path
+        self.size = size
+        self.config = dict(config or CONFIG)
+        self.stats = {'opened': 0, 'checkouts': 0}
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.config['busy_timeout_ms'] / 1000,
+                               check_same_thread=False, factory=InstrumentedConnection)
+        apply_pragmas(conn, self.config)
+        with self._lock:
+            self._connections.append(conn)
+            self.stats['opened'] += 1
+        return conn
+
+    def acquire(self):
+        self._slots.acquire()
+        with self._lock:
+            self.stats['checkouts'] += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._open()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def release(self, conn):
+        self._idle.put(conn)
+        self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._idle = queue.LifoQueue()
+
+
+@st.cache_resource
+def _shared_pool(db_path, size, pragmas):
+    # Streamlit re-executes this script on every rerun, so module globals are
+    # rebuilt each time; cache_resource keeps one pool alive for the process.
+    # Keyed on scalars and a tuple so the cache lookup hashes next to nothing.
+    return ConnectionPool(db_path, size, dict(pragmas))
+
+# Pool for the current settings; checkouts use this and skip the cache lookup
+_pool = None
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = _shared_pool(DB_PATH, POOL_SIZE, pragma_key(CONFIG))
+    return _pool
+
+@contextmanager
 def get_connection():
-    conn = sqlite3.connect('gym_management.db', check_same_thread=False)
-    return conn
+    """Borrow a pooled connection; commits on success, rolls back on error.
 
-def create_tables():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+    Nested calls on the same thread reuse the outer connection, so helpers can
+    be composed into one transaction (only the outermost block commits).
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+
+    pool = get_pool()
+    conn = pool.acquire()
+    _local.conn = conn
+    _local.written_tables = set()
+    try:
+        yield conn
+        conn.commit()
+        # Bump cache generations only once the write is visible to readers
+        _bump_generations(_local.written_tables)
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _local.conn = None
+        _local.written_tables = set()
+        try:
+            conn.finish_statements()
+        finally:
+            pool.release(conn)
+
+def configure(**overrides):
+    """Override settings at startup (CLI flags, benchmarks) before the pool is used"""
+    global CONFIG, DB_PATH, POOL_SIZE, _pool
+    CONFIG = dict(CONFIG, **{k: v for k, v in overrides.items() if v is not None})
+    DB_PATH = CONFIG['db_path']
+    POOL_SIZE = CONFIG['pool_size']
+    _pool = None
+    return CONFIG
+
+def connection_stats():
+    """Snapshot of connections opened / checked out by the shared pool"""
+    pool = get_pool()
+    with pool._lock:
+        return dict(pool.stats)
+
+def _create_tables(cursor):
     # Table 1: MEMBERS
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS Members (
@@ -103,18 +553,16 @@ def create_tables():
         UNIQUE(Member_ID, Class_ID, Booking_Date)
     )
     ''')
-    
-    conn.commit()
-    conn.close()
 
 def insert_sample_data():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _insert_sample_data(cursor)
+
+def _insert_sample_data(cursor):
     cursor.execute("SELECT COUNT(*) FROM Members")
     if cursor.fetchone()[0] > 0:
-        conn.close()
-        return  
+        return
     
     # Sample Members (5+)
     members = [
@@ -183,251 +631,3452 @@ def insert_sample_data():
         (2, 5, '2024-11-22', 'Booked'),
     ]
     cursor.executemany('INSERT INTO Class_Bookings (Member_ID, Class_ID, Booking_Date, Attendance_Status) VALUES (?, ?, ?, ?)', bookings)
-    
+
+# INDEXES
+
+INDEXES = [
+    ('idx_member_memberships_member_active', 'Member_Memberships', 'Member_ID, Is_Active'),
+    ('idx_member_memberships_plan', 'Member_Memberships', 'Plan_ID'),
+    ('idx_member_memberships_end_date', 'Member_Memberships', 'End_Date'),
+    ('idx_class_bookings_class_date', 'Class_Bookings', 'Class_ID, Booking_Date'),
+    ('idx_class_bookings_date', 'Class_Bookings', 'Booking_Date'),
+    ('idx_class_bookings_status', 'Class_Bookings', 'Attendance_Status'),
+    ('idx_classes_trainer', 'Classes', 'Trainer_ID'),
+]
+
+def _create_indexes(cursor):
+    for name, table, columns in INDEXES:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+def explain_query_plan(query, params=()):
+    """Detail lines of EXPLAIN QUERY PLAN for a query"""
+    with get_connection() as conn:
+        return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params)]
+
+def _create_member_name_index(cursor):
+    # Lets the typeahead member search walk Members in name order and stop at LIMIT
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_members_name ON Members (Last_Name, First_Name)')
+
+def _create_seat_counts(cursor):
+    # One row per (class, date) holding the seats taken by non-cancelled bookings.
+    # Triggers keep it in step with Class_Bookings however a booking is written.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Class_Seat_Counts (
+        Class_ID INTEGER NOT NULL,
+        Booking_Date DATE NOT NULL,
+        Booked_Count INTEGER NOT NULL DEFAULT 0 CHECK(Booked_Count >= 0),
+        PRIMARY KEY (Class_ID, Booking_Date),
+        FOREIGN KEY (Class_ID) REFERENCES Classes(Class_ID) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_class_bookings_seat_insert
+    AFTER INSERT ON Class_Bookings
+    WHEN NEW.Attendance_Status != 'Cancelled'
+    BEGIN
+        INSERT INTO Class_Seat_Counts (Class_ID, Booking_Date, Booked_Count)
+        VALUES (NEW.Class_ID, NEW.Booking_Date, 1)
+        ON CONFLICT (Class_ID, Booking_Date) DO UPDATE SET Booked_Count = Booked_Count + 1;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_class_bookings_seat_delete
+    AFTER DELETE ON Class_Bookings
+    WHEN OLD.Attendance_Status != 'Cancelled'
+    BEGIN
+        UPDATE Class_Seat_Counts SET Booked_Count = Booked_Count - 1
+        WHERE Class_ID = OLD.Class_ID AND Booking_Date = OLD.Booking_Date;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_class_bookings_seat_update
+    AFTER UPDATE OF Class_ID, Booking_Date, Attendance_Status ON Class_Bookings
+    BEGIN
+        UPDATE Class_Seat_Counts SET Booked_Count = Booked_Count - 1
+        WHERE OLD.Attendance_Status != 'Cancelled'
+          AND Class_ID = OLD.Class_ID AND Booking_Date = OLD.Booking_Date;
+        INSERT INTO Class_Seat_Counts (Class_ID, Booking_Date, Booked_Count)
+        SELECT NEW.Class_ID, NEW.Booking_Date, 1 WHERE NEW.Attendance_Status != 'Cancelled'
+        ON CONFLICT (Class_ID, Booking_Date) DO UPDATE SET Booked_Count = Booked_Count + 1;
+    END
+    ''')
+    cursor.execute('''
+    INSERT OR REPLACE INTO Class_Seat_Counts (Class_ID, Booking_Date, Booked_Count)
+    SELECT Class_ID, Booking_Date, COUNT(*) FROM Class_Bookings
+    WHERE Attendance_Status != 'Cancelled'
+    GROUP BY Class_ID, Booking_Date
+    ''')
+
+def _create_waitlist(cursor):
+    # Waitlist_ID is AUTOINCREMENT, so it doubles as the FIFO position
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Waitlist (
+        Waitlist_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Member_ID INTEGER NOT NULL,
+        Class_ID INTEGER NOT NULL,
+        Booking_Date DATE NOT NULL,
+        Added_At TEXT NOT NULL,
+        FOREIGN KEY (Member_ID) REFERENCES Members(Member_ID) ON DELETE CASCADE,
+        FOREIGN KEY (Class_ID) REFERENCES Classes(Class_ID) ON DELETE CASCADE,
+        UNIQUE(Member_ID, Class_ID, Booking_Date)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_waitlist_queue ON Waitlist (Class_ID, Booking_Date, Waitlist_ID)')
+
+def _create_job_watermarks(cursor):
+    # How far each incremental job has got, so the next run starts from there
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Job_Watermarks (
+        Job_Name TEXT PRIMARY KEY,
+        Watermark TEXT NOT NULL,
+        Updated_At TEXT NOT NULL
+    )
+    ''')
+
+def _create_check_ins(cursor):
+    # Append-only turnstile log, refused attempts included
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Check_Ins (
+        Check_In_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Member_ID INTEGER NOT NULL,
+        Checked_In_At TEXT NOT NULL,
+        Admitted INTEGER NOT NULL CHECK(Admitted IN (0, 1)),
+        Reason TEXT,
+        FOREIGN KEY (Member_ID) REFERENCES Members(Member_ID) ON DELETE CASCADE
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_check_ins_member ON Check_Ins (Member_ID, Checked_In_At)')
+
+def _create_change_log(cursor):
+    # Every insert/update/delete on the six core tables appends (table, rowid, op);
+    # Seq is AUTOINCREMENT so it is never reused, even after pruning.
+    # The table list is spelled out here, not shared, because a released
+    # migration must not change behaviour later.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Change_Log (
+        Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        Table_Name TEXT NOT NULL,
+        Row_ID INTEGER NOT NULL,
+        Op TEXT NOT NULL CHECK(Op IN ('I', 'U', 'D'))
+    )
+    ''')
+    tables = [
+        ('Members', 'Member_ID'),
+        ('Membership_Plans', 'Plan_ID'),
+        ('Member_Memberships', 'Membership_Record_ID'),
+        ('Trainers', 'Trainer_ID'),
+        ('Classes', 'Class_ID'),
+        ('Class_Bookings', 'Booking_ID'),
+    ]
+    for table_name, id_column in tables:
+        for event, op, row in (('INSERT', 'I', 'NEW'), ('UPDATE', 'U', 'NEW'), ('DELETE', 'D', 'OLD')):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table_name.lower()}_log_{event.lower()}
+            AFTER {event} ON {table_name}
+            BEGIN
+                INSERT INTO Change_Log (Table_Name, Row_ID, Op) VALUES ('{table_name}', {row}.{id_column}, '{op}');
+            END
+            ''')
+
+def _create_workload_summaries(cursor):
+    # Summary rows the workload and utilization reports read by primary key
+    # instead of aggregating Classes / Class_Bookings on every visit.
+    # Trainer_Workload: a trainer's row is recomputed from their classes
+    # (idx_classes_trainer) whenever one of those classes changes.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Trainer_Workload (
+        Trainer_ID INTEGER PRIMARY KEY,
+        Class_Count INTEGER NOT NULL DEFAULT 0,
+        Weekly_Minutes INTEGER NOT NULL DEFAULT 0,
+        Class_Names TEXT,
+        FOREIGN KEY (Trainer_ID) REFERENCES Trainers(Trainer_ID) ON DELETE CASCADE
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_trainers_workload_insert
+    AFTER INSERT ON Trainers
+    BEGIN
+        INSERT OR IGNORE INTO Trainer_Workload (Trainer_ID) VALUES (NEW.Trainer_ID);
+    END
+    ''')
+    recompute = '''
+        INSERT INTO Trainer_Workload (Trainer_ID, Class_Count, Weekly_Minutes, Class_Names)
+        SELECT {row}.Trainer_ID, COUNT(*), COALESCE(SUM(Duration_Minutes), 0), GROUP_CONCAT(Class_Name, ', ')
+        FROM Classes WHERE Trainer_ID = {row}.Trainer_ID{condition}
+        ON CONFLICT (Trainer_ID) DO UPDATE SET
+            Class_Count = excluded.Class_Count,
+            Weekly_Minutes = excluded.Weekly_Minutes,
+            Class_Names = excluded.Class_Names;
+    '''
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_classes_workload_insert
+    AFTER INSERT ON Classes
+    BEGIN
+        {recompute.format(row='NEW', condition='')}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_classes_workload_delete
+    AFTER DELETE ON Classes
+    BEGIN
+        {recompute.format(row='OLD', condition='')}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_classes_workload_update
+    AFTER UPDATE OF Trainer_ID, Class_Name, Duration_Minutes ON Classes
+    BEGIN
+        {recompute.format(row='OLD', condition=' AND OLD.Trainer_ID != NEW.Trainer_ID')}
+        {recompute.format(row='NEW', condition='')}
+    END
+    ''')
+    cursor.execute('''
+    INSERT OR REPLACE INTO Trainer_Workload (Trainer_ID, Class_Count, Weekly_Minutes, Class_Names)
+    SELECT t.Trainer_ID, COUNT(c.Class_ID), COALESCE(SUM(c.Duration_Minutes), 0), GROUP_CONCAT(c.Class_Name, ', ')
+    FROM Trainers t
+    LEFT JOIN Classes c ON c.Trainer_ID = t.Trainer_ID
+    GROUP BY t.Trainer_ID
+    ''')
+
+    # Class_Weekly_Utilization: booking counters per class per week (weeks start
+    # on Monday), moved by +/-1 deltas like Class_Seat_Counts. Bookings counts
+    # every booking that was not cancelled.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Class_Weekly_Utilization (
+        Week_Start DATE NOT NULL,
+        Class_ID INTEGER NOT NULL,
+        Bookings INTEGER NOT NULL DEFAULT 0,
+        Attended INTEGER NOT NULL DEFAULT 0,
+        No_Shows INTEGER NOT NULL DEFAULT 0,
+        Cancellations INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (Week_Start, Class_ID),
+        FOREIGN KEY (Class_ID) REFERENCES Classes(Class_ID) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_class_utilization_class ON Class_Weekly_Utilization (Class_ID, Week_Start)')
+    add = '''
+        INSERT INTO Class_Weekly_Utilization (Week_Start, Class_ID, Bookings, Attended, No_Shows, Cancellations)
+        VALUES (date(NEW.Booking_Date, '-6 days', 'weekday 1'), NEW.Class_ID,
+                NEW.Attendance_Status != 'Cancelled', NEW.Attendance_Status = 'Attended',
+                NEW.Attendance_Status = 'No-Show', NEW.Attendance_Status = 'Cancelled')
+        ON CONFLICT (Week_Start, Class_ID) DO UPDATE SET
+            Bookings = Bookings + excluded.Bookings,
+            Attended = Attended + excluded.Attended,
+            No_Shows = No_Shows + excluded.No_Shows,
+            Cancellations = Cancellations + excluded.Cancellations;
+    '''
+    remove = '''
+        UPDATE Class_Weekly_Utilization SET
+            Bookings = Bookings - (OLD.Attendance_Status != 'Cancelled'),
+            Attended = Attended - (OLD.Attendance_Status = 'Attended'),
+            No_Shows = No_Shows - (OLD.Attendance_Status = 'No-Show'),
+            Cancellations = Cancellations - (OLD.Attendance_Status = 'Cancelled')
+        WHERE Week_Start = date(OLD.Booking_Date, '-6 days', 'weekday 1') AND Class_ID = OLD.Class_ID;
+    '''
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_class_bookings_utilization_insert
+    AFTER INSERT ON Class_Bookings
+    BEGIN
+        {add}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_class_bookings_utilization_delete
+    AFTER DELETE ON Class_Bookings
+    BEGIN
+        {remove}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_class_bookings_utilization_update
+    AFTER UPDATE OF Class_ID, Booking_Date, Attendance_Status ON Class_Bookings
+    BEGIN
+        {remove}
+        {add}
+    END
+    ''')
+    cursor.execute('''
+    INSERT OR REPLACE INTO Class_Weekly_Utilization (Week_Start, Class_ID, Bookings, Attended, No_Shows, Cancellations)
+    SELECT date(Booking_Date, '-6 days', 'weekday 1'), Class_ID,
+           SUM(Attendance_Status != 'Cancelled'), SUM(Attendance_Status = 'Attended'),
+           SUM(Attendance_Status = 'No-Show'), SUM(Attendance_Status = 'Cancelled')
+    FROM Class_Bookings
+    GROUP BY 1, 2
+    ''')
+
+def _create_cohort_retention(cursor):
+    # Distinct members of each join-month cohort with an Attended booking in each
+    # activity month. Filled by refresh_cohort_retention(), one activity month at
+    # a time, so finished months are never recounted.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Cohort_Retention (
+        Activity_Month TEXT NOT NULL,
+        Cohort_Month TEXT NOT NULL,
+        Active_Members INTEGER NOT NULL,
+        PRIMARY KEY (Activity_Month, Cohort_Month)
+    ) WITHOUT ROWID
+    ''')
+    # Covers the refresh query: attended bookings in a date range, with their member
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_class_bookings_attended
+    ON Class_Bookings (Attendance_Status, Booking_Date, Member_ID)
+    ''')
+
+def _create_class_sessions(cursor):
+    # One dated row per weekly occurrence of a class, generated ahead by
+    # sync_class_sessions(). Trainer and times are copied from Classes so
+    # calendar and trainer lookups are range scans on this table alone.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Class_Sessions (
+        Class_ID INTEGER NOT NULL,
+        Session_Date DATE NOT NULL,
+        Start_Time TEXT NOT NULL,
+        End_Time TEXT,
+        Trainer_ID INTEGER NOT NULL,
+        PRIMARY KEY (Class_ID, Session_Date),
+        FOREIGN KEY (Class_ID) REFERENCES Classes(Class_ID) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_class_sessions_date ON Class_Sessions (Session_Date, Start_Time)')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_class_sessions_trainer
+    ON Class_Sessions (Trainer_ID, Session_Date, Start_Time)
+    ''')
+
+def _create_capacity_guard(cursor):
+    # Last line of defence behind _book(): any write that would take a seat in
+    # a full session (status edits, bulk imports, other tools) is aborted.
+    # BEFORE triggers see Class_Seat_Counts without the row being written.
+    full = '''
+        (SELECT Max_Capacity FROM Classes WHERE Class_ID = NEW.Class_ID) <=
+        COALESCE((SELECT Booked_Count FROM Class_Seat_Counts
+                  WHERE Class_ID = NEW.Class_ID AND Booking_Date = NEW.Booking_Date), 0)
+    '''
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_class_bookings_capacity_insert
+    BEFORE INSERT ON Class_Bookings
+    WHEN NEW.Attendance_Status != 'Cancelled' AND {full}
+    BEGIN
+        SELECT RAISE(ABORT, 'Class is full on this date');
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_class_bookings_capacity_update
+    BEFORE UPDATE OF Class_ID, Booking_Date, Attendance_Status ON Class_Bookings
+    WHEN NEW.Attendance_Status != 'Cancelled'
+         AND (OLD.Attendance_Status = 'Cancelled' OR OLD.Class_ID != NEW.Class_ID
+              OR OLD.Booking_Date != NEW.Booking_Date)
+         AND {full}
+    BEGIN
+        SELECT RAISE(ABORT, 'Class is full on this date');
+    END
+    ''')
+
+def _create_member_search_indexes(cursor):
+    # Prefix search turns into a range seek per column; NOCASE matches the
+    # case-insensitive LIKE it replaces. Phone keeps its UNIQUE index.
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_members_last_name_nocase
+    ON Members (Last_Name COLLATE NOCASE, First_Name COLLATE NOCASE)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_members_first_name_nocase ON Members (First_Name COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_members_email_nocase ON Members (Email COLLATE NOCASE)')
+
+# SCHEMA MIGRATIONS
+
+# Ordered, append-only list of (version, description, function(cursor)).
+# Never edit a released migration; add a new one instead.
+MIGRATIONS = [
+    (1, 'Base tables', _create_tables),
+    (2, 'Secondary indexes on foreign-key and filter columns', _create_indexes),
+    (3, 'Member name index for typeahead search', _create_member_name_index),
+    (4, 'Per-class, per-date seat counters maintained by triggers', _create_seat_counts),
+    (5, 'FIFO waitlist for full classes', _create_waitlist),
+    (6, 'Watermarks for incremental jobs', _create_job_watermarks),
+    (7, 'Check-in log', _create_check_ins),
+    (8, 'Trigger-fed change log on the core tables', _create_change_log),
+    (9, 'Trainer workload and weekly class utilization summaries', _create_workload_summaries),
+    (10, 'Cohort retention matrix', _create_cohort_retention),
+    (11, 'Dated class sessions over a rolling window', _create_class_sessions),
+    (12, 'Refuse bookings past Max_Capacity however they are written', _create_capacity_guard),
+    (13, 'Case-insensitive indexes for member prefix search', _create_member_search_indexes),
+]
+
+def _apply_migrations(conn):
+    """Apply pending migrations on a raw connection, one transaction each"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS Schema_Version (
+        Version INTEGER PRIMARY KEY,
+        Description TEXT NOT NULL,
+        Applied_At TEXT NOT NULL
+    )
+    ''')
     conn.commit()
-    conn.close()
+
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        # BEGIN IMMEDIATE takes the write lock first, so two processes
+        # starting together cannot both apply the same version
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            done = conn.execute('SELECT 1 FROM Schema_Version WHERE Version = ?', (version,)).fetchone()
+            if not done:
+                migrate(conn.cursor())
+                conn.execute('INSERT INTO Schema_Version (Version, Description, Applied_At) VALUES (?, ?, ?)',
+                             (version, description, datetime.now().isoformat(timespec='seconds')))
+                applied.append((version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+def run_migrations():
+    with get_connection() as conn:
+        return _apply_migrations(conn)
+
+def get_schema_version():
+    with get_connection() as conn:
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Schema_Version'").fetchone()
+        if not exists:
+            return 0
+        return conn.execute('SELECT COALESCE(MAX(Version), 0) FROM Schema_Version').fetchone()[0]
+
+@st.cache_resource
+def _bootstrap(db_path):
+    applied = run_migrations()
+    insert_sample_data()
+    sync_class_sessions()
+    return applied
+
+def bootstrap_database():
+    """Migrate and seed once per process and database; a no-op on later reruns"""
+    return _bootstrap(DB_PATH)
 
 # VALIDATION FUNCTIONS
 
+# EXISTS stops at the first matching index entry instead of counting them all
+
 def check_member_has_membership(member_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT COUNT(*) FROM Member_Memberships 
-        WHERE Member_ID = ?
-    ''', (member_id,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count > 0
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT EXISTS (SELECT 1 FROM Member_Memberships WHERE Member_ID = ?)
+        ''', (member_id,))
+        return cursor.fetchone()[0] == 1
+
+ACTIVE_MEMBERSHIP_QUERY = 'SELECT EXISTS (SELECT 1 FROM Member_Memberships WHERE Member_ID = ? AND Is_Active = 1)'
+
+# One EXISTS probe per member; {marks} is a list of ? placeholders
+ACTIVE_MEMBERSHIP_STATUS_QUERY = '''
+SELECT m.Member_ID, EXISTS (SELECT 1 FROM Member_Memberships mm
+                            WHERE mm.Member_ID = m.Member_ID AND mm.Is_Active = 1)
+FROM Members m
+WHERE m.Member_ID IN ({marks})
+'''
+
+def _has_active_membership(conn, member_id):
+    cursor = conn.execute(ACTIVE_MEMBERSHIP_QUERY, (member_id,))
+    return cursor.fetchone()[0] == 1
 
 def check_member_has_active_membership(member_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT COUNT(*) FROM Member_Memberships 
-        WHERE Member_ID = ? AND Is_Active = 1
-    ''', (member_id,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count > 0
+    with get_connection() as conn:
+        return _has_active_membership(conn, member_id)
+
+def _active_membership_status(conn, member_ids):
+    member_ids = list(dict.fromkeys(int(member_id) for member_id in member_ids))
+    status = dict.fromkeys(member_ids, False)
+    for start in range(0, len(member_ids), SQL_VARIABLE_CHUNK):
+        chunk = member_ids[start:start + SQL_VARIABLE_CHUNK]
+        rows = conn.execute(ACTIVE_MEMBERSHIP_STATUS_QUERY.format(marks=', '.join('?' * len(chunk))), chunk)
+        status.update((member_id, active == 1) for member_id, active in rows)
+    return status
+
+def active_membership_status(member_ids):
+    """Member_ID -> has an active membership, for many members on one connection.
+
+    IDs go in chunks of SQL_VARIABLE_CHUNK per IN list; each member is one
+    probe of idx_member_memberships_member_active. Unknown IDs map to False.
+    """
+    with get_connection() as conn:
+        return _active_membership_status(conn, member_ids)
+
+# REPOSITORIES
+
+class TableRepository:
+    """Statement text for one table, built once at import, run through get_connection().
+
+    Calls made inside an open get_connection() block join that transaction.
+    Only the columns in `updatable` can be written by update(), so field names
+    picked in the UI never reach the SQL text unchecked.
+    """
+
+    def __init__(self, table_name, id_column, columns, updatable, clearable=()):
+        self.table_name = table_name
+        self.id_column = id_column
+        self.columns = tuple(columns)
+        self.updatable = tuple(updatable)
+        self.clearable = tuple(clearable)
+        self.select_sql = f'SELECT * FROM {table_name} WHERE {id_column} = ?'
+        self.insert_sql = (f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                           f"VALUES ({', '.join('?' * len(columns))})")
+        self.delete_sql = f'DELETE FROM {table_name} WHERE {id_column} = ?'
+        self.update_sql = {column: f'UPDATE {table_name} SET {column} = ? WHERE {id_column} = ?'
+                           for column in updatable}
+
+    def get(self, record_id):
+        """The record as a dict, or None"""
+        with get_connection() as conn:
+            cursor = conn.execute(self.select_sql, (record_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([col[0] for col in cursor.description], row))
+
+    def insert(self, *values):
+        """Insert one row (values in `columns` order); returns the new ID"""
+        with get_connection() as conn:
+            record_id = conn.execute(self.insert_sql, values).lastrowid
+            invalidate_tables(self.table_name)
+        return record_id
+
+    def insert_many(self, rows):
+        with get_connection() as conn:
+            count = conn.executemany(self.insert_sql, rows).rowcount
+            invalidate_tables(self.table_name)
+        return count
+
+    def update(self, record_id, column, value):
+        """Set one column of one record; returns the number of rows changed"""
+        update_sql = self.update_sql.get(column)
+        if update_sql is None:
+            raise ValueError(f"{column} cannot be updated in {self.table_name}")
+        with get_connection() as conn:
+            cursor = conn.execute(update_sql, (value, record_id))
+            invalidate_tables(self.table_name)
+            return cursor.rowcount
+
+    def clear(self, record_id, column):
+        """Blank a UNIQUE NOT NULL column with a per-record placeholder"""
+        if column not in self.clearable:
+            raise ValueError(f"{column} cannot be cleared in {self.table_name}")
+        return self.update(record_id, column, f'CLEARED-{record_id}')
+
+    def delete(self, record_id):
+        """Delete one record (children go with it where the schema CASCADEs)"""
+        with get_connection() as conn:
+            cursor = conn.execute(self.delete_sql, (record_id,))
+            invalidate_tables(self.table_name, cascade=True)
+            return cursor.rowcount
+
+
+members_repo = TableRepository(
+    'Members', 'Member_ID',
+    ['First_Name', 'Last_Name', 'Email', 'Phone', 'Date_of_Birth', 'Join_Date', 'Status'],
+    updatable=['First_Name', 'Last_Name', 'Email', 'Phone', 'Status'],
+    clearable=['Phone'])
+plans_repo = TableRepository(
+    'Membership_Plans', 'Plan_ID',
+    ['Plan_Name', 'Duration_Months', 'Price', 'Benefits_Description'],
+    updatable=['Plan_Name', 'Duration_Months', 'Price', 'Benefits_Description'])
+memberships_repo = TableRepository(
+    'Member_Memberships', 'Membership_Record_ID',
+    ['Member_ID', 'Plan_ID', 'Start_Date', 'End_Date', 'Payment_Status', 'Is_Active'],
+    updatable=['Start_Date', 'End_Date', 'Payment_Status', 'Is_Active'])
+trainers_repo = TableRepository(
+    'Trainers', 'Trainer_ID',
+    ['First_Name', 'Last_Name', 'Specialization', 'Email', 'Phone', 'Hire_Date'],
+    updatable=['First_Name', 'Last_Name', 'Specialization', 'Email', 'Phone'],
+    clearable=['Phone'])
+classes_repo = TableRepository(
+    'Classes', 'Class_ID',
+    ['Class_Name', 'Class_Type', 'Trainer_ID', 'Schedule_Day', 'Schedule_Time', 'Duration_Minutes', 'Max_Capacity'],
+    updatable=['Class_Name', 'Schedule_Day', 'Schedule_Time', 'Duration_Minutes', 'Max_Capacity'])
+bookings_repo = TableRepository(
+    'Class_Bookings', 'Booking_ID',
+    ['Member_ID', 'Class_ID', 'Booking_Date', 'Attendance_Status'],
+    updatable=['Attendance_Status'])
+
+REPOSITORIES = {repo.table_name: repo for repo in (members_repo, plans_repo, memberships_repo,
+                                                    trainers_repo, classes_repo, bookings_repo)}
+
+# TIMETABLE CONFLICTS
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+class TrainerConflictError(Exception):
+    pass
+
+def _week_slots(schedule_day, schedule_time, duration):
+    """[start, end) minutes since Monday 00:00 of a weekly class.
+
+    A class running past Sunday midnight is split in two, the rest continuing
+    on Monday. Unknown days and unparseable times give no slots.
+    """
+    try:
+        hours, minutes = (int(part) for part in str(schedule_time).split(':')[:2])
+        start = WEEKDAYS.index(schedule_day) * MINUTES_PER_DAY + hours * 60 + minutes
+        end = start + int(duration)
+    except (ValueError, TypeError):
+        return []
+    if end <= MINUTES_PER_WEEK:
+        return [(start, end)]
+    return [(start, MINUTES_PER_WEEK), (0, end - MINUTES_PER_WEEK)]
+
+class TrainerTimetable:
+    """Each trainer's weekly classes as [start, end) minute intervals sorted by start.
+
+    conflicts() bisects to the last interval starting before the slot ends and
+    walks back only while an interval could still reach the slot (it starts
+    less than the trainer's longest class before it), so a check costs
+    O(log n) plus the overlaps found, even if the timetable already has some.
+    """
+
+    def __init__(self, classes=()):
+        self._starts = {}
+        self._slots = {}
+        self._longest = {}
+        for trainer_id, class_id, schedule_day, schedule_time, duration in classes:
+            self.add(trainer_id, class_id, schedule_day, schedule_time, duration)
+
+    def add(self, trainer_id, class_id, schedule_day, schedule_time, duration):
+        starts = self._starts.setdefault(trainer_id, [])
+        slots = self._slots.setdefault(trainer_id, [])
+        for start, end in _week_slots(schedule_day, schedule_time, duration):
+            index = bisect.bisect_right(starts, start)
+            starts.insert(index, start)
+            slots.insert(index, (start, end, class_id))
+            self._longest[trainer_id] = max(self._longest.get(trainer_id, 0), end - start)
+
+    def conflicts(self, trainer_id, schedule_day, schedule_time, duration, ignore=None):
+        """IDs of the trainer's classes overlapping this slot, class `ignore` excepted"""
+        starts = self._starts.get(trainer_id, [])
+        slots = self._slots.get(trainer_id, [])
+        found = set()
+        for start, end in _week_slots(schedule_day, schedule_time, duration):
+            index = bisect.bisect_left(starts, end)
+            while index > 0 and starts[index - 1] > start - self._longest[trainer_id]:
+                index -= 1
+                _, other_end, class_id = slots[index]
+                if other_end > start and class_id != ignore:
+                    found.add(class_id)
+        return sorted(found)
+
+    def overlaps(self):
+        """Every overlapping (trainer, class, other class) pair, from one sweep per trainer"""
+        pairs = set()
+        for trainer_id, slots in self._slots.items():
+            running = []
+            for start, end, class_id in slots:
+                # Drop classes that ended before this one starts; the rest overlap it
+                while running and running[0][0] <= start:
+                    heapq.heappop(running)
+                pairs.update((trainer_id, *sorted((other_id, class_id)))
+                             for _, other_id in running if other_id != class_id)
+                heapq.heappush(running, (end, class_id))
+        return sorted(pairs)
+
+def _trainer_conflict(trainer_id, clashes, slots):
+    """TrainerConflictError naming the clashing classes; `slots` maps ID -> (day, time, minutes)"""
+    names = ', '.join(f"{f'#{other_id}' if other_id > 0 else f'in row {-other_id}'} "
+                      f"({slots[other_id][0]} {slots[other_id][1]}, {slots[other_id][2]} min)"
+                      for other_id in clashes)
+    return TrainerConflictError(f"Trainer {trainer_id} already teaches class {names} at an overlapping time")
+
+TRAINER_CLASSES_QUERY = 'SELECT Class_ID, Schedule_Day, Schedule_Time, Duration_Minutes FROM Classes WHERE Trainer_ID = ?'
+
+def _check_trainer_free(conn, trainer_id, schedule_day, schedule_time, duration, class_id=None):
+    """Raise TrainerConflictError if the slot overlaps another class of the trainer"""
+    rows = conn.execute(TRAINER_CLASSES_QUERY, (trainer_id,)).fetchall()
+    timetable = TrainerTimetable((trainer_id, *row) for row in rows)
+    clashes = timetable.conflicts(trainer_id, schedule_day, schedule_time, duration, ignore=class_id)
+    if clashes:
+        raise _trainer_conflict(trainer_id, clashes, {row[0]: row[1:] for row in rows})
+
+def _check_class_slots(conn, rows):
+    """Keep imported classes that leave their trainer free, against the existing
+    timetable plus the rows accepted earlier in the import"""
+    existing = conn.execute('SELECT Trainer_ID, Class_ID, Schedule_Day, Schedule_Time, Duration_Minutes '
+                            'FROM Classes').fetchall()
+    timetable = TrainerTimetable(existing)
+    slots = {row[1]: row[2:] for row in existing}
+    accepted, rejections = [], []
+    for row in rows:
+        number, _, _, trainer_id, schedule_day, schedule_time, duration, _ = row
+        trainer_id, duration = int(trainer_id), int(duration)
+        clashes = timetable.conflicts(trainer_id, schedule_day, schedule_time, duration)
+        if clashes:
+            rejections.append((number, str(_trainer_conflict(trainer_id, clashes, slots))))
+            continue
+        # Rows not inserted yet are keyed by their negated row number
+        timetable.add(trainer_id, -number, schedule_day, schedule_time, duration)
+        slots[-number] = (schedule_day, schedule_time, duration)
+        accepted.append(row)
+    return accepted, rejections
+
+def audit_trainer_conflicts():
+    """All pairs of classes whose trainer would have to be in two places at once"""
+    with get_connection() as conn:
+        rows = conn.execute('''
+            SELECT c.Trainer_ID, c.Class_ID, c.Schedule_Day, c.Schedule_Time, c.Duration_Minutes,
+                   c.Class_Name, t.First_Name || ' ' || t.Last_Name
+            FROM Classes c
+            JOIN Trainers t ON t.Trainer_ID = c.Trainer_ID
+        ''').fetchall()
+    timetable = TrainerTimetable(row[:5] for row in rows)
+    classes = {row[1]: row for row in rows}
+    return pd.DataFrame([{
+        'Trainer_ID': trainer_id,
+        'Trainer_Name': classes[class_id][6],
+        'Class_ID': class_id,
+        'Class_Name': classes[class_id][5],
+        'Slot': f"{classes[class_id][2]} {classes[class_id][3]} ({classes[class_id][4]} min)",
+        'Other_Class_ID': other_id,
+        'Other_Class_Name': classes[other_id][5],
+        'Other_Slot': f"{classes[other_id][2]} {classes[other_id][3]} ({classes[other_id][4]} min)",
+    } for trainer_id, class_id, other_id in timetable.overlaps()],
+        columns=['Trainer_ID', 'Trainer_Name', 'Class_ID', 'Class_Name', 'Slot',
+                 'Other_Class_ID', 'Other_Class_Name', 'Other_Slot'])
 
 # CRUD OPERATIONS
 
 def insert_member(first_name, last_name, email, phone, dob, join_date, status):
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO Members (First_Name, Last_Name, Email, Phone, Date_of_Birth, Join_Date, Status)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (first_name, last_name, email, phone, dob, join_date, status))
-        conn.commit()
-        conn.close()
+        members_repo.insert(first_name, last_name, email, phone, dob, join_date, status)
         return True, "Member added successfully!"
     except sqlite3.IntegrityError as e:
-        conn.close()
         return False, f"Error: {str(e)}"
 
 def insert_membership_plan(plan_name, duration, price, benefits):
-    conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO Membership_Plans (Plan_Name, Duration_Months, Price, Benefits_Description)
-            VALUES (?, ?, ?, ?)
-        ''', (plan_name, duration, price, benefits))
-        conn.commit()
-        conn.close()
+        plans_repo.insert(plan_name, duration, price, benefits)
         return True, "Membership plan added successfully!"
     except Exception as e:
-        conn.close()
         return False, f"Error: {str(e)}"
 
-def insert_trainer(first_name, last_name, specialization, email, phone, hire_date):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO Trainers (First_Name, Last_Name, Specialization, Email, Phone, Hire_Date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (first_name, last_name, specialization, email, phone, hire_date))
+def insert_trainer(first_name, last_name, specialization, email, phone, hire_date):
+    try:
+        trainers_repo.insert(first_name, last_name, specialization, email, phone, hire_date)
+        return True, "Trainer added successfully!"
+    except sqlite3.IntegrityError as e:
+        return False, f"Error: {str(e)}"
+
+def insert_class(class_name, class_type, trainer_id, schedule_day, schedule_time, duration, capacity):
+    try:
+        with get_connection() as conn:
+            # Hold the write lock so two desks cannot both take the same free slot
+            _begin_immediate(conn)
+            _check_trainer_free(conn, trainer_id, schedule_day, schedule_time, duration)
+            classes_repo.insert(class_name, class_type, trainer_id, schedule_day, schedule_time, duration, capacity)
+        return True, "Class added successfully!"
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+
+# Changing these can move a class onto another of its trainer's classes
+SCHEDULE_COLUMNS = ('Schedule_Day', 'Schedule_Time', 'Duration_Minutes')
+
+def update_class(class_id, column, value):
+    """classes_repo.update() that raises TrainerConflictError instead of double-booking the trainer.
+
+    Raising Max_Capacity fills the new seats from the waitlist of every upcoming date.
+    """
+    with get_connection() as conn:
+        if column in SCHEDULE_COLUMNS or column == 'Max_Capacity':
+            _begin_immediate(conn)
+        if column in SCHEDULE_COLUMNS:
+            current = classes_repo.get(class_id)
+            if current is not None:
+                current[column] = value
+                _check_trainer_free(conn, current['Trainer_ID'], current['Schedule_Day'],
+                                    current['Schedule_Time'], current['Duration_Minutes'], class_id)
+        updated = classes_repo.update(class_id, column, value)
+        if column == 'Max_Capacity' and updated:
+            waiting = conn.execute('SELECT DISTINCT Booking_Date FROM Waitlist WHERE Class_ID = ? AND Booking_Date >= ?',
+                                   (class_id, str(date.today()))).fetchall()
+            for (booking_date,) in waiting:
+                _promote(conn, class_id, booking_date)
+        return updated
+
+def insert_booking(member_id, class_id, booking_date, status):
+    """Capacity-checked booking; see book_class()"""
+    return book_class(member_id, class_id, booking_date, status)
+
+# Deleting one of these drops live bookings with it, so the freed seats go to the waitlist
+SEAT_HOLDERS = {'Class_Bookings': 'Booking_ID', 'Members': 'Member_ID'}
+
+def delete_record(table_name, record_id):
+    try:
+        with get_connection() as conn:
+            sessions = []
+            column = SEAT_HOLDERS.get(table_name)
+            if column is not None:
+                _begin_immediate(conn)
+                sessions = conn.execute(f'''
+                    SELECT DISTINCT Class_ID, Booking_Date FROM Class_Bookings
+                    WHERE {column} = ? AND Attendance_Status != 'Cancelled'
+                ''', (record_id,)).fetchall()
+            rows_affected = REPOSITORIES[table_name].delete(record_id)
+            for class_id, booking_date in sorted(sessions):
+                _promote(conn, class_id, booking_date)
+        if rows_affected > 0:
+            return True, f"Record deleted successfully!"
+        else:
+            return False, "Record not found!"
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+
+def run_query(query, params=()):
+    """Run a read-only query on a pooled connection and return a DataFrame"""
+    with get_connection() as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+# CLASS SESSIONS
+
+SESSIONS_JOB = 'class_sessions'
+SESSIONS_CHANGES_JOB = 'class_sessions_changes'
+
+# Weekly occurrences of each class from the first Schedule_Day on or after the
+# start date up to the end date. Recursive CTEs are not allowed in triggers, so
+# class changes are picked up from Change_Log by sync_class_sessions() instead.
+CLASS_SESSIONS_EXPAND_SQL = '''
+INSERT OR IGNORE INTO Class_Sessions (Class_ID, Session_Date, Start_Time, End_Time, Trainer_ID)
+WITH RECURSIVE Occurrences (Class_ID, Session_Date) AS (
+    SELECT Class_ID, date(?, 'weekday ' || CASE Schedule_Day
+        WHEN 'Sunday' THEN 0
+        WHEN 'Monday' THEN 1
+        WHEN 'Tuesday' THEN 2
+        WHEN 'Wednesday' THEN 3
+        WHEN 'Thursday' THEN 4
+        WHEN 'Friday' THEN 5
+        WHEN 'Saturday' THEN 6
+    END)
+    FROM Classes
+    WHERE Schedule_Day IS NOT NULL{condition}
+    UNION ALL
+    SELECT Class_ID, date(Session_Date, '+7 days') FROM Occurrences WHERE Session_Date <= date(?, '-7 days')
+)
+SELECT o.Class_ID, o.Session_Date, c.Schedule_Time,
+       strftime('%H:%M', c.Schedule_Time, '+' || c.Duration_Minutes || ' minutes'), c.Trainer_ID
+FROM Occurrences o
+JOIN Classes c ON c.Class_ID = o.Class_ID
+WHERE o.Session_Date <= ?
+'''
+
+def _replace_sessions(conn, start, end, class_ids=None):
+    """Regenerate the sessions of the given classes (all if None) from start to end"""
+    if class_ids is None:
+        conn.execute('DELETE FROM Class_Sessions WHERE Session_Date >= ?', (start,))
+        return conn.execute(CLASS_SESSIONS_EXPAND_SQL.format(condition=''), (start, end, end)).rowcount
+    inserted = 0
+    for chunk_start in range(0, len(class_ids), SQL_VARIABLE_CHUNK):
+        chunk = class_ids[chunk_start:chunk_start + SQL_VARIABLE_CHUNK]
+        marks = ', '.join('?' * len(chunk))
+        conn.execute(f'DELETE FROM Class_Sessions WHERE Class_ID IN ({marks}) AND Session_Date >= ?',
+                     (*chunk, start))
+        query = CLASS_SESSIONS_EXPAND_SQL.format(condition=f' AND Class_ID IN ({marks})')
+        inserted += conn.execute(query, (start, *chunk, end, end)).rowcount
+    return inserted
+
+def _sync_class_sessions(conn, today, full=False):
+    """Bring Class_Sessions up to date on an open connection; see sync_class_sessions()"""
+    today = str(today)
+    window_end = (date.fromisoformat(today) + timedelta(days=CONFIG['session_window_days'])).isoformat()
+    horizon = get_watermark(conn, SESSIONS_JOB)
+    seq = int(get_watermark(conn, SESSIONS_CHANGES_JOB, '0'))
+    latest = _latest_change_seq(conn)
+    # Class changes were pruned before they were read: reschedule everything
+    full = full or (bool(horizon) and _log_truncated(conn, seq))
+    changed = sorted({row[0] for row in conn.execute(
+        "SELECT Row_ID FROM Change_Log WHERE Seq > ? AND Seq <= ? AND Table_Name = 'Classes'", (seq, latest))})
+    result = {'from': today, 'until': max(horizon, window_end), 'resynced': 0, 'sessions': 0}
+    if horizon >= window_end and not changed and not full:
+        if latest > seq:
+            # Nothing to redo, but let the change log pruner move past these entries
+            set_watermark(conn, SESSIONS_CHANGES_JOB, str(latest))
+        return result
+
+    _begin_immediate(conn)
+    if full or not horizon:
+        # First run: also cover every date already booked, so past bookings have sessions
+        first = conn.execute('SELECT MIN(Booking_Date) FROM Class_Bookings').fetchone()[0]
+        start = today if full else min(first or today, today)
+        result['sessions'] = _replace_sessions(conn, start, window_end)
+        result['from'] = start
+        result['until'] = window_end
+    else:
+        if changed:
+            # Reschedule changed classes from today on; past sessions keep the old schedule
+            result['resynced'] = len(changed)
+            result['sessions'] += _replace_sessions(conn, today, result['until'], changed)
+        if horizon < window_end:
+            next_day = (date.fromisoformat(horizon) + timedelta(days=1)).isoformat()
+            result['sessions'] += _replace_sessions(conn, max(next_day, today), window_end)
+            result['from'] = max(next_day, today)
+    set_watermark(conn, SESSIONS_JOB, result['until'])
+    set_watermark(conn, SESSIONS_CHANGES_JOB, str(latest))
+    invalidate_tables('Class_Sessions')
+    return result
+
+def sync_class_sessions(today=None, full=False):
+    """Extend Class_Sessions to session_window_days past `today` and follow class changes.
+
+    Only days past the last run's window end are generated. Classes inserted,
+    updated or deleted since then (read from Change_Log) have their sessions
+    from today on regenerated. Does nothing, and takes no write lock, when both
+    are up to date. full=True regenerates every session from today on.
+    """
+    started = time.perf_counter()
+    with get_connection() as conn:
+        result = _sync_class_sessions(conn, today or date.today(), full)
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    if result['sessions'] or result['resynced']:
+        logger.info("Class sessions: %d generated in [%s, %s], %d class(es) rescheduled, %.3fs",
+                    result['sessions'], result['from'], result['until'], result['resynced'], result['seconds'])
+    return result
+
+SESSION_EXISTS_QUERY = 'SELECT EXISTS (SELECT 1 FROM Class_Sessions WHERE Class_ID = ? AND Session_Date = ?)'
+
+def _has_session(conn, class_id, session_date):
+    return conn.execute(SESSION_EXISTS_QUERY, (class_id, session_date)).fetchone()[0] == 1
+
+def _check_session(conn, class_id, booking_date):
+    """Raise ValueError unless the class has a session on booking_date.
+
+    Sessions are generated from today on, so earlier dates (history, legacy
+    rosters) only need the class to exist.
+    """
+    if booking_date < str(date.today()):
+        if conn.execute('SELECT 1 FROM Classes WHERE Class_ID = ?', (class_id,)).fetchone() is None:
+            raise ValueError(f"Class {class_id} does not exist")
+        return
+    if _has_session(conn, class_id, booking_date):
+        return
+    # The class may have been added or moved since the last sync
+    _sync_class_sessions(conn, date.today())
+    if _has_session(conn, class_id, booking_date):
+        return
+    horizon = get_watermark(conn, SESSIONS_JOB)
+    if booking_date > horizon:
+        raise ValueError(f"Bookings are only open up to {horizon}")
+    schedule = conn.execute('SELECT Schedule_Day, Schedule_Time FROM Classes WHERE Class_ID = ?',
+                            (class_id,)).fetchone()
+    if schedule is None:
+        raise ValueError(f"Class {class_id} does not exist")
+    day, slot = schedule
+    raise ValueError(f"Class {class_id} has no session generated on {booking_date} (it runs on {day}s at {slot})")
+
+CLASS_SESSIONS_QUERY = '''
+SELECT
+    s.Session_Date,
+    s.Start_Time,
+    s.End_Time,
+    c.Class_ID,
+    c.Class_Name,
+    c.Class_Type,
+    t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
+    c.Max_Capacity - COALESCE(sc.Booked_Count, 0) AS Seats_Left
+FROM Class_Sessions s
+JOIN Classes c ON c.Class_ID = s.Class_ID
+JOIN Trainers t ON t.Trainer_ID = s.Trainer_ID
+LEFT JOIN Class_Seat_Counts sc ON sc.Class_ID = s.Class_ID AND sc.Booking_Date = s.Session_Date
+WHERE {condition}
+ORDER BY s.Session_Date, s.Start_Time, c.Class_Name
+'''
+SESSIONS_BY_DATE_QUERY = CLASS_SESSIONS_QUERY.format(condition='s.Session_Date BETWEEN ? AND ?')
+SESSIONS_BY_TRAINER_QUERY = CLASS_SESSIONS_QUERY.format(
+    condition='s.Trainer_ID = ? AND s.Session_Date BETWEEN ? AND ?')
+
+def get_class_sessions(start=None, end=None, trainer_id=None):
+    """Dated sessions in [start, end] (default: the next 7 days), optionally for one trainer"""
+    start = start or date.today()
+    end = end or start + timedelta(days=6)
+    if trainer_id is None:
+        return run_query(SESSIONS_BY_DATE_QUERY, (str(start), str(end)))
+    return run_query(SESSIONS_BY_TRAINER_QUERY, (int(trainer_id), str(start), str(end)))
+
+# BOOKING ENGINE
+
+class ClassFullError(Exception):
+    pass
+
+DUPLICATE_BOOKING_ERROR = 'UNIQUE constraint failed: Class_Bookings.Member_ID, Class_Bookings.Class_ID, Class_Bookings.Booking_Date'
+
+def _booking_error(e):
+    """User-facing text for an IntegrityError raised while booking"""
+    message = str(e)
+    if message == DUPLICATE_BOOKING_ERROR:
+        return "Member already has a booking for this class on this date"
+    if message == 'FOREIGN KEY constraint failed':
+        return "Unknown member or class"
+    return message
+
+SEATS_LEFT_QUERY = '''
+SELECT c.Max_Capacity - COALESCE(s.Booked_Count, 0)
+FROM Classes c
+LEFT JOIN Class_Seat_Counts s ON s.Class_ID = c.Class_ID AND s.Booking_Date = ?
+WHERE c.Class_ID = ?
+'''
+
+def _seats_left(conn, class_id, booking_date):
+    """Max_Capacity minus seats taken, or None if the class does not exist"""
+    row = conn.execute(SEATS_LEFT_QUERY, (booking_date, class_id)).fetchone()
+    return None if row is None else max(row[0], 0)
+
+def available_seats(class_id, booking_date):
+    """Seats still free for a class on a date: two primary-key lookups, no COUNT(*)"""
+    with get_connection() as conn:
+        return _seats_left(conn, class_id, str(booking_date))
+
+def _begin_immediate(conn):
+    if not conn.in_transaction:
+        # Take the write lock before reading the counter so two desks cannot
+        # both see the last free seat
+        conn.execute('BEGIN IMMEDIATE')
+
+def _book(conn, member_id, class_id, booking_date, status, waitlist=False):
+    """Check capacity and insert on an open connection.
+
+    Returns ('booked', seats left afterwards) or, when the class is full and
+    waitlist is set, ('waitlisted', position in the queue) - or
+    ('already waitlisted', position) if the member was queued before.
+    """
+    _begin_immediate(conn)
+    seats = _seats_left(conn, class_id, booking_date)
+    if seats is None:
+        raise ValueError(f"Class {class_id} does not exist")
+    _check_session(conn, class_id, booking_date)
+    if status != 'Cancelled' and seats <= 0:
+        if not waitlist:
+            raise ClassFullError(f"Class is full on {booking_date}")
+        position, joined = _join_waitlist(conn, member_id, class_id, booking_date)
+        return 'waitlisted' if joined else 'already waitlisted', position
+    conn.execute(bookings_repo.insert_sql, (member_id, class_id, booking_date, status))
+    invalidate_tables('Class_Bookings')
+    return 'booked', seats - 1 if status != 'Cancelled' else seats
+
+def book_class(member_id, class_id, booking_date, status='Booked', waitlist=False):
+    """Book a seat, refusing the booking (or queueing it) once the class is at Max_Capacity"""
+    booking_date = str(booking_date)
+    try:
+        with get_connection() as conn:
+            outcome, count = _book(conn, member_id, class_id, booking_date, status, waitlist)
+        if outcome == 'waitlisted':
+            return True, f"Class is full - added to the waitlist at position {count}"
+        if outcome == 'already waitlisted':
+            return False, f"Error: Member is already waitlisted at position {count}"
+        return True, f"Booking created successfully! ({count} seat(s) left)"
+    except (ClassFullError, ValueError) as e:
+        return False, f"Error: {str(e)}"
+    except sqlite3.IntegrityError as e:
+        return False, f"Error: {_booking_error(e)}"
+
+# WAITLIST
+
+SQL_VARIABLE_CHUNK = 500
+
+def _waitlist_position(conn, class_id, booking_date, waitlist_id):
+    return conn.execute('''
+        SELECT COUNT(*) FROM Waitlist WHERE Class_ID = ? AND Booking_Date = ? AND Waitlist_ID <= ?
+    ''', (class_id, booking_date, waitlist_id)).fetchone()[0]
+
+def _join_waitlist(conn, member_id, class_id, booking_date):
+    """Queue a member for a full class.
+
+    Returns (1-based position, joined); joined is False when the member was
+    already in the queue, in which case they keep their place.
+    """
+    if conn.execute('''
+        SELECT 1 FROM Class_Bookings
+        WHERE Member_ID = ? AND Class_ID = ? AND Booking_Date = ? AND Attendance_Status != 'Cancelled'
+    ''', (member_id, class_id, booking_date)).fetchone():
+        raise sqlite3.IntegrityError("Member already has a booking for this class on this date")
+    queued = conn.execute('''
+        SELECT Waitlist_ID FROM Waitlist WHERE Member_ID = ? AND Class_ID = ? AND Booking_Date = ?
+    ''', (member_id, class_id, booking_date)).fetchone()
+    if queued:
+        return _waitlist_position(conn, class_id, booking_date, queued[0]), False
+    cursor = conn.execute('''
+        INSERT INTO Waitlist (Member_ID, Class_ID, Booking_Date, Added_At) VALUES (?, ?, ?, ?)
+    ''', (member_id, class_id, booking_date, datetime.now().isoformat(timespec='seconds')))
+    invalidate_tables('Waitlist')
+    return _waitlist_position(conn, class_id, booking_date, cursor.lastrowid), True
+
+WAITLIST_HEAD_QUERY = '''
+SELECT Waitlist_ID, Member_ID FROM Waitlist
+WHERE Class_ID = ? AND Booking_Date = ?
+ORDER BY Waitlist_ID LIMIT ?
+'''
+
+def _promote(conn, class_id, booking_date):
+    """Move members from the head of the waitlist into free seats; returns promoted Member_IDs.
+
+    A member who cancelled earlier gets their old booking row back (the UNIQUE
+    constraint allows one row per member, class and date); anyone who already
+    holds a live booking is simply dropped from the queue.
+    """
+    promoted = []
+    seats = _seats_left(conn, class_id, booking_date) or 0
+    while seats > 0:
+        head = conn.execute(WAITLIST_HEAD_QUERY, (class_id, booking_date, seats)).fetchall()
+        if not head:
+            break
+        for waitlist_id, member_id in head:
+            conn.execute('DELETE FROM Waitlist WHERE Waitlist_ID = ?', (waitlist_id,))
+            cursor = conn.execute('''
+                INSERT INTO Class_Bookings (Member_ID, Class_ID, Booking_Date, Attendance_Status)
+                VALUES (?, ?, ?, 'Booked')
+                ON CONFLICT (Member_ID, Class_ID, Booking_Date) DO UPDATE SET Attendance_Status = 'Booked'
+                WHERE Attendance_Status = 'Cancelled'
+            ''', (member_id, class_id, booking_date))
+            if cursor.rowcount:
+                promoted.append(member_id)
+                seats -= 1
+        invalidate_tables('Waitlist', 'Class_Bookings')
+    return promoted
+
+def _cancel(conn, booking_ids):
+    """Cancel bookings and refill each freed session from its waitlist, on an open connection.
+
+    The affected (class, date) sessions are collected with one set-based UPDATE
+    per chunk of IDs, then each session is promoted once. Returns
+    (bookings cancelled, promoted Member_IDs).
+    """
+    _begin_immediate(conn)
+    booking_ids = [int(booking_id) for booking_id in booking_ids]
+    sessions = set()
+    cancelled = 0
+    for start in range(0, len(booking_ids), SQL_VARIABLE_CHUNK):
+        chunk = booking_ids[start:start + SQL_VARIABLE_CHUNK]
+        marks = ', '.join('?' * len(chunk))
+        sessions.update(conn.execute(f'''
+            SELECT DISTINCT Class_ID, Booking_Date FROM Class_Bookings
+            WHERE Booking_ID IN ({marks}) AND Attendance_Status != 'Cancelled'
+        ''', chunk).fetchall())
+        cancelled += conn.execute(f'''
+            UPDATE Class_Bookings SET Attendance_Status = 'Cancelled'
+            WHERE Booking_ID IN ({marks}) AND Attendance_Status != 'Cancelled'
+        ''', chunk).rowcount
+    invalidate_tables('Class_Bookings')
+
+    promoted = []
+    for class_id, booking_date in sorted(sessions):
+        promoted.extend(_promote(conn, class_id, booking_date))
+    return cancelled, promoted
+
+def update_booking_status(booking_id, status):
+    """Change Attendance_Status; cancelling frees the seat for the waitlist and
+    re-activating a cancelled booking needs a free seat, like a new booking"""
+    if status == 'Cancelled':
+        return cancel_booking(booking_id)
+    try:
+        with get_connection() as conn:
+            _begin_immediate(conn)
+            row = conn.execute('SELECT Class_ID, Booking_Date, Attendance_Status FROM Class_Bookings '
+                               'WHERE Booking_ID = ?', (booking_id,)).fetchone()
+            if row is None:
+                return False, "Booking not found!"
+            class_id, booking_date, current = row
+            _check_session(conn, class_id, booking_date)
+            if current == 'Cancelled' and not _seats_left(conn, class_id, booking_date):
+                raise ClassFullError(f"Class is full on {booking_date} - join the waitlist instead")
+            bookings_repo.update(booking_id, 'Attendance_Status', status)
+        return True, "✅ Booking updated!"
+    except (ClassFullError, ValueError, sqlite3.IntegrityError) as e:
+        return False, f"Error: {str(e)}"
+
+def cancel_booking(booking_id):
+    """Cancel one booking and hand its seat to the next member on the waitlist"""
+    try:
+        with get_connection() as conn:
+            exists = conn.execute('SELECT 1 FROM Class_Bookings WHERE Booking_ID = ?', (booking_id,)).fetchone()
+            if not exists:
+                return False, "Booking not found!"
+            cancelled, promoted = _cancel(conn, [booking_id])
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+    if not cancelled:
+        return True, "Booking was already cancelled"
+    if promoted:
+        return True, f"✅ Booking cancelled! Member {promoted[0]} promoted from the waitlist"
+    return True, "✅ Booking cancelled!"
+
+def cancel_bookings(booking_ids):
+    """Cancel many bookings in one transaction; returns {'cancelled': n, 'promoted': [Member_ID, ...]}"""
+    with get_connection() as conn:
+        cancelled, promoted = _cancel(conn, booking_ids)
+    return {'cancelled': cancelled, 'promoted': promoted}
+
+def cancel_trainer_day(trainer_id, booking_date):
+    """Call off every class a trainer runs on a date (e.g. off sick).
+
+    All bookings for those sessions are cancelled and their waitlists cleared
+    in one pass; nobody is promoted because the sessions are not running.
+    """
+    booking_date = str(booking_date)
+    with get_connection() as conn:
+        _begin_immediate(conn)
+        cancelled = conn.execute('''
+            UPDATE Class_Bookings SET Attendance_Status = 'Cancelled'
+            WHERE Booking_Date = ? AND Attendance_Status != 'Cancelled'
+              AND Class_ID IN (SELECT Class_ID FROM Classes WHERE Trainer_ID = ?)
+        ''', (booking_date, trainer_id)).rowcount
+        dropped = conn.execute('''
+            DELETE FROM Waitlist
+            WHERE Booking_Date = ? AND Class_ID IN (SELECT Class_ID FROM Classes WHERE Trainer_ID = ?)
+        ''', (booking_date, trainer_id)).rowcount
+        invalidate_tables('Class_Bookings', 'Waitlist')
+    return {'cancelled': cancelled, 'waitlist_cleared': dropped}
+
+# JOIN QUERIES
+
+MEMBER_MEMBERSHIPS_QUERY = '''
+SELECT 
+    m.Member_ID,
+    m.First_Name || ' ' || m.Last_Name AS Member_Name,
+    m.Email,
+    mp.Plan_Name,
+    mp.Price,
+    mm.Start_Date,
+    mm.End_Date,
+    mm.Payment_Status,
+    CASE WHEN mm.Is_Active = 1 THEN 'Active' ELSE 'Inactive' END AS Status
+FROM Members m
+JOIN Member_Memberships mm ON m.Member_ID = mm.Member_ID
+JOIN Membership_Plans mp ON mm.Plan_ID = mp.Plan_ID
+ORDER BY m.Member_ID
+'''
+
+# Custom JOIN builder: (tables that must all be selected, query template), first
+# match wins. {join} is filled with the chosen JOIN type.
+CUSTOM_JOIN_TEMPLATES = [
+    ({'Members', 'Member_Memberships', 'Membership_Plans'}, '''
+SELECT m.*, mm.Start_Date, mm.End_Date, mm.Payment_Status,
+       mp.Plan_Name, mp.Price
+FROM Members m
+{join} Member_Memberships mm ON m.Member_ID = mm.Member_ID
+{join} Membership_Plans mp ON mm.Plan_ID = mp.Plan_ID
+'''),
+    ({'Members', 'Member_Memberships'}, '''
+SELECT m.*, mm.Start_Date, mm.End_Date, mm.Payment_Status, mm.Is_Active
+FROM Members m
+{join} Member_Memberships mm ON m.Member_ID = mm.Member_ID
+'''),
+    ({'Classes', 'Trainers', 'Class_Bookings'}, '''
+SELECT c.Class_Name, c.Schedule_Day, c.Schedule_Time,
+       t.First_Name || ' ' || t.Last_Name AS Trainer,
+       cb.Booking_Date, cb.Attendance_Status
+FROM Classes c
+{join} Trainers t ON c.Trainer_ID = t.Trainer_ID
+{join} Class_Bookings cb ON c.Class_ID = cb.Class_ID
+'''),
+    ({'Classes', 'Trainers'}, '''
+SELECT c.*, t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
+       t.Specialization
+FROM Classes c
+{join} Trainers t ON c.Trainer_ID = t.Trainer_ID
+'''),
+    ({'Members', 'Class_Bookings', 'Classes'}, '''
+SELECT m.First_Name || ' ' || m.Last_Name AS Member,
+       c.Class_Name, c.Schedule_Day, c.Schedule_Time,
+       cb.Booking_Date, cb.Attendance_Status
+FROM Members m
+{join} Class_Bookings cb ON m.Member_ID = cb.Member_ID
+{join} Classes c ON cb.Class_ID = c.Class_ID
+'''),
+    ({'Members', 'Class_Bookings'}, '''
+SELECT m.*, cb.Booking_Date, cb.Attendance_Status
+FROM Members m
+{join} Class_Bookings cb ON m.Member_ID = cb.Member_ID
+'''),
+]
+JOIN_TYPES = ('INNER JOIN', 'LEFT JOIN')
+
+def build_custom_join(table_names, join_type):
+    """(query, joined) for the selected tables; joined is False when no template fits
+    and the query only reads the first table"""
+    if join_type not in JOIN_TYPES:
+        raise ValueError(f"Unsupported JOIN type: {join_type}")
+    selected = set(table_names)
+    for required, template in CUSTOM_JOIN_TEMPLATES:
+        if required <= selected:
+            return template.format(join=join_type), True
+    if table_names[0] not in REPOSITORIES:
+        raise ValueError(f"Unknown table: {table_names[0]}")
+    return f"SELECT * FROM {table_names[0]}", False
+
+def get_member_memberships_join():
+    """JOIN: Get members with their active membership plans"""
+    return run_query(MEMBER_MEMBERSHIPS_QUERY)
+
+CLASS_SCHEDULE_QUERY = '''
+SELECT 
+    c.Class_ID,
+    c.Class_Name,
+    c.Class_Type,
+    t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
+    t.Specialization,
+    c.Schedule_Day,
+    c.Schedule_Time,
+    c.Duration_Minutes,
+    c.Max_Capacity
+FROM Classes c
+JOIN Trainers t ON c.Trainer_ID = t.Trainer_ID
+ORDER BY 
+    CASE c.Schedule_Day
+        WHEN 'Monday' THEN 1
+        WHEN 'Tuesday' THEN 2
+        WHEN 'Wednesday' THEN 3
+        WHEN 'Thursday' THEN 4
+        WHEN 'Friday' THEN 5
+        WHEN 'Saturday' THEN 6
+        WHEN 'Sunday' THEN 7
+    END,
+    c.Schedule_Time
+'''
+
+def get_class_schedule_join():
+    """JOIN: Get class schedule with trainer information"""
+    return run_query(CLASS_SCHEDULE_QUERY)
+
+MEMBER_BOOKINGS_QUERY = '''
+SELECT 
+    m.First_Name || ' ' || m.Last_Name AS Member_Name,
+    c.Class_Name,
+    c.Class_Type,
+    t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
+    c.Schedule_Day,
+    c.Schedule_Time,
+    cb.Booking_Date,
+    cb.Attendance_Status
+FROM Class_Bookings cb
+JOIN Members m ON cb.Member_ID = m.Member_ID
+JOIN Classes c ON cb.Class_ID = c.Class_ID
+JOIN Trainers t ON c.Trainer_ID = t.Trainer_ID
+ORDER BY cb.Booking_Date DESC, m.Last_Name
+'''
+
+def get_member_bookings_join():
+    """JOIN: Get member bookings with class and trainer details"""
+    return run_query(MEMBER_BOOKINGS_QUERY)
+
+# Trainer_Workload is kept current by triggers on Trainers and Classes
+TRAINER_WORKLOAD_QUERY = '''
+SELECT
+    t.Trainer_ID,
+    t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
+    t.Specialization,
+    w.Class_Count AS Number_of_Classes,
+    w.Weekly_Minutes,
+    w.Class_Names AS Classes_Teaching
+FROM Trainer_Workload w
+JOIN Trainers t ON t.Trainer_ID = w.Trainer_ID
+ORDER BY Number_of_Classes DESC
+'''
+
+def get_trainer_workload_join():
+    """JOIN: Get trainer workload (number of classes per trainer)"""
+    return run_query(TRAINER_WORKLOAD_QUERY)
+
+# One Class_Weekly_Utilization primary-key lookup per class; classes without
+# bookings that week show zeros
+CLASS_UTILIZATION_QUERY = '''
+SELECT
+    c.Class_ID,
+    c.Class_Name,
+    c.Schedule_Day,
+    c.Schedule_Time,
+    t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
+    c.Max_Capacity,
+    COALESCE(u.Bookings, 0) AS Bookings,
+    COALESCE(u.Attended, 0) AS Attended,
+    COALESCE(u.No_Shows, 0) AS No_Shows,
+    COALESCE(u.Cancellations, 0) AS Cancellations,
+    ROUND(100.0 * COALESCE(u.Bookings, 0) / c.Max_Capacity, 1) AS Utilization_Pct
+FROM Classes c
+JOIN Trainers t ON t.Trainer_ID = c.Trainer_ID
+LEFT JOIN Class_Weekly_Utilization u ON u.Week_Start = ? AND u.Class_ID = c.Class_ID
+ORDER BY Utilization_Pct DESC, c.Class_Name
+'''
+
+def week_start(day):
+    """Monday of the week containing `day` (same rule as the utilization triggers)"""
+    return day - timedelta(days=day.weekday())
+
+def get_class_utilization(day=None):
+    """Bookings, attendance and % of capacity per class for the week containing `day`"""
+    return run_query(CLASS_UTILIZATION_QUERY, (week_start(day or date.today()).isoformat(),))
+
+# CHANGE LOG
+
+CHANGE_LOG_BATCH_SIZE = 1000
+
+# Readers of Change_Log record the last Seq they applied under these
+# Job_Watermarks names; entries all of them have read can be pruned
+GENERATIONS_CHANGES_JOB = 'table_generations_changes'
+CHECKIN_CHANGES_JOB = 'check_in_changes'
+CHANGE_LOG_CONSUMERS = (GENERATIONS_CHANGES_JOB, CHECKIN_CHANGES_JOB, SESSIONS_CHANGES_JOB)
+# Lowest Seq still in the log; a reader behind it has missed entries and rebuilds
+CHANGE_LOG_PRUNED_JOB = 'change_log_pruned'
+# A consumer that has not reported for this long no longer holds entries back
+CHANGE_LOG_CONSUMER_TTL_DAYS = 7
+# Prune once at least this many entries can go
+CHANGE_LOG_PRUNE_MIN = 10000
+# Entries deleted per transaction, so a large prune never holds the write lock for long
+CHANGE_LOG_PRUNE_BATCH = 5000
+
+def _latest_change_seq(conn):
+    # The AUTOINCREMENT counter, not MAX(Seq): it survives pruning the whole log
+    return conn.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'Change_Log'), 0)").fetchone()[0]
+
+def _read_changes(conn, seq, table_names=None, limit=CHANGE_LOG_BATCH_SIZE):
+    """Up to `limit` (Seq, Table_Name, Row_ID, Op) rows after seq, oldest first"""
+    query = 'SELECT Seq, Table_Name, Row_ID, Op FROM Change_Log WHERE Seq > ?'
+    params = [seq]
+    if table_names:
+        query += f" AND Table_Name IN ({', '.join('?' * len(table_names))})"
+        params.extend(table_names)
+    query += ' ORDER BY Seq LIMIT ?'
+    params.append(limit)
+    return conn.execute(query, params).fetchall()
+
+def latest_change_seq():
+    with get_connection() as conn:
+        return _latest_change_seq(conn)
+
+def changes_since(seq=0, table_names=None, batch_size=CHANGE_LOG_BATCH_SIZE):
+    """Yield (Seq, Table_Name, Row_ID, Op) for every change after seq, oldest first.
+
+    Pages through the log by Seq, borrowing a connection per page, so the
+    consumer can do its own database work between rows. Remember the last Seq
+    seen and pass it next time to pick up where it left off.
+    """
+    while True:
+        with get_connection() as conn:
+            rows = _read_changes(conn, seq, table_names, batch_size)
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        seq = rows[-1][0]
+
+def _log_truncated(conn, seq):
+    """True if entries after seq were pruned, i.e. a reader at seq has missed changes"""
+    return seq + 1 < int(get_watermark(conn, CHANGE_LOG_PRUNED_JOB, '0'))
+
+def _prune_change_log_batch(conn, before_seq, batch_size):
+    # Delete the oldest batch_size entries below before_seq; the pruned mark
+    # only moves past what is actually gone
+    last = conn.execute('''
+        SELECT MAX(Seq), COUNT(*) FROM (
+            SELECT Seq FROM Change_Log WHERE Seq < ? ORDER BY Seq LIMIT ?
+        )
+    ''', (before_seq, batch_size)).fetchone()
+    last_seq, found = last
+    removed = conn.execute('DELETE FROM Change_Log WHERE Seq <= ?', (last_seq,)).rowcount if found else 0
+    pruned_to = before_seq if found < batch_size else last_seq + 1
+    if pruned_to > int(get_watermark(conn, CHANGE_LOG_PRUNED_JOB, '0')):
+        set_watermark(conn, CHANGE_LOG_PRUNED_JOB, str(pruned_to))
+    return removed, found < batch_size
+
+def prune_change_log(before_seq, batch_size=CHANGE_LOG_PRUNE_BATCH):
+    """Drop entries with Seq < before_seq, whether or not every consumer has read them.
+
+    Deletes batch_size entries per transaction so writers are not stalled
+    behind one huge DELETE.
+    """
+    total = 0
+    done = False
+    while not done:
+        with get_connection() as conn:
+            _begin_immediate(conn)
+            removed, done = _prune_change_log_batch(conn, before_seq, batch_size)
+        total += removed
+    return total
+
+def _consumed_change_seq(conn):
+    # Lowest Seq every live consumer has read; a registered consumer with no
+    # watermark yet has read nothing. None if every consumer has gone stale.
+    cutoff = (datetime.now() - timedelta(days=CHANGE_LOG_CONSUMER_TTL_DAYS)).isoformat(timespec='seconds')
+    reported = {job_name: (int(watermark), updated_at) for job_name, watermark, updated_at in conn.execute(f'''
+        SELECT Job_Name, Watermark, Updated_At FROM Job_Watermarks
+        WHERE Job_Name IN ({', '.join('?' * len(CHANGE_LOG_CONSUMERS))})
+    ''', CHANGE_LOG_CONSUMERS)}
+    live = [reported[job_name][0] if job_name in reported else 0
+            for job_name in CHANGE_LOG_CONSUMERS
+            if job_name not in reported or reported[job_name][1] >= cutoff]
+    return min(live) if live else None
+
+def prune_consumed_changes(min_entries=CHANGE_LOG_PRUNE_MIN, batch_size=CHANGE_LOG_PRUNE_BATCH):
+    """Delete the entries every consumer in CHANGE_LOG_CONSUMERS has read.
+
+    Nothing is removed until at least min_entries can go, so this is cheap to
+    call often. A consumer that has never reported holds everything back;
+    one that has not reported for CHANGE_LOG_CONSUMER_TTL_DAYS is not waited
+    for and rebuilds on return.
+    """
+    with get_connection() as conn:
+        oldest = _consumed_change_seq(conn)
+        pruned = int(get_watermark(conn, CHANGE_LOG_PRUNED_JOB, '0'))
+    if oldest is None or oldest + 1 - pruned < min_entries:
+        return 0
+    return prune_change_log(oldest + 1, batch_size)
+
+# CACHED READS
+
+READ_CACHE_TTL_SECONDS = 600
+
+# Deleting a parent row also removes rows in these tables (ON DELETE CASCADE)
+CASCADE_TABLES = {
+    'Members': ('Member_Memberships', 'Class_Bookings', 'Waitlist'),
+    'Classes': ('Class_Bookings', 'Waitlist'),
+}
+
+
+class TableGenerations:
+    """Per-table write counters; a cached read is valid while its counter is unchanged"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self.synced_seq = None
+
+    def get(self, table_name):
+        with self._lock:
+            return self._counts.get(table_name, 0)
+
+    def bump(self, table_names):
+        with self._lock:
+            for table_name in table_names:
+                self._counts[table_name] = self._counts.get(table_name, 0) + 1
+
+
+@st.cache_resource
+def _shared_generations(db_path):
+    return TableGenerations()
+
+def _bump_generations(table_names):
+    if table_names:
+        _shared_generations(DB_PATH).bump(table_names)
+
+def table_generation(*table_names):
+    generations = _shared_generations(DB_PATH)
+    return tuple(generations.get(table_name) for table_name in table_names)
+
+def sync_table_generations():
+    """Bump generations for tables changed outside this process (CLI imports, cron jobs).
+
+    Reads the change log past the last Seq synced; the first call only records
+    the current position. In-process writes are bumped again here, which costs
+    at most one extra cache miss. The position is saved for the change log
+    pruner (start_change_log_pruner).
+    """
+    generations = _shared_generations(DB_PATH)
+    with get_connection() as conn:
+        since = generations.synced_seq
+        latest = _latest_change_seq(conn)
+        if since is None or latest < since:
+            generations.synced_seq = latest
+            return set()
+        if latest == since:
+            return set()
+        if _log_truncated(conn, since):
+            # Entries we had not read yet were pruned, so assume every table changed
+            tables = set(REPOSITORIES)
+        else:
+            tables = {row[0] for row in conn.execute(
+                'SELECT DISTINCT Table_Name FROM Change_Log WHERE Seq > ? AND Seq <= ?', (since, latest))}
+        set_watermark(conn, GENERATIONS_CHANGES_JOB, str(latest))
+    tables.update(*(CASCADE_TABLES.get(table_name, ()) for table_name in tables))
+    generations.bump(tables)
+    generations.synced_seq = latest
+    return tables
+
+def invalidate_tables(*table_names, cascade=False):
+    """Mark tables as written; cached reads are dropped when the transaction commits.
+
+    cascade=True (deletes) also covers the ON DELETE CASCADE child tables.
+    """
+    tables = set(table_names)
+    if cascade:
+        for table_name in table_names:
+            tables.update(CASCADE_TABLES.get(table_name, ()))
+    if getattr(_local, 'conn', None) is not None:
+        _local.written_tables.update(tables)
+    else:
+        _bump_generations(tables)
+
+@st.cache_data(ttl=READ_CACHE_TTL_SECONDS, max_entries=64, show_spinner=False)
+def _cached_table(table_name, generation, db_path):
+    return get_all_records(table_name)
+
+def get_cached_records(table_name):
+    """SELECT * served from memory until a write touches the table (or the TTL passes)"""
+    return _cached_table(table_name, table_generation(table_name), DB_PATH)
+
+# UTILITY FUNCTIONS
+
+def get_all_records(table_name):
+    """Get all records from a table"""
+    return run_query(f'SELECT * FROM {table_name}')
+
+def get_members():
+    return get_cached_records('Members')
+
+def get_trainers():
+    return get_cached_records('Trainers')
+
+def get_classes():
+    return get_cached_records('Classes')
+
+def get_bookings():
+    return get_cached_records('Class_Bookings')
+
+def get_membership_plans():
+    return get_cached_records('Membership_Plans')
+
+# OPTION LISTS
+
+MEMBER_SEARCH_LIMIT = 50
+
+def build_options(df, labels, id_column):
+    """label -> ID mapping from a label Series built with vectorized string ops"""
+    return dict(zip(labels.tolist(), df[id_column].tolist()))
+
+def get_plan_options():
+    df = get_membership_plans()
+    labels = df['Plan_Name'] + ' - $' + df['Price'].astype(str) + ' (' + df['Duration_Months'].astype(str) + ' months)'
+    return build_options(df, labels, 'Plan_ID')
+
+def get_trainer_options():
+    df = get_trainers()
+    labels = df['First_Name'] + ' ' + df['Last_Name'] + ' (' + df['Specialization'] + ')'
+    return build_options(df, labels, 'Trainer_ID')
+
+def get_class_options():
+    df = get_classes()
+    labels = df['Class_Name'] + ' - ' + df['Schedule_Day'] + ' ' + df['Schedule_Time']
+    return build_options(df, labels, 'Class_ID')
+
+# One branch per searched column, each a range SEEK on that column's index.
+# The last-name branch reads its index in display order and stops at :limit.
+MEMBER_SEARCH_BRANCH = '''
+    SELECT * FROM (
+        SELECT Member_ID, First_Name, Last_Name FROM Members
+        WHERE {column} >= :low AND {column} < :high
+        ORDER BY Last_Name COLLATE NOCASE, First_Name COLLATE NOCASE
+        LIMIT :limit
+    )'''
+MEMBER_SEARCH_COLUMNS = ('Last_Name COLLATE NOCASE', 'First_Name COLLATE NOCASE', 'Email COLLATE NOCASE', 'Phone')
+# Sorts after every character, so [text, text + this) holds all strings starting with text
+SEARCH_PREFIX_END = '\U0010ffff'
+
+def _member_search_query(columns):
+    branches = ' UNION '.join(MEMBER_SEARCH_BRANCH.format(column=column) for column in columns)
+    return f'''
+SELECT First_Name || ' ' || Last_Name || ' (ID: ' || Member_ID || ')' AS Label, Member_ID
+FROM ({branches})
+ORDER BY Last_Name COLLATE NOCASE, First_Name COLLATE NOCASE
+LIMIT :limit
+'''
+
+MEMBER_SEARCH_QUERY = _member_search_query(MEMBER_SEARCH_COLUMNS)
+# With nothing typed every member matches, so the name branch alone gives the first page
+MEMBER_LIST_QUERY = _member_search_query(MEMBER_SEARCH_COLUMNS[:1])
+
+def search_members(text, limit=MEMBER_SEARCH_LIMIT):
+    """label -> Member_ID for members whose first/last name, email or phone starts with text"""
+    query = MEMBER_SEARCH_QUERY if text else MEMBER_LIST_QUERY
+    with get_connection() as conn:
+        return dict(conn.execute(query, {'low': text, 'high': text + SEARCH_PREFIX_END, 'limit': limit}).fetchall())
+
+# ENROLLMENT
+
+@st.cache_data(ttl=READ_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_plan_durations(generation, db_path):
+    with get_connection() as conn:
+        return dict(conn.execute('SELECT Plan_ID, Duration_Months FROM Membership_Plans').fetchall())
+
+def get_plan_durations():
+    """Plan_ID -> Duration_Months, served from memory until Membership_Plans is written"""
+    return _cached_plan_durations(table_generation('Membership_Plans'), DB_PATH)
+
+def _enroll(conn, durations, first_name, last_name, email, phone, dob, join_date, status,
+            plan_id, start_date, payment_status):
+    """Insert a member and their first membership on an open connection; returns the Member_ID"""
+    duration = durations.get(plan_id)
+    if duration is None:
+        raise ValueError(f"Unknown membership plan: {plan_id}")
+    if isinstance(start_date, str):
+        start_date = date.fromisoformat(start_date)
+    end_date = start_date + timedelta(days=duration * 30)
+
+    cursor = conn.execute(members_repo.insert_sql, (first_name, last_name, email, phone, dob, join_date, status))
+    member_id = cursor.lastrowid
+    conn.execute(memberships_repo.insert_sql, (member_id, plan_id, start_date, end_date, payment_status, 1))
+    return member_id
+
+def enroll_member(first_name, last_name, email, phone, dob, join_date, status,
+                  plan_id, start_date, payment_status):
+    """Add a member together with their initial membership in one transaction.
+
+    Either both rows are written or neither is, so there is never a member
+    without a plan.
+    """
+    durations = get_plan_durations()
+    try:
+        with get_connection() as conn:
+            _enroll(conn, durations, first_name, last_name, email, phone, dob, join_date, status,
+                    plan_id, start_date, payment_status)
+            invalidate_tables('Members', 'Member_Memberships')
+        return True, "Member added successfully!"
+    except (sqlite3.IntegrityError, ValueError) as e:
+        return False, f"Error: {str(e)}"
+
+def enroll_members(enrollments):
+    """Enroll many members in a single transaction.
+
+    `enrollments` is an iterable of dicts with the enroll_member() argument
+    names. Each one runs under its own savepoint, so a duplicate email or an
+    unknown plan rejects only that entry. Returns a summary dict with the new
+    Member_IDs and (position, reason) rejections, positions starting at 1.
+    """
+    durations = get_plan_durations()
+    result = {'enrolled': 0, 'rejected': 0, 'member_ids': [], 'rejections': []}
+    with get_connection() as conn:
+        # An outermost RELEASE would commit each entry on its own; nested in
+        # this transaction the savepoints only scope the rollback
+        _begin_immediate(conn)
+        for position, enrollment in enumerate(enrollments, start=1):
+            conn.execute('SAVEPOINT enroll')
+            try:
+                member_id = _enroll(conn, durations, **enrollment)
+            except (sqlite3.IntegrityError, ValueError, TypeError) as e:
+                conn.execute('ROLLBACK TO enroll')
+                result['rejections'].append((position, str(e)))
+            else:
+                result['member_ids'].append(member_id)
+            conn.execute('RELEASE enroll')
+        invalidate_tables('Members', 'Member_Memberships')
+    result['enrolled'] = len(result['member_ids'])
+    result['rejected'] = len(result['rejections'])
+    return result
+
+# PAGINATED BROWSING
+
+TABLE_PRIMARY_KEYS = {
+    'Members': 'Member_ID',
+    'Membership_Plans': 'Plan_ID',
+    'Member_Memberships': 'Membership_Record_ID',
+    'Trainers': 'Trainer_ID',
+    'Classes': 'Class_ID',
+    'Class_Bookings': 'Booking_ID',
+    'Waitlist': 'Waitlist_ID',
+    'Check_Ins': 'Check_In_ID',
+}
+DEFAULT_PAGE_SIZE = 50
+
+def get_table_columns(table_name):
+    if table_name not in TABLE_PRIMARY_KEYS:
+        raise ValueError(f"Unknown table: {table_name}")
+    with get_connection() as conn:
+        return [row[1] for row in conn.execute(f'PRAGMA table_info({table_name})')]
+
+def _page_where(table_name, filters, search):
+    """WHERE clause + params for equality filters and a free-text search"""
+    columns = get_table_columns(table_name)
+    clauses, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in columns:
+            raise ValueError(f"Unknown column {column} for {table_name}")
+        clauses.append(f'{column} = ?')
+        params.append(value)
+    if search:
+        clauses.append('(' + ' OR '.join(f'{column} LIKE ?' for column in columns) + ')')
+        params.extend([f'%{search}%'] * len(columns))
+    return clauses, params
+
+def get_records_page(table_name, page_size=DEFAULT_PAGE_SIZE, after=None, filters=None,
+                     search=None, sort_column=None, descending=False):
+    """Keyset-paginated page of a table.
+
+    `after` is the cursor returned for the previous page: the (sort key, primary
+    key) of its last row. Returns (DataFrame, next_cursor); next_cursor is None
+    on the last page. Only page_size + 1 rows are ever read.
+    """
+    pk = TABLE_PRIMARY_KEYS.get(table_name)
+    if pk is None:
+        raise ValueError(f"Unknown table: {table_name}")
+    sort_column = sort_column or pk
+    if sort_column not in get_table_columns(table_name):
+        raise ValueError(f"Unknown column {sort_column} for {table_name}")
+
+    # COALESCE keeps NULLs comparable so the row-value keyset stays consistent
+    sort_key = pk if sort_column == pk else f"COALESCE({sort_column}, '')"
+    direction, op = ('DESC', '<') if descending else ('ASC', '>')
+
+    clauses, params = _page_where(table_name, filters, search)
+    if after is not None:
+        if sort_column == pk:
+            clauses.append(f'{pk} {op} ?')
+            params.append(after[1])
+        else:
+            clauses.append(f'({sort_key}, {pk}) {op} (?, ?)')
+            params.extend(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+    query = f'''
+        SELECT *, {sort_key} AS _Sort_Key FROM {table_name}
+        {where}
+        ORDER BY {sort_key} {direction}, {pk} {direction}
+        LIMIT ?
+    '''
+    with get_connection() as conn:
+        cursor = conn.execute(query, params + [page_size + 1])
+        names = [col[0] for col in cursor.description]
+        rows = cursor.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = None
+    if has_more:
+        last = dict(zip(names, rows[-1]))
+        next_cursor = (last['_Sort_Key'], last[pk])
+    df = pd.DataFrame.from_records(rows, columns=names).drop(columns=['_Sort_Key'])
+    return df, next_cursor
+
+def count_records(table_name, filters=None, search=None):
+    clauses, params = _page_where(table_name, filters, search)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    with get_connection() as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {table_name} {where}', params).fetchone()[0]
+
+def table_has_rows(table_name):
+    if table_name not in TABLE_PRIMARY_KEYS:
+        raise ValueError(f"Unknown table: {table_name}")
+    with get_connection() as conn:
+        return bool(conn.execute(f'SELECT EXISTS(SELECT 1 FROM {table_name})').fetchone()[0])
+
+# DASHBOARD METRICS
+
+METRICS_TTL_SECONDS = 30
+
+# Bookings today count the seats taken, like Class_Seat_Counts: cancelled rows
+# are left out (one covering-index seek per live status)
+DASHBOARD_METRICS_QUERY = '''
+SELECT
+    (SELECT COUNT(*) FROM Members) AS total_members,
+    (SELECT COUNT(*) FROM Trainers) AS total_trainers,
+    (SELECT COUNT(*) FROM Classes) AS total_classes,
+    (SELECT COUNT(*) FROM Member_Memberships WHERE Is_Active = 1) AS active_memberships,
+    (SELECT COUNT(*) FROM Class_Bookings
+     WHERE Attendance_Status IN ('Booked', 'Attended', 'No-Show') AND Booking_Date = ?) AS bookings_today,
+    (SELECT COUNT(*) FROM Class_Bookings WHERE Attendance_Status = 'No-Show') AS no_shows,
+    (SELECT COUNT(*) FROM Class_Bookings WHERE Attendance_Status IN ('Attended', 'No-Show')) AS completed_bookings
+'''
+
+@st.cache_data(ttl=METRICS_TTL_SECONDS)
+def get_dashboard_metrics(today=None, generation=None):
+    """All Home page counts in one aggregate query, as plain ints.
+
+    Pass table_generation(...) of the counted tables as `generation` to
+    refresh as soon as one of them is written rather than after the TTL.
+    """
+    today = today or date.today().isoformat()
+    with get_connection() as conn:
+        cursor = conn.execute(DASHBOARD_METRICS_QUERY, (today,))
+        names = [col[0] for col in cursor.description]
+        metrics = {name: int(value) for name, value in zip(names, cursor.fetchone())}
+
+    completed = metrics.pop('completed_bookings')
+    no_shows = metrics.pop('no_shows')
+    metrics['no_show_rate_pct'] = round(100 * no_shows / completed) if completed else 0
+    return metrics
+
+# BULK IMPORT
+
+IMPORT_CHUNK_SIZE = 5000
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Per table: insert columns plus the CHECK / NOT NULL rules validated up front
+IMPORT_SPECS = {
+    'Members': {
+        'columns': ['First_Name', 'Last_Name', 'Email', 'Phone', 'Date_of_Birth', 'Join_Date', 'Status'],
+        'defaults': {'Status': 'Active'},
+        'dates': ['Date_of_Birth', 'Join_Date'],
+        'allowed': {'Status': ('Active', 'Inactive')},
+        'positive': [],
+    },
+    'Trainers': {
+        'columns': ['First_Name', 'Last_Name', 'Specialization', 'Email', 'Phone', 'Hire_Date'],
+        'defaults': {},
+        'dates': ['Hire_Date'],
+        'allowed': {},
+        'positive': [],
+    },
+    'Classes': {
+        'columns': ['Class_Name', 'Class_Type', 'Trainer_ID', 'Schedule_Day', 'Schedule_Time',
+                    'Duration_Minutes', 'Max_Capacity'],
+        'defaults': {},
+        'dates': [],
+        'allowed': {'Schedule_Day': tuple(WEEKDAYS)},
+        'positive': ['Trainer_ID', 'Duration_Minutes', 'Max_Capacity'],
+    },
+    'Class_Bookings': {
+        'columns': ['Member_ID', 'Class_ID', 'Booking_Date', 'Attendance_Status'],
+        'defaults': {'Attendance_Status': 'Booked'},
+        'dates': ['Booking_Date'],
+        'allowed': {'Attendance_Status': ('Booked', 'Attended', 'Cancelled', 'No-Show')},
+        'positive': ['Member_ID', 'Class_ID'],
+    },
+}
+
+def _check_booking_sessions(conn, rows):
+    """Keep bookings that fall on a class session; the others get _check_session()'s reason.
+
+    Past dates are outside the generated sessions and are not looked up.
+    """
+    today = str(date.today())
+    upcoming = [row for row in rows if row[3] >= today]
+    if not upcoming:
+        return rows, []
+    _sync_class_sessions(conn, today)
+    class_ids = sorted({int(row[2]) for row in upcoming})
+    dates = [row[3] for row in upcoming]
+    sessions = set()
+    for start in range(0, len(class_ids), SQL_VARIABLE_CHUNK):
+        chunk = class_ids[start:start + SQL_VARIABLE_CHUNK]
+        sessions.update(conn.execute(f'''
+            SELECT Class_ID, Session_Date FROM Class_Sessions
+            WHERE Class_ID IN ({', '.join('?' * len(chunk))}) AND Session_Date BETWEEN ? AND ?
+        ''', (*chunk, min(dates), max(dates))).fetchall())
+    accepted, rejections = [], []
+    for row in rows:
+        try:
+            # Past rows are left to the FOREIGN KEY, which catches unknown classes
+            if row[3] >= today and (int(row[2]), row[3]) not in sessions:
+                _check_session(conn, row[2], row[3])
+            accepted.append(row)
+        except ValueError as e:
+            rejections.append((row[0], str(e)))
+    return accepted, rejections
+
+# Checks run on each validated chunk before it is inserted: given the open
+# connection and the (row number, *values) tuples, they return the rows to
+# insert and (row number, reason) rejections for the rest.
+IMPORT_CHUNK_CHECKS = {
+    'Classes': _check_class_slots,
+    'Class_Bookings': _check_booking_sessions,
+}
+
+def _read_chunks(source, file_format, chunk_size):
+    """Yield DataFrames of at most chunk_size rows from a CSV or Parquet file/buffer"""
+    if file_format == 'csv':
+        yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    elif file_format == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet import needs the optional 'pyarrow' package")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            df = batch.to_pandas()
+            for column in df.select_dtypes(include='datetime').columns:
+                df[column] = df[column].dt.strftime('%Y-%m-%d')
+            yield df.astype(str)
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+def _validate_chunk(df, spec):
+    """Vectorized checks; returns (clean DataFrame, Series of rejection reasons for bad rows)"""
+    df = df.copy()
+    for column, default in spec['defaults'].items():
+        if column not in df:
+            df[column] = default
+        df[column] = df[column].replace('', default)
+
+    reasons = pd.Series('', index=df.index)
+
+    def reject(mask, message):
+        nonlocal reasons
+        reasons = reasons.mask((reasons == '') & mask, message)
+
+    for column in spec['columns']:
+        df[column] = df[column].astype(str).str.strip()
+        reject(df[column].isin(['', 'nan', 'None']), f"{column} is required")
+    for column in spec['dates']:
+        parsed = pd.to_datetime(df[column], format='%Y-%m-%d', errors='coerce')
+        reject(parsed.isna(), f"{column} must be a YYYY-MM-DD date")
+        df[column] = parsed.dt.strftime('%Y-%m-%d')
+    for column, allowed in spec['allowed'].items():
+        reject(~df[column].isin(allowed), f"{column} must be one of {', '.join(allowed)}")
+    for column in spec['positive']:
+        numbers = pd.to_numeric(df[column], errors='coerce')
+        reject(numbers.isna() | (numbers <= 0) | (numbers % 1 != 0), f"{column} must be a positive integer")
+        df[column] = numbers
+    if 'Schedule_Time' in spec['columns']:
+        reject(~df['Schedule_Time'].str.fullmatch(r'([01]\d|2[0-3]):[0-5]\d'), "Schedule_Time must be HH:MM")
+
+    bad = reasons != ''
+    clean = df.loc[~bad, spec['columns']]
+    for column in spec['positive']:
+        clean[column] = clean[column].astype('int64')
+    return clean, reasons[bad]
+
+def import_records(table_name, source, file_format='csv', chunk_size=IMPORT_CHUNK_SIZE):
+    """Stream a CSV/Parquet file into a table in batched transactions.
+
+    Each chunk is validated in bulk, then inserted with executemany inside one
+    transaction. If a UNIQUE/FOREIGN KEY constraint trips, the chunk is rolled
+    back to a savepoint and replayed row by row to collect per-row rejections.
+    Tables in IMPORT_CHUNK_CHECKS have each chunk screened first.
+    Row numbers in rejections are 1-based data rows (header excluded).
+    """
+    spec = IMPORT_SPECS.get(table_name)
+    if spec is None:
+        raise ValueError(f"Bulk import is not supported for {table_name}")
+    placeholders = ', '.join('?' * len(spec['columns']))
+    insert_sql = f"INSERT INTO {table_name} ({', '.join(spec['columns'])}) VALUES ({placeholders})"
+
+    result = {'table': table_name, 'read': 0, 'inserted': 0, 'rejected': 0, 'rejections': []}
+    started = time.perf_counter()
+    chunk_check = IMPORT_CHUNK_CHECKS.get(table_name)
+    for chunk in _read_chunks(source, file_format, chunk_size):
+        chunk.index = range(result['read'] + 1, result['read'] + len(chunk) + 1)
+        result['read'] += len(chunk)
+        missing = [c for c in spec['columns'] if c not in chunk and c not in spec['defaults']]
+        if missing:
+            raise ValueError(f"Missing column(s) for {table_name}: {', '.join(missing)}")
+
+        clean, rejected = _validate_chunk(chunk, spec)
+        result['rejections'].extend(zip(rejected.index.tolist(), rejected.tolist()))
+        rows = list(clean.itertuples(index=True, name=None))
+
+        with get_connection() as conn:
+            if chunk_check is not None and rows:
+                rows, refused = chunk_check(conn, rows)
+                result['rejections'].extend(refused)
+            conn.execute('SAVEPOINT import_chunk')
+            try:
+                conn.executemany(insert_sql, [row[1:] for row in rows])
+                inserted = len(rows)
+            except sqlite3.IntegrityError:
+                conn.execute('ROLLBACK TO import_chunk')
+                inserted = 0
+                for row in rows:
+                    try:
+                        conn.execute(insert_sql, row[1:])
+                        inserted += 1
+                    except sqlite3.IntegrityError as e:
+                        result['rejections'].append((row[0], str(e)))
+            conn.execute('RELEASE import_chunk')
+            invalidate_tables(table_name)
+        result['inserted'] += inserted
+
+    result['rejections'].sort()
+    result['rejected'] = len(result['rejections'])
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    result['rows_per_sec'] = round(result['inserted'] / result['seconds'], 1) if result['seconds'] else 0.0
+    return result
+
+# BULK EXPORT
+
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+
+# Everything that can be exported: the six tables and the canned JOIN reports
+EXPORT_SOURCES = {
+    'Members': 'SELECT * FROM Members ORDER BY Member_ID',
+    'Membership_Plans': 'SELECT * FROM Membership_Plans ORDER BY Plan_ID',
+    'Member_Memberships': 'SELECT * FROM Member_Memberships ORDER BY Membership_Record_ID',
+    'Trainers': 'SELECT * FROM Trainers ORDER BY Trainer_ID',
+    'Classes': 'SELECT * FROM Classes ORDER BY Class_ID',
+    'Class_Bookings': 'SELECT * FROM Class_Bookings ORDER BY Booking_ID',
+    'Members & Memberships': MEMBER_MEMBERSHIPS_QUERY,
+    'Class Schedule': CLASS_SCHEDULE_QUERY,
+    'Member Bookings': MEMBER_BOOKINGS_QUERY,
+    'Trainer Workload': TRAINER_WORKLOAD_QUERY,
+}
+
+# SQLite column affinity (first matching rule wins) -> Arrow type; DATE and
+# undeclared expression columns are stored as text
+ARROW_AFFINITY = (('INT', 'int64'), ('CHAR', 'string'), ('CLOB', 'string'), ('TEXT', 'string'),
+                  ('REAL', 'float64'), ('FLOA', 'float64'), ('DOUB', 'float64'))
+
+def _arrow_schema(conn, query, pa):
+    """Arrow schema for a query from its declared column types.
+
+    Built once up front so every chunk is written with the same types, even
+    when a column happens to be all NULL in the first chunk.
+    """
+    conn.execute('DROP VIEW IF EXISTS temp.export_columns')
+    conn.execute(f'CREATE TEMP VIEW export_columns AS {query}')
+    try:
+        columns = conn.execute('PRAGMA temp.table_info(export_columns)').fetchall()
+    finally:
+        conn.execute('DROP VIEW temp.export_columns')
+    fields = []
+    for col in columns:
+        declared = (col[2] or '').upper()
+        type_name = next((t for key, t in ARROW_AFFINITY if key in declared), 'string')
+        fields.append(pa.field(col[1], getattr(pa, type_name)()))
+    return pa.schema(fields)
+
+def _iter_chunks(cursor, chunk_size):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+def export_records(source, path, file_format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream an export source to a CSV, JSONL or Parquet file.
+
+    Rows are pulled from the cursor chunk_size at a time and written straight
+    out, so memory stays flat regardless of table size.
+    """
+    query = EXPORT_SOURCES.get(source)
+    if query is None:
+        raise ValueError(f"Unknown export source: {source}")
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+    started = time.perf_counter()
+    rows_written = 0
+    with get_connection() as conn:
+        if file_format == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ValueError("Parquet export needs the optional 'pyarrow' package")
+            schema = _arrow_schema(conn, query, pa)
+        cursor = conn.execute(query)
+        names = [col[0] for col in cursor.description]
+
+        if file_format == 'csv':
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(names)
+                for rows in _iter_chunks(cursor, chunk_size):
+                    writer.writerows(rows)
+                    rows_written += len(rows)
+
+        elif file_format == 'jsonl':
+            with open(path, 'w', encoding='utf-8') as f:
+                for rows in _iter_chunks(cursor, chunk_size):
+                    f.writelines(json.dumps(dict(zip(names, row))) + '\n' for row in rows)
+                    rows_written += len(rows)
+
+        else:
+            with pq.ParquetWriter(path, schema) as writer:
+                for rows in _iter_chunks(cursor, chunk_size):
+                    columns = zip(*rows)
+                    writer.write_table(pa.Table.from_arrays(
+                        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                        schema=schema))
+                    rows_written += len(rows)
+
+    seconds = round(time.perf_counter() - started, 3)
+    return {'source': source, 'rows': rows_written, 'seconds': seconds, 'path': path}
+
+# CHECK-IN
+
+CHECKIN_BATCH_SIZE = 200
+CHECKIN_FLUSH_SECONDS = 2.0
+CHECKIN_REFRESH_SECONDS = 5.0
+# Past this many pending changes a full rebuild is cheaper than replaying them
+CHECKIN_REBUILD_CHANGES = 5000
+CHECKIN_SOURCE_TABLES = ('Members', 'Member_Memberships')
+
+# Latest End_Date among a member's active memberships (NULL if none)
+ACTIVE_UNTIL_QUERY = '''
+SELECT m.Member_ID, m.Email, m.Phone, m.Status,
+       MAX(CASE WHEN mm.Is_Active = 1 THEN mm.End_Date END) AS Active_Until
+FROM Members m
+LEFT JOIN Member_Memberships mm ON mm.Member_ID = m.Member_ID
+{where}
+GROUP BY m.Member_ID
+'''
+
+
+class CheckInDesk:
+    """Admission decisions served from memory; check-ins are buffered and written in batches.
+
+    The index maps Member_ID -> (Status, Active_Until, email key, phone) and
+    email/phone -> Member_ID. It is loaded once, then kept current by replaying
+    Change_Log entries for Members and Member_Memberships.
+    """
+
+    def __init__(self, connection=None):
+        self._connection = connection or get_connection
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._members = {}
+        self._keys = {}
+        self._seq = 0
+        self._generation = None
+        self._refreshed_at = 0.0
+        self._pending = []
+        self.stats = {'rebuilds': 0, 'catch_ups': 0, 'flushes': 0, 'written': 0}
+
+    def _forget(self, member_ids):
+        with self._lock:
+            for member_id in member_ids:
+                entry = self._members.pop(member_id, None)
+                if entry is not None:
+                    self._keys.pop(entry[2], None)
+                    self._keys.pop(entry[3], None)
+
+    def _apply(self, rows):
+        with self._lock:
+            for member_id, email, phone, status, active_until in rows:
+                self._members[member_id] = (status, active_until, email.lower(), phone)
+                self._keys[email.lower()] = member_id
+                self._keys[phone] = member_id
+
+    def _rebuild(self, conn):
+        # Read the log position first; changes racing the load are replayed
+        # again later, which is harmless
+        seq = _latest_change_seq(conn)
+        rows = conn.execute(ACTIVE_UNTIL_QUERY.format(where='')).fetchall()
+        with self._lock:
+            self._members, self._keys = {}, {}
+        self._apply(rows)
+        self._seq = seq
+        set_watermark(conn, CHECKIN_CHANGES_JOB, str(seq))
+        self.stats['rebuilds'] += 1
+
+    def rebuild(self):
+        with self._connection() as conn:
+            self._rebuild(conn)
+        self._refreshed_at = time.monotonic()
+
+    def catch_up(self):
+        """Reload just the members touched by changes logged since the last refresh"""
+        with self._connection() as conn:
+            changes = _read_changes(conn, self._seq, CHECKIN_SOURCE_TABLES, CHECKIN_REBUILD_CHANGES + 1)
+            # A deleted membership no longer says whose it was, and pruned
+            # entries cannot be replayed at all, so start over
+            if len(changes) > CHECKIN_REBUILD_CHANGES or _log_truncated(conn, self._seq) or any(
+                    table_name == 'Member_Memberships' and op == 'D' for _, table_name, _, op in changes):
+                self._rebuild(conn)
+            elif changes:
+                member_ids = {row_id for _, table_name, row_id, _ in changes if table_name == 'Members'}
+                membership_ids = [row_id for _, table_name, row_id, _ in changes if table_name == 'Member_Memberships']
+                for start in range(0, len(membership_ids), SQL_VARIABLE_CHUNK):
+                    chunk = membership_ids[start:start + SQL_VARIABLE_CHUNK]
+                    member_ids.update(row[0] for row in conn.execute(
+                        f"SELECT Member_ID FROM Member_Memberships WHERE Membership_Record_ID IN ({', '.join('?' * len(chunk))})",
+                        chunk))
+                member_ids = list(member_ids)
+                self._forget(member_ids)
+                for start in range(0, len(member_ids), SQL_VARIABLE_CHUNK):
+                    chunk = member_ids[start:start + SQL_VARIABLE_CHUNK]
+                    where = f"WHERE m.Member_ID IN ({', '.join('?' * len(chunk))})"
+                    self._apply(conn.execute(ACTIVE_UNTIL_QUERY.format(where=where), chunk).fetchall())
+                self._seq = changes[-1][0]
+                set_watermark(conn, CHECKIN_CHANGES_JOB, str(self._seq))
+        self._refreshed_at = time.monotonic()
+        self.stats['catch_ups'] += 1
+
+    def refresh(self, generation=None):
+        """Load on first use; replay the change log after an in-process write or every few seconds"""
+        if not self._refreshed_at:
+            self.rebuild()
+            self._generation = generation
+        elif generation != self._generation or time.monotonic() - self._refreshed_at >= CHECKIN_REFRESH_SECONDS:
+            self._generation = generation
+            self.catch_up()
+
+    def admit(self, identifier, today):
+        """(Member_ID or None, admitted, reason) for a Member_ID, email or phone"""
+        key = str(identifier).strip()
+        with self._lock:
+            member_id = self._keys.get(key.lower())
+            if member_id is None and key.isdigit():
+                member_id = int(key)
+            entry = self._members.get(member_id)
+        if entry is None:
+            return None, False, "Unknown member"
+        status, active_until = entry[:2]
+        if status != 'Active':
+            return member_id, False, "Member is inactive"
+        if not active_until or active_until < today:
+            return member_id, False, "No active membership"
+        return member_id, True, f"Membership valid until {active_until}"
+
+    def record(self, member_id, admitted, reason, checked_in_at):
+        with self._lock:
+            self._pending.append((member_id, checked_in_at, int(admitted), reason))
+            due = len(self._pending) >= CHECKIN_BATCH_SIZE
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered check-ins in one transaction; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            insert_sql = 'INSERT INTO Check_Ins (Member_ID, Checked_In_At, Admitted, Reason) VALUES (?, ?, ?, ?)'
+            try:
+                with self._connection() as conn:
+                    conn.execute('SAVEPOINT check_ins')
+                    try:
+                        conn.executemany(insert_sql, batch)
+                        written = len(batch)
+                    except sqlite3.IntegrityError:
+                        # A member deleted since admission; keep the rest of the batch
+                        conn.execute('ROLLBACK TO check_ins')
+                        written = 0
+                        for row in batch:
+                            try:
+                                conn.execute(insert_sql, row)
+                                written += 1
+                            except sqlite3.IntegrityError:
+                                pass
+                    conn.execute('RELEASE check_ins')
+            except sqlite3.OperationalError:
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            self.stats['flushes'] += 1
+            self.stats['written'] += written
+            return written
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def run_flusher(self, stop):
+        while not stop.wait(CHECKIN_FLUSH_SECONDS):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Check-in flush failed")
+
+
+@st.cache_resource
+def _shared_check_in_desk(db_path):
+    desk = CheckInDesk()
+    stop = threading.Event()
+    threading.Thread(target=desk.run_flusher, args=(stop,), name='check-in-flusher', daemon=True).start()
+    return desk
+
+def get_check_in_desk():
+    return _shared_check_in_desk(DB_PATH)
+
+def check_in(identifier, when=None):
+    """Admit or refuse a member by ID, email or phone; returns (admitted, message)"""
+    desk = get_check_in_desk()
+    desk.refresh(table_generation('Members', 'Member_Memberships'))
+    when = when or datetime.now()
+    member_id, admitted, reason = desk.admit(identifier, when.date().isoformat())
+    if member_id is not None:
+        desk.record(member_id, admitted, reason, when.isoformat(timespec='seconds'))
+    return admitted, reason
+
+# MEMBERSHIP EXPIRY
+
+EXPIRY_JOB = 'membership_expiry'
+EXPIRY_BATCH_SIZE = 1000
+
+# Next batch of End_Dates in [since, today) after the (End_Date, ID) keyset cursor
+EXPIRY_BATCH_QUERY = '''
+SELECT End_Date, Membership_Record_ID FROM Member_Memberships
+WHERE End_Date >= ? AND End_Date < ? AND (End_Date, Membership_Record_ID) > (?, ?)
+ORDER BY End_Date, Membership_Record_ID
+LIMIT ?
+'''
+
+def get_watermark(conn, job_name, default=''):
+    row = conn.execute('SELECT Watermark FROM Job_Watermarks WHERE Job_Name = ?', (job_name,)).fetchone()
+    return row[0] if row else default
+
+def set_watermark(conn, job_name, watermark):
+    conn.execute('''
+        INSERT INTO Job_Watermarks (Job_Name, Watermark, Updated_At) VALUES (?, ?, ?)
+        ON CONFLICT (Job_Name) DO UPDATE SET Watermark = excluded.Watermark, Updated_At = excluded.Updated_At
+    ''', (job_name, watermark, datetime.now().isoformat(timespec='seconds')))
+
+def expire_memberships(today=None, batch_size=EXPIRY_BATCH_SIZE, full=False):
+    """Deactivate memberships whose End_Date has passed since the last run.
+
+    Only End_Date values in [watermark, today) are visited, walking the End_Date
+    index in keyset order; each batch is its own short write transaction and the
+    watermark moves to today with the last one. full=True starts from the
+    beginning again (e.g. after back-dated memberships were entered).
+    """
+    today = str(today or date.today())
+    started = time.perf_counter()
+    with get_connection() as conn:
+        since = '' if full else get_watermark(conn, EXPIRY_JOB)
+
+    result = {'since': since, 'until': today, 'expired': 0, 'batches': 0}
+    after = (since, 0)
+    while since < today:
+        with get_connection() as conn:
+            _begin_immediate(conn)
+            rows = conn.execute(EXPIRY_BATCH_QUERY, (since, today, after[0], after[1], batch_size)).fetchall()
+            if rows:
+                ids = [row[1] for row in rows]
+                result['expired'] += conn.execute(f'''
+                    UPDATE Member_Memberships SET Is_Active = 0, Payment_Status = 'Expired'
+                    WHERE Membership_Record_ID IN ({', '.join('?' * len(ids))}) AND Is_Active = 1
+                ''', ids).rowcount
+                invalidate_tables('Member_Memberships')
+                result['batches'] += 1
+                after = rows[-1]
+            if len(rows) < batch_size:
+                set_watermark(conn, EXPIRY_JOB, today)
+                break
+
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info("Membership expiry: %d membership(s) ending in [%s, %s) deactivated in %d batch(es), %.3fs",
+                result['expired'], since or 'start', today, result['batches'], result['seconds'])
+    return result
+
+@st.cache_resource
+def _expiry_worker(db_path, interval_seconds):
+    # cache_resource makes this one thread per process, not one per rerun
+    stop = threading.Event()
+
+    def loop():
+        while True:
+            try:
+                expire_memberships()
+            except Exception:
+                logger.exception("Membership expiry run failed")
+            if stop.wait(interval_seconds):
+                return
+
+    worker = threading.Thread(target=loop, name='membership-expiry', daemon=True)
+    worker.start()
+    return stop
+
+def start_expiry_worker():
+    """Run expire_memberships() in a background thread if expiry_interval_seconds is set"""
+    if CONFIG['expiry_interval_seconds'] > 0:
+        return _expiry_worker(DB_PATH, CONFIG['expiry_interval_seconds'])
+    return None
+
+@st.cache_resource
+def _change_log_pruner(db_path, interval_seconds):
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval_seconds):
+            try:
+                prune_consumed_changes()
+            except Exception:
+                logger.exception("Change log prune failed")
+
+    worker = threading.Thread(target=loop, name='change-log-pruner', daemon=True)
+    worker.start()
+    return stop
+
+def start_change_log_pruner():
+    """Run prune_consumed_changes() in a background thread if change_log_prune_interval_seconds is set"""
+    if CONFIG['change_log_prune_interval_seconds'] > 0:
+        return _change_log_pruner(DB_PATH, CONFIG['change_log_prune_interval_seconds'])
+    return None
+
+# ANALYTICS
+
+ANALYTICS_TTL_SECONDS = 24 * 3600
+ANALYTICS_CHART_MONTHS = 24
+# A membership counts as renewed if the member starts another one within this
+# many days of its End_Date; until then it is neither renewed nor churned.
+RENEWAL_GRACE_DAYS = 30
+PAYMENT_STATUSES = ['Paid', 'Pending', 'Expired']
+
+# Only integers cross into Python: dates as days since 1970-01-01 and
+# Payment_Status as its index in PAYMENT_STATUSES. Plan columns are joined
+# afterwards by array lookup, which is cheaper than one more value per row.
+MEMBERSHIP_LEDGER_QUERY = '''
+SELECT Member_ID, Plan_ID,
+       CAST(julianday(Start_Date) - 2440587.5 AS INTEGER),
+       CAST(julianday(End_Date) - 2440587.5 AS INTEGER),
+       COALESCE(CASE Payment_Status WHEN 'Paid' THEN 0 WHEN 'Pending' THEN 1 WHEN 'Expired' THEN 2 END, -1)
+FROM Member_Memberships
+'''
+
+def _load_membership_ledger(conn):
+    """Every membership with its plan price, as typed columns"""
+    rows = conn.execute(MEMBERSHIP_LEDGER_QUERY).fetchall()
+    columns = np.array(rows, dtype=np.int64).reshape(len(rows), 5).T
+    plans = pd.read_sql_query('SELECT Plan_ID, Plan_Name, Price, Duration_Months FROM Membership_Plans '
+                              'ORDER BY Plan_ID', conn)
+    plan_index = np.searchsorted(plans['Plan_ID'].to_numpy(), columns[1])
+    # Plan names need not be unique, so categories are the distinct names
+    name_codes, names = pd.factorize(plans['Plan_Name'])
+    ledger = pd.DataFrame({
+        'Member_ID': columns[0],
+        'Plan_ID': columns[1].astype(np.int32),
+        'Plan_Name': pd.Categorical.from_codes(name_codes[plan_index], names),
+        'Start_Date': columns[2].astype('datetime64[D]').astype('datetime64[s]'),
+        'End_Date': columns[3].astype('datetime64[D]').astype('datetime64[s]'),
+        'Payment_Status': pd.Categorical.from_codes(columns[4].astype(np.int8), PAYMENT_STATUSES),
+        'Price': plans['Price'].to_numpy(np.float64)[plan_index],
+        'Duration_Months': plans['Duration_Months'].to_numpy(np.int16)[plan_index],
+    })
+    ledger['Monthly_Price'] = ledger['Price'] / ledger['Duration_Months'].clip(lower=1)
+    return ledger
+
+def _spans(lo, hi, size, weights=None):
+    # Sum of `weights` over every half-open index range [lo, hi), for each index < size
+    diff = np.bincount(lo, weights, minlength=size + 1) - np.bincount(hi, weights, minlength=size + 1)
+    return np.cumsum(diff)[:size]
+
+def _rate(part, whole):
+    return np.round(100 * np.divide(part, whole, out=np.zeros(len(part)), where=whole > 0), 1)
+
+def compute_membership_analytics(ledger, today):
+    """Monthly MRR/churn/renewals, churn per join cohort and renewals per plan.
+
+    All work is array operations over the ledger, in membership order per member:
+    - MRR and Active_Members are month-end snapshots (today for the current
+      month) of memberships with Start_Date <= day < End_Date, Pending ones
+      reported separately; each membership adds to a range of months at once.
+    - A membership is renewed when the same member's next one starts within
+      RENEWAL_GRACE_DAYS of its End_Date and churned when that window passed
+      without one. Churn_Rate_Pct is churned / active at the start of the month.
+    """
+    today = np.datetime64(today, 'D')
+    start = ledger['Start_Date'].to_numpy('datetime64[D]')
+    member = ledger['Member_ID'].to_numpy()
+    order = np.lexsort((start, member))
+    member = member[order]
+    start = start[order]
+    end = ledger['End_Date'].to_numpy('datetime64[D]')[order]
+    price = ledger['Price'].to_numpy()[order]
+    monthly_price = ledger['Monthly_Price'].to_numpy()[order]
+    pending = (ledger['Payment_Status'].cat.codes.to_numpy() == PAYMENT_STATUSES.index('Pending'))[order]
+    plan_codes = ledger['Plan_Name'].cat.codes.to_numpy()[order]
+    grace = np.timedelta64(RENEWAL_GRACE_DAYS, 'D')
+
+    first = np.ones(len(member), dtype=bool)
+    first[1:] = member[1:] != member[:-1]
+    last = np.ones(len(member), dtype=bool)
+    last[:-1] = first[1:]
+    next_start = np.empty_like(start)
+    next_start[:-1] = start[1:]
+    renewed = ~last & (next_start <= end + grace) & (end <= today)
+    churned = ~renewed & (end + grace <= today)
+
+    # Month-end snapshot days from the first membership to this month
+    first_month = min(start.min(), today).astype('datetime64[M]') if len(start) else today.astype('datetime64[M]')
+    months = np.arange(first_month, today.astype('datetime64[M]') + 1)
+    snapshots = (months + 1).astype('datetime64[D]') - 1
+    snapshots[-1] = today
+    size = len(months)
+    lo = np.searchsorted(snapshots, start, 'left')
+    hi = np.maximum(np.searchsorted(snapshots, end, 'left'), lo)
+
+    def month_index(dates):
+        return (dates.astype('datetime64[M]') - first_month).astype(np.int64)
+
+    def month_counts(mask, dates):
+        index = month_index(dates[mask])
+        return np.bincount(index[index < size], minlength=size)
+
+    active = _spans(lo, hi, size)
+    active_at_start = np.concatenate(([0], active[:-1]))
+    churned_in_month = month_counts(churned, end)
+    renewed_in_month = month_counts(renewed, end)
+    monthly = pd.DataFrame({
+        'Month': np.datetime_as_string(months),
+        'Active_Members': active.astype(np.int64),
+        'MRR': np.round(_spans(lo, hi, size, np.where(pending, 0.0, monthly_price)), 2),
+        'Pending_MRR': np.round(_spans(lo, hi, size, np.where(pending, monthly_price, 0.0)), 2),
+        'New_Members': month_counts(first, start),
+        'Renewed': renewed_in_month,
+        'Churned': churned_in_month,
+        'Churn_Rate_Pct': _rate(churned_in_month, active_at_start),
+        'Renewal_Rate_Pct': _rate(renewed_in_month, renewed_in_month + churned_in_month),
+    })
+
+    # Per member (in join-month cohorts): running today, last membership churned, days since joining
+    starts = np.flatnonzero(first)
+    running = ((start <= today) & (end > today)).astype(np.int64)
+    cohort = month_index(start[first])
+    joined = cohort < size
+    cohort = cohort[joined]
+    member_active = np.add.reduceat(running, starts)[joined] > 0 if len(starts) else running
+    member_churned = churned[last][joined]
+    member_end = np.minimum(np.maximum.reduceat(end, starts), today) if len(starts) else end
+    tenure_days = (member_end[joined] - start[first][joined]).astype(np.int64)
+    members_in_cohort = np.bincount(cohort, minlength=size)
+    seen = members_in_cohort > 0
+    members_in_cohort = members_in_cohort[seen]
+    churned_in_cohort = np.bincount(cohort, member_churned, size)[seen].astype(np.int64)
+    cohorts = pd.DataFrame({
+        'Cohort': np.datetime_as_string(months[seen]),
+        'Members': members_in_cohort,
+        'Active': np.bincount(cohort, member_active, size)[seen].astype(np.int64),
+        'Churned': churned_in_cohort,
+        'Avg_Tenure_Months': np.round(np.bincount(cohort, tenure_days, size)[seen] / members_in_cohort / 30.44, 1),
+        'Churn_Pct': _rate(churned_in_cohort, members_in_cohort),
+    })
+
+    plan_names = ledger['Plan_Name'].cat.categories
+    size = len(plan_names)
+    renewed_per_plan = np.bincount(plan_codes, renewed, size).astype(np.int64)
+    churned_per_plan = np.bincount(plan_codes, churned, size).astype(np.int64)
+    plans = pd.DataFrame({
+        'Plan_Name': plan_names,
+        'Memberships': np.bincount(plan_codes, minlength=size),
+        'Revenue': np.round(np.bincount(plan_codes, np.where(pending, 0.0, price), size), 2),
+        'Renewed': renewed_per_plan,
+        'Churned': churned_per_plan,
+        'Renewal_Rate_Pct': _rate(renewed_per_plan, renewed_per_plan + churned_per_plan),
+    })
+    plans = plans[plans['Memberships'] > 0].sort_values('Revenue', ascending=False, ignore_index=True)
+    return {'monthly': monthly, 'cohorts': cohorts, 'plans': plans}
+
+@st.cache_data(ttl=ANALYTICS_TTL_SECONDS, max_entries=4, show_spinner=False)
+def _cached_membership_analytics(day, db_path):
+    with get_connection() as conn:
+        ledger = _load_membership_ledger(conn)
+    return compute_membership_analytics(ledger, day)
+
+def get_membership_analytics(today=None):
+    """compute_membership_analytics() for `today`, computed once per day and then served from memory"""
+    return _cached_membership_analytics(str(today or date.today()), DB_PATH)
+
+# COHORT RETENTION
+
+RETENTION_JOB = 'cohort_retention'
+RETENTION_CHART_MONTHS = 24
+
+# One grouped pass over the attended bookings in [from, to]; activity before a
+# member's Join_Date is not counted
+COHORT_ACTIVITY_QUERY = '''
+SELECT strftime('%Y-%m', b.Booking_Date) AS Activity_Month,
+       strftime('%Y-%m', m.Join_Date) AS Cohort_Month,
+       COUNT(DISTINCT b.Member_ID) AS Active_Members
+FROM Class_Bookings b
+JOIN Members m ON m.Member_ID = b.Member_ID
+WHERE b.Attendance_Status = 'Attended' AND b.Booking_Date >= ? AND b.Booking_Date <= ?
+  AND b.Booking_Date >= m.Join_Date
+GROUP BY 1, 2
+'''
+
+COHORT_SIZE_QUERY = '''
+SELECT strftime('%Y-%m', Join_Date) AS Cohort_Month, COUNT(*) AS Cohort_Size
+FROM Members
+GROUP BY 1
+HAVING Cohort_Month IS NOT NULL
+'''
+
+def refresh_cohort_retention(today=None, full=False):
+    """Recount Cohort_Retention from the month of the last run up to `today`.
+
+    Months before the watermark are final and kept; the watermark month (the
+    newest one last time, possibly incomplete) and later are deleted and
+    recounted in one transaction. full=True recounts everything (e.g. after
+    back-dated attendance changes or Join_Date edits).
+    """
+    today = str(today or date.today())
+    started = time.perf_counter()
+    with get_connection() as conn:
+        _begin_immediate(conn)
+        since = '' if full else min(get_watermark(conn, RETENTION_JOB), today[:7])
+        conn.execute('DELETE FROM Cohort_Retention WHERE Activity_Month >= ?', (since,))
+        rows = conn.execute(COHORT_ACTIVITY_QUERY, (f'{since}-01' if since else '', today)).fetchall()
+        conn.executemany('INSERT INTO Cohort_Retention (Activity_Month, Cohort_Month, Active_Members) '
+                         'VALUES (?, ?, ?)', rows)
+        set_watermark(conn, RETENTION_JOB, today[:7])
+        invalidate_tables('Cohort_Retention')
+
+    result = {'since': since, 'until': today, 'cells': len(rows),
+              'seconds': round(time.perf_counter() - started, 3)}
+    logger.info("Cohort retention: %d cell(s) for activity in [%s, %s] recounted in %.3fs",
+                result['cells'], since or 'start', today, result['seconds'])
+    return result
+
+def build_retention_matrix(cells, sizes, today=None):
+    """Long-form retention matrix: one row per join cohort and month since joining.
+
+    `cells` has Cohort_Month, Activity_Month, Active_Members and `sizes` has
+    Cohort_Month, Cohort_Size (both 'YYYY-MM'). Every cohort gets a row for
+    each month from joining up to the month of `today`, with 0 active members
+    where nobody from the cohort attended a class.
+    """
+    current = np.datetime64(str(today or date.today())[:7], 'M')
+    cohorts = sizes['Cohort_Month'].to_numpy()
+    spans = np.maximum((current - cohorts.astype('datetime64[M]')).astype(np.int64) + 1, 1)
+    owner = np.repeat(np.arange(len(cohorts)), spans)
+    offsets = np.arange(len(owner)) - np.repeat(np.cumsum(spans) - spans, spans)
+    matrix = pd.DataFrame({
+        'Cohort': cohorts[owner],
+        'Months_Since_Join': offsets,
+        'Cohort_Size': sizes['Cohort_Size'].to_numpy(np.int64)[owner],
+    })
+    activity = pd.DataFrame({
+        'Cohort': cells['Cohort_Month'].to_numpy(),
+        'Months_Since_Join': (cells['Activity_Month'].to_numpy().astype('datetime64[M]')
+                              - cells['Cohort_Month'].to_numpy().astype('datetime64[M]')).astype(np.int64),
+        'Active_Members': cells['Active_Members'].to_numpy(np.int64),
+    })
+    matrix = matrix.merge(activity, on=['Cohort', 'Months_Since_Join'], how='left')
+    active = matrix['Active_Members'].fillna(0).to_numpy(np.int64)
+    matrix['Active_Members'] = active
+    matrix['Retention_Pct'] = _rate(active, matrix['Cohort_Size'].to_numpy())
+    return matrix.sort_values(['Cohort', 'Months_Since_Join'], ignore_index=True)
+
+@st.cache_data(ttl=ANALYTICS_TTL_SECONDS, max_entries=4, show_spinner=False)
+def _cached_cohort_retention(day, db_path):
+    refresh_cohort_retention(day)
+    with get_connection() as conn:
+        cells = pd.read_sql_query('SELECT Cohort_Month, Activity_Month, Active_Members FROM Cohort_Retention', conn)
+        sizes = pd.read_sql_query(COHORT_SIZE_QUERY, conn)
+    return build_retention_matrix(cells, sizes, day)
+
+def get_cohort_retention(today=None):
+    """build_retention_matrix() after an incremental refresh, once per day and then served from memory"""
+    return _cached_cohort_retention(str(today or date.today()), DB_PATH)
+
+# QUERY PLAN CHECKS
+
+# Hot lookups and the index seek each must make: (name, SQL, params, expected
+# plan line). The SQL is the statement the app itself runs, so the check cannot
+# drift. Whole-table reports are not listed; bench-queries times them instead.
+HOT_QUERY_PLANS = [
+    ('active membership check', ACTIVE_MEMBERSHIP_QUERY, (1,),
+     'SEARCH Member_Memberships USING INDEX idx_member_memberships_member_active (Member_ID=? AND Is_Active=?)'),
+    ('batch active membership status', ACTIVE_MEMBERSHIP_STATUS_QUERY.format(marks='?, ?, ?'), (1, 2, 3),
+     'SEARCH mm USING INDEX idx_member_memberships_member_active (Member_ID=? AND Is_Active=?)'),
+    ('member typeahead search', MEMBER_SEARCH_QUERY,
+     {'low': 'jo', 'high': 'jo' + SEARCH_PREFIX_END, 'limit': MEMBER_SEARCH_LIMIT},
+     'SEARCH Members USING INDEX idx_members_last_name_nocase (Last_Name>? AND Last_Name<?)'),
+    ('seats left for class on date', SEATS_LEFT_QUERY, ('2024-11-18', 1),
+     'SEARCH s USING PRIMARY KEY (Class_ID=? AND Booking_Date=?)'),
+    ('waitlist head for class on date', WAITLIST_HEAD_QUERY, (1, '2024-11-18', 1),
+     'SEARCH Waitlist USING INDEX idx_waitlist_queue (Class_ID=? AND Booking_Date=?)'),
+    ('memberships ending in range', EXPIRY_BATCH_QUERY, ('2024-01-01', '2024-02-01', '2024-01-01', 0, 1000),
+     'SEARCH Member_Memberships USING INDEX idx_member_memberships_end_date (End_Date>? AND End_Date<?)'),
+    ('session for booking', SESSION_EXISTS_QUERY, (1, '2024-11-18'),
+     'SEARCH Class_Sessions USING PRIMARY KEY (Class_ID=? AND Session_Date=?)'),
+    ('sessions in date range', SESSIONS_BY_DATE_QUERY, ('2024-11-18', '2024-11-24'),
+     'SEARCH s USING INDEX idx_class_sessions_date (Session_Date>? AND Session_Date<?)'),
+    ('classes for trainer', TRAINER_CLASSES_QUERY, (1,),
+     'SEARCH Classes USING INDEX idx_classes_trainer (Trainer_ID=?)'),
+    ('trainer sessions in date range', SESSIONS_BY_TRAINER_QUERY, (1, '2024-11-18', '2024-11-24'),
+     'SEARCH s USING INDEX idx_class_sessions_trainer (Trainer_ID=? AND Session_Date>? AND Session_Date<?)'),
+    ('attended bookings in range', COHORT_ACTIVITY_QUERY, ('2024-11-01', '2024-11-18'),
+     'SEARCH b USING INDEX idx_class_bookings_attended (Attendance_Status=? AND Booking_Date>? AND Booking_Date<?)'),
+]
+
+# A pass over a whole table or index; constant rows and subquery results do not count
+TABLE_SCAN = re.compile(r'SCAN (?!CONSTANT ROW|\(subquery)')
+
+def check_query_plans():
+    """Return (name, ok, plan_lines) for every hot query.
+
+    ok means the plan makes the expected seek (a covering index counts) and
+    scans no table.
+    """
+    results = []
+    for name, query, params, expected in HOT_QUERY_PLANS:
+        plan = explain_query_plan(query, params)
+        seeks = any(line.replace('COVERING INDEX', 'INDEX').startswith(expected) for line in plan)
+        results.append((name, seeks and not any(TABLE_SCAN.match(line) for line in plan), plan))
+    return results
+
+# SYNTHETIC DATA
+
+# Rows generated at scale=1.0, i.e. the size of the production gym. Memberships
+# are not listed: each member gets a chain of renewals from their Join_Date.
+SYNTHETIC_ROWS = {
+    'Members': 200000,
+    'Trainers': 250,
+    'Classes': 1500,
+    'Class_Bookings': 5000000,
+}
+SYNTHETIC_BATCH_SIZE = 50000
+SYNTHETIC_HISTORY_YEARS = 5
+SYNTHETIC_BOOKING_DAYS = 730
+
+SYNTHETIC_FIRST_NAMES = ['James', 'Mary', 'Ali', 'Elif', 'Wei', 'Sofia', 'Liam', 'Ava', 'Noah', 'Zeynep',
+                         'Lucas', 'Mia', 'Omar', 'Hana', 'Mateo', 'Chloe', 'Ethan', 'Aylin', 'Yusuf', 'Nora']
+SYNTHETIC_LAST_NAMES = ['Smith', 'Yilmaz', 'Garcia', 'Chen', 'Kaya', 'Muller', 'Rossi', 'Kim', 'Demir', 'Brown',
+                        'Silva', 'Novak', 'Sahin', 'Khan', 'Ivanova', 'Celik', 'Martin', 'Lopez', 'Tanaka', 'Ozturk']
+SYNTHETIC_CLASS_TYPES = ['Yoga', 'CrossFit', 'Pilates', 'Spinning', 'Zumba', 'HIIT', 'Boxing', 'Strength']
+SYNTHETIC_CLASS_TIMES = ['06:30', '07:30', '09:00', '10:30', '12:15', '17:00', '18:00', '19:00', '20:00']
+
+def _execute_batches(conn, query, rows, batch_size=SYNTHETIC_BATCH_SIZE):
+    """executemany() in batches of batch_size rows, one transaction per batch"""
+    changed = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            changed += conn.executemany(query, batch).rowcount
+            conn.commit()
+            batch = []
+    if batch:
+        changed += conn.executemany(query, batch).rowcount
+        conn.commit()
+    return changed
+
+def generate_synthetic_data(conn, scale=1.0, seed=42, rows=None, today=None,
+                            batch_size=SYNTHETIC_BATCH_SIZE):
+    """Bulk-load a reproducible, production-shaped data set through `conn`.
+
+    Row counts are SYNTHETIC_ROWS times `scale`; `rows` overrides single tables,
+    e.g. {'Class_Bookings': 0}. The same seed gives the same data. Rows are
+    appended, so this also works on a database that already has data; sample
+    data is inserted first into an empty one so the plans exist.
+
+    - Join dates lean towards recent years (the gym has been growing) and
+      ages cluster around the mid thirties.
+    - Each member renews plan after plan from their Join_Date with 85%
+      probability; only the latest membership can still be active.
+    - Classes meet weekly on their Schedule_Day over the last
+      SYNTHETIC_BOOKING_DAYS days plus the coming week. Evening and weekend
+      sessions fill up more and a minority of regulars make most bookings.
+      No session is booked past Max_Capacity.
+
+    Returns {table: rows inserted}.
+    """
+    rng = random.Random(seed)
+    counts = {table: int(round(count * scale)) for table, count in SYNTHETIC_ROWS.items()}
+    for table, count in (rows or {}).items():
+        if table not in counts:
+            raise ValueError(f"No synthetic rows for {table}; choose from {', '.join(counts)}")
+        counts[table] = int(count)
+    today = date.fromisoformat(str(today or date.today()))
+
+    _insert_sample_data(conn.cursor())
+    conn.commit()
+    plans = conn.execute('SELECT Plan_ID, Duration_Months FROM Membership_Plans ORDER BY Plan_ID').fetchall()
+    if not plans:
+        raise ValueError("Synthetic memberships need at least one row in Membership_Plans")
+    # Monthly plans are bought more often than annual ones
+    plan_weights = [3 if months <= 1 else 1 for _, months in plans]
+    inserted = {}
+
+    def after(table, id_column):
+        return conn.execute(f'SELECT COALESCE(MAX({id_column}), 0) FROM {table}').fetchone()[0]
+
+    # Members
+    history_days = SYNTHETIC_HISTORY_YEARS * 365
+    base = after('Members', 'Member_ID')
+
+    def members():
+        for n in range(base + 1, base + counts['Members'] + 1):
+            joined = today - timedelta(days=int(rng.triangular(0, history_days, 0)))
+            age = min(max(rng.gauss(35, 11), 16), 80)
+            born = joined - timedelta(days=int(age * 365.25))
+            yield (rng.choice(SYNTHETIC_FIRST_NAMES), rng.choice(SYNTHETIC_LAST_NAMES),
+                   f'member{n}.{seed}@synthetic.example', f'syn-{seed}-{n:07d}',
+                   born.isoformat(), joined.isoformat(), 'Active')
+
+    inserted['Members'] = _execute_batches(conn, members_repo.insert_sql, members(), batch_size)
+    member_rows = conn.execute('SELECT Member_ID, Join_Date FROM Members WHERE Member_ID > ? ORDER BY Member_ID',
+                               (base,)).fetchall()
+
+    # Member_Memberships: renewal chains; members whose chain has lapsed become Inactive
+    lapsed = []
+
+    def memberships():
+        for member_id, join_date in member_rows:
+            start = date.fromisoformat(join_date)
+            while True:
+                plan_id, months = rng.choices(plans, plan_weights)[0]
+                end = start + timedelta(days=30 * months)
+                renewed = rng.random() < 0.85
+                if end < today and renewed:
+                    yield (member_id, plan_id, start.isoformat(), end.isoformat(), 'Expired', 0)
+                    start = end
+                    continue
+                if end < today:
+                    yield (member_id, plan_id, start.isoformat(), end.isoformat(), 'Expired', 0)
+                    lapsed.append((member_id,))
+                else:
+                    status = 'Pending' if rng.random() < 0.05 else 'Paid'
+                    yield (member_id, plan_id, start.isoformat(), end.isoformat(), status, 1)
+                break
+
+    inserted['Member_Memberships'] = _execute_batches(conn, memberships_repo.insert_sql, memberships(), batch_size)
+    _execute_batches(conn, "UPDATE Members SET Status = 'Inactive' WHERE Member_ID = ?", lapsed, batch_size)
+
+    # Trainers
+    base = after('Trainers', 'Trainer_ID')
+
+    def trainers():
+        for n in range(base + 1, base + counts['Trainers'] + 1):
+            hired = today - timedelta(days=rng.randint(30, history_days))
+            yield (rng.choice(SYNTHETIC_FIRST_NAMES), rng.choice(SYNTHETIC_LAST_NAMES),
+                   rng.choice(SYNTHETIC_CLASS_TYPES), f'trainer{n}.{seed}@synthetic.example',
+                   f'syn-{seed}-t{n:05d}', hired.isoformat())
+
+    inserted['Trainers'] = _execute_batches(conn, trainers_repo.insert_sql, trainers(), batch_size)
+    trainer_ids = [row[0] for row in conn.execute('SELECT Trainer_ID FROM Trainers')]
+
+    # Classes
+    base = after('Classes', 'Class_ID')
+
+    def classes():
+        for n in range(base + 1, base + counts['Classes'] + 1):
+            class_type = rng.choice(SYNTHETIC_CLASS_TYPES)
+            day = rng.choice(WEEKDAYS)
+            slot = rng.choice(SYNTHETIC_CLASS_TIMES)
+            yield (f'{class_type} {day} {slot} #{n}', class_type, rng.choice(trainer_ids), day, slot,
+                   rng.choice([30, 45, 45, 60, 60, 90]), rng.choice([15, 20, 25, 30, 40, 50, 60]))
+
+    if counts['Classes'] and not trainer_ids:
+        raise ValueError("Synthetic classes need at least one trainer")
+    inserted['Classes'] = _execute_batches(conn, classes_repo.insert_sql, classes(), batch_size)
+    class_rows = conn.execute('SELECT Class_ID, Schedule_Day, Schedule_Time, Max_Capacity FROM Classes').fetchall()
+
+    # Class_Bookings: every weekly session gets a demand-weighted share of the target
+    first_day = today - timedelta(days=SYNTHETIC_BOOKING_DAYS)
+    sessions = []
+    for class_id, day, slot, capacity in class_rows:
+        if day not in WEEKDAYS:
+            continue
+        session_day = first_day + timedelta(days=(WEEKDAYS.index(day) - first_day.weekday()) % 7)
+        demand = (1.3 if slot >= '17:00' else 1.0) * (1.2 if day in ('Saturday', 'Sunday') else 1.0)
+        while session_day <= today + timedelta(days=7):
+            sessions.append((class_id, session_day, capacity, demand))
+            session_day += timedelta(days=7)
+    total_demand = sum(capacity * demand for _, _, capacity, demand in sessions) or 1
+    fill = counts['Class_Bookings'] / total_demand
+    member_ids = [member_id for member_id, _ in member_rows] or \
+        [row[0] for row in conn.execute('SELECT Member_ID FROM Members')]
+    regulars = member_ids[:max(1, len(member_ids) // 5)]
+    rng.shuffle(regulars)
+
+    def bookings():
+        booked = 0
+        for class_id, session_day, capacity, demand in sessions:
+            wanted = min(capacity, int(capacity * demand * fill * rng.uniform(0.6, 1.4) + rng.random()),
+                         len(member_ids), counts['Class_Bookings'] - booked)
+            attendees = set()
+            while len(attendees) < wanted:
+                # Regulars make about half the bookings
+                pool = regulars if rng.random() < 0.5 else member_ids
+                attendees.add(pool[rng.randrange(len(pool))])
+            past = session_day < today
+            for member_id in attendees:
+                roll = rng.random()
+                if roll < 0.1:
+                    status = 'Cancelled'
+                elif not past:
+                    status = 'Booked'
+                else:
+                    status = 'No-Show' if roll < 0.18 else 'Attended'
+                yield (member_id, class_id, session_day.isoformat(), status)
+            booked += wanted
+
+    inserted['Class_Bookings'] = _execute_batches(conn, bookings_repo.insert_sql, bookings(), batch_size)
+    return inserted
+
+# BENCHMARKS
+
+def benchmark_concurrent_bookings(threads=8, bookings_per_thread=200, tuned=True):
+    """Time concurrent single-row booking inserts (one commit each) on a scratch DB.
+
+    tuned=False reproduces the old setup (rollback journal, synchronous=FULL,
+    default cache); tuned=True applies the configured pragmas.
+    """
+    workdir = tempfile.mkdtemp(prefix='gym_bench_')
+    db_path = os.path.join(workdir, 'bench.db')
+
+    def connect():
+        conn = sqlite3.connect(db_path, timeout=CONFIG['busy_timeout_ms'] / 1000, check_same_thread=False)
+        if tuned:
+            apply_pragmas(conn, CONFIG)
+        return conn
+
+    setup = connect()
+    _apply_migrations(setup)
+    _insert_sample_data(setup.cursor())
+    setup.commit()
+    setup.close()
+
+    errors = []
+    start_day = date(2025, 1, 1)
+
+    def desk(desk_no):
+        conn = connect()
+        for i in range(bookings_per_thread):
+            booking_date = start_day + timedelta(days=desk_no * bookings_per_thread + i)
+            try:
+                conn.execute('INSERT INTO Class_Bookings (Member_ID, Class_ID, Booking_Date, Attendance_Status) VALUES (?, ?, ?, ?)',
+                             (desk_no % 6 + 1, i % 7 + 1, booking_date.isoformat(), 'Booked'))
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                errors.append(str(e))
+        conn.close()
+
+    workers = [threading.Thread(target=desk, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    total = threads * bookings_per_thread
+    return {
+        'mode': 'tuned' if tuned else 'default',
+        'threads': threads,
+        'bookings': total,
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'bookings_per_sec': round((total - len(errors)) / elapsed, 1) if elapsed else 0.0,
+    }
+
+def benchmark_waitlist_promotion(queued=5000, cancellations=200, capacity=20, bulk=100):
+    """Time cancel-and-promote against a long waitlist on a scratch DB.
+
+    One class session is filled to capacity and `queued` more members are put
+    on its waitlist. Then `cancellations` single cancellations are timed (each
+    promotes the queue head in the same transaction), followed by one bulk
+    cancellation of `bulk` bookings.
+    """
+    workdir = tempfile.mkdtemp(prefix='gym_bench_')
+    db_path = os.path.join(workdir, 'bench.db')
+    conn = sqlite3.connect(db_path, timeout=CONFIG['busy_timeout_ms'] / 1000, check_same_thread=False)
+    apply_pragmas(conn, CONFIG)
+    _apply_migrations(conn)
+    _insert_sample_data(conn.cursor())
+    conn.commit()
+
+    # Next Monday (class 1 runs on Mondays), inside the booking window
+    booking_date = (date.today() + timedelta(days=7 - date.today().weekday())).isoformat()
+    conn.execute('UPDATE Classes SET Max_Capacity = ? WHERE Class_ID = 1', (capacity,))
+    conn.executemany('''
+        INSERT INTO Members (First_Name, Last_Name, Email, Phone, Date_of_Birth, Join_Date, Status)
+        VALUES ('Bench', ?, ?, ?, '1990-01-01', '2025-01-01', 'Active')
+    ''', [(f'Member{i}', f'bench{i}@example.com', f'bench-{i}') for i in range(capacity + queued)])
+    member_ids = [row[0] for row in conn.execute("SELECT Member_ID FROM Members WHERE First_Name = 'Bench' ORDER BY Member_ID")]
+    for member_id in member_ids:
+        _book(conn, member_id, 1, booking_date, 'Booked', waitlist=True)
+    conn.commit()
+
+    latencies = []
+    promoted = 0
+    for _ in range(cancellations):
+        booking_id = conn.execute('''
+            SELECT Booking_ID FROM Class_Bookings
+            WHERE Class_ID = 1 AND Booking_Date = ? AND Attendance_Status = 'Booked'
+            ORDER BY Booking_ID LIMIT 1
+        ''', (booking_date,)).fetchone()[0]
+        started = time.perf_counter()
+        _, moved = _cancel(conn, [booking_id])
+        conn.commit()
+        latencies.append((time.perf_counter() - started) * 1000)
+        promoted += len(moved)
+
+    bulk_ids = [row[0] for row in conn.execute('''
+        SELECT Booking_ID FROM Class_Bookings
+        WHERE Class_ID = 1 AND Booking_Date = ? AND Attendance_Status = 'Booked'
+        LIMIT ?
+    ''', (booking_date, bulk))]
+    started = time.perf_counter()
+    bulk_cancelled, bulk_promoted = _cancel(conn, bulk_ids)
+    conn.commit()
+    bulk_ms = (time.perf_counter() - started) * 1000
+    conn.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'queued': queued,
+        'cancellations': cancellations,
+        'promoted': promoted,
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'max_ms': round(max(latencies), 3) if latencies else 0.0,
+        'bulk_cancelled': bulk_cancelled,
+        'bulk_promoted': len(bulk_promoted),
+        'bulk_ms': round(bulk_ms, 3),
+    }
+
+def benchmark_membership_status(sizes=(1, 100, 10000), repeat=5):
+    """Compare per-member COUNT(*), per-member EXISTS and the batch lookup on a scratch DB.
+
+    Returns one row per size with the best-of-`repeat` time in ms for each mode.
+    """
+    workdir = tempfile.mkdtemp(prefix='gym_bench_')
+    db_path = os.path.join(workdir, 'bench.db')
+    conn = sqlite3.connect(db_path, timeout=CONFIG['busy_timeout_ms'] / 1000, check_same_thread=False)
+    apply_pragmas(conn, CONFIG)
+    _apply_migrations(conn)
+    _insert_sample_data(conn.cursor())
+
+    members = max(sizes)
+    conn.executemany('''
+        INSERT INTO Members (First_Name, Last_Name, Email, Phone, Date_of_Birth, Join_Date, Status)
+        VALUES ('Bench', ?, ?, ?, '1990-01-01', '2025-01-01', 'Active')
+    ''', [(f'Member{i}', f'bench{i}@example.com', f'bench-{i}') for i in range(members)])
+    member_ids = [row[0] for row in conn.execute("SELECT Member_ID FROM Members WHERE First_Name = 'Bench' ORDER BY Member_ID")]
+    # Three memberships each, every other member with one still active
+    conn.executemany('''
+        INSERT INTO Member_Memberships (Member_ID, Plan_ID, Start_Date, End_Date, Payment_Status, Is_Active)
+        VALUES (?, 1, '2024-01-01', '2024-02-01', 'Paid', ?)
+    ''', [(member_id, int(n == 2 and member_id % 2 == 0)) for member_id in member_ids for n in range(3)])
+    conn.commit()
+
+    def count_loop(ids):
+        return {member_id: conn.execute('SELECT COUNT(*) FROM Member_Memberships WHERE Member_ID = ? AND Is_Active = 1',
+                                        (member_id,)).fetchone()[0] > 0 for member_id in ids}
+
+    def exists_loop(ids):
+        return {member_id: _has_active_membership(conn, member_id) for member_id in ids}
+
+    modes = [('count_loop', count_loop), ('exists_loop', exists_loop),
+             ('batch', lambda ids: _active_membership_status(conn, ids))]
+    results = []
+    for size in sizes:
+        ids = member_ids[:size]
+        row = {'ids': size}
+        answers = []
+        for name, lookup in modes:
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                answer = lookup(ids)
+                elapsed = (time.perf_counter() - started) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            row[f'{name}_ms'] = round(best, 3)
+            answers.append(answer)
+        row['agree'] = all(answer == answers[0] for answer in answers)
+        results.append(row)
+    conn.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def benchmark_check_in(members=10000, check_ins=20000):
+    """Time in-memory admission plus buffered logging on a scratch DB.
+
+    Half the members have an active membership. Returns build time and
+    per-check-in latency percentiles in microseconds.
+    """
+    workdir = tempfile.mkdtemp(prefix='gym_bench_')
+    db_path = os.path.join(workdir, 'bench.db')
+    conn = sqlite3.connect(db_path, timeout=CONFIG['busy_timeout_ms'] / 1000, check_same_thread=False)
+    apply_pragmas(conn, CONFIG)
+    _apply_migrations(conn)
+    _insert_sample_data(conn.cursor())
+    conn.executemany('''
+        INSERT INTO Members (First_Name, Last_Name, Email, Phone, Date_of_Birth, Join_Date, Status)
+        VALUES ('Bench', ?, ?, ?, '1990-01-01', '2025-01-01', 'Active')
+    ''', [(f'Member{i}', f'bench{i}@example.com', f'bench-{i}') for i in range(members)])
+    conn.execute('''
+        INSERT INTO Member_Memberships (Member_ID, Plan_ID, Start_Date, End_Date, Payment_Status, Is_Active)
+        SELECT Member_ID, 1, '2025-01-01', '2099-12-31', 'Paid', Member_ID % 2
+        FROM Members WHERE First_Name = 'Bench'
+    ''')
+    conn.commit()
+
+    @contextmanager
+    def connection():
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    desk = CheckInDesk(connection)
+    started = time.perf_counter()
+    desk.refresh()
+    build_ms = (time.perf_counter() - started) * 1000
+
+    keys = [f'bench{i}@example.com' if i % 3 == 0 else f'bench-{i}' for i in range(members)]
+    now = datetime.now()
+    today = now.date().isoformat()
+    stamp = now.isoformat(timespec='seconds')
+    latencies = []
+    admitted = 0
+    started = time.perf_counter()
+    for n in range(check_ins):
+        t0 = time.perf_counter()
+        member_id, ok, reason = desk.admit(keys[(n * 7919) % members], today)
+        desk.record(member_id, ok, reason, stamp)
+        latencies.append((time.perf_counter() - t0) * 1e6)
+        admitted += ok
+    desk.flush()
+    total = time.perf_counter() - started
+    logged = conn.execute('SELECT COUNT(*) FROM Check_Ins').fetchone()[0]
+    conn.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        'members': members,
+        'check_ins': check_ins,
+        'admitted': admitted,
+        'logged': logged,
+        'flushes': desk.stats['flushes'],
+        'build_ms': round(build_ms, 1),
+        'p50_us': round(cuts[49], 1),
+        'p99_us': round(cuts[98], 1),
+        'per_sec': round(check_ins / total, 1),
+    }
+
+def benchmark_hot_queries(repeat=200):
+    """Time the repository lookups, HOT_QUERY_PLANS and the reports on a scratch DB.
+
+    Each statement runs `repeat` times; returns one row per statement with
+    p50/p95 latency in microseconds and the rows it returned.
+    """
+    workdir = tempfile.mkdtemp(prefix='gym_bench_')
+    db_path = os.path.join(workdir, 'bench.db')
+    conn = sqlite3.connect(db_path, timeout=CONFIG['busy_timeout_ms'] / 1000, check_same_thread=False)
+    apply_pragmas(conn, CONFIG)
+    _apply_migrations(conn)
+    _insert_sample_data(conn.cursor())
+    conn.commit()
+
+    statements = [(f'{repo.table_name} by ID', repo.select_sql, (1,)) for repo in REPOSITORIES.values()]
+    statements += [(name, query, params) for name, query, params, _ in HOT_QUERY_PLANS]
+    statements += [
+        ('member memberships report', MEMBER_MEMBERSHIPS_QUERY, ()),
+        ('class schedule report', CLASS_SCHEDULE_QUERY, ()),
+        ('member bookings report', MEMBER_BOOKINGS_QUERY, ()),
+        ('trainer workload report', TRAINER_WORKLOAD_QUERY, ()),
+        ('class utilization report', CLASS_UTILIZATION_QUERY, ('2024-11-18',)),
+        ('dashboard metrics', DASHBOARD_METRICS_QUERY, ('2024-11-18',)),
+    ]
+    results = []
+    for name, query, params in statements:
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = conn.execute(query, params).fetchall()
+            latencies.append((time.perf_counter() - started) * 1e6)
+        cuts = statistics.quantiles(latencies, n=100)
+        results.append({'query': name, 'rows': len(rows),
+                        'p50_us': round(cuts[49], 1), 'p95_us': round(cuts[94], 1)})
+    conn.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+BENCHMARK_SCALES = (0.001, 0.01, 0.1)
+
+def _time_calls(func, repeat):
+    timings = []
+    failed = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+        # insert_*/delete_record report errors as (False, message)
+        failed += isinstance(result, tuple) and not result[0]
+    rows = len(result) if isinstance(result, pd.DataFrame) else None
+    return {'best_ms': round(min(timings), 3), 'median_ms': round(statistics.median(timings), 3),
+            'max_ms': round(max(timings), 3), 'rows': rows, 'failed': failed}
+
+def benchmark_public_functions(scales=BENCHMARK_SCALES, seed=42, repeat=3, report_path=None):
+    """Time the app's public read and write functions at several data scales.
+
+    For each scale a scratch DB is filled by generate_synthetic_data() and the
+    app is pointed at it (configure(db_path=...)), so every call goes through
+    the real pool, caches and validation. Writes are timed one call at a time
+    on fresh rows. The report is returned and, with report_path, written as
+    JSON for compare_benchmark_reports().
+    """
+    previous_db = DB_PATH
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'repeat': repeat,
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'scales': [],
+    }
+    for scale in scales:
+        workdir = tempfile.mkdtemp(prefix='gym_bench_')
+        db_path = os.path.join(workdir, 'bench.db')
+        conn = sqlite3.connect(db_path, timeout=CONFIG['busy_timeout_ms'] / 1000, check_same_thread=False)
+        apply_pragmas(conn, CONFIG)
+        _apply_migrations(conn)
+        started = time.perf_counter()
+        inserted = generate_synthetic_data(conn, scale, seed)
+        generate_seconds = round(time.perf_counter() - started, 2)
+        conn.execute('ANALYZE')
         conn.commit()
         conn.close()
-        return True, "Trainer added successfully!"
-    except sqlite3.IntegrityError as e:
-        conn.close()
-        return False, f"Error: {str(e)}"
 
-def insert_class(class_name, class_type, trainer_id, schedule_day, schedule_time, duration, capacity):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO Classes (Class_Name, Class_Type, Trainer_ID, Schedule_Day, Schedule_Time, Duration_Minutes, Max_Capacity)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (class_name, class_type, trainer_id, schedule_day, schedule_time, duration, capacity))
-        conn.commit()
-        conn.close()
-        return True, "Class added successfully!"
-    except Exception as e:
-        conn.close()
-        return False, f"Error: {str(e)}"
+        configure(db_path=db_path)
+        try:
+            sync_table_generations()
+            with get_connection() as conn:
+                class_id, trainer_id = conn.execute('SELECT Class_ID, Trainer_ID FROM Classes LIMIT 1').fetchone()
+                counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                          for table in REPOSITORIES}
+            functions = {}
+            for name, func in [
+                ('get_member_memberships_join', get_member_memberships_join),
+                ('get_class_schedule_join', get_class_schedule_join),
+                ('get_member_bookings_join', get_member_bookings_join),
+                ('get_trainer_workload_join', get_trainer_workload_join),
+                ('get_class_utilization', get_class_utilization),
+                ('get_class_sessions', get_class_sessions),
+                ('refresh_cohort_retention(full)', lambda: refresh_cohort_retention(full=True)),
+                ('refresh_cohort_retention', refresh_cohort_retention),
+            ]:
+                functions[name] = _time_calls(func, repeat)
+            for table in REPOSITORIES:
+                functions[f'get_all_records({table})'] = _time_calls(lambda: get_all_records(table), repeat)
+                functions[f'get_records_page({table})'] = _time_calls(lambda: get_records_page(table)[0], repeat)
+            calls = iter(range(10 ** 9))
+            functions['get_dashboard_metrics'] = _time_calls(
+                lambda: get_dashboard_metrics(generation=(db_path, next(calls))), repeat)
 
-def insert_booking(member_id, class_id, booking_date, status):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            INSERT INTO Class_Bookings (Member_ID, Class_ID, Booking_Date, Attendance_Status)
-            VALUES (?, ?, ?, ?)
-        ''', (member_id, class_id, booking_date, status))
-        conn.commit()
-        conn.close()
-        return True, "Booking created successfully!"
-    except sqlite3.IntegrityError as e:
-        conn.close()
-        return False, f"Error: Member already has a booking for this class on this date"
+            # Writes: fresh rows each call, deleted again by the delete_record runs below
+            functions['insert_member'] = _time_calls(lambda: insert_member(
+                'Bench', 'Member', f'bench{next(calls)}@bench.example', f'bench-{next(calls)}',
+                '1990-01-01', date.today().isoformat(), 'Active'), repeat)
+            functions['insert_membership_plan'] = _time_calls(
+                lambda: insert_membership_plan(f'Bench Plan {next(calls)}', 1, 10.0, 'Benchmark'), repeat)
+            functions['insert_trainer'] = _time_calls(lambda: insert_trainer(
+                'Bench', 'Trainer', 'Yoga', f'bench{next(calls)}@bench.example', f'bench-{next(calls)}',
+                date.today().isoformat()), repeat)
+            # Night slots, which synthetic classes never use, so the trainer check passes
+            night_slots = iter([(day, f'{hour:02d}:00') for day in WEEKDAYS for hour in range(5)])
+            functions['insert_class'] = _time_calls(lambda: insert_class(
+                f'Bench Class {next(calls)}', 'Yoga', trainer_id, *next(night_slots), 60, 20), repeat)
+            # Bookings must fall on a session; synthetic bookings stop a week ahead
+            sync_class_sessions()
+            with get_connection() as conn:
+                session_days = [row[0] for row in conn.execute(
+                    'SELECT Session_Date FROM Class_Sessions WHERE Class_ID = ? AND Session_Date > ? ORDER BY Session_Date',
+                    (class_id, (date.today() + timedelta(days=7)).isoformat()))]
+            seats = iter([(member_id, class_id, day) for day in session_days for member_id in (1, 2, 3)])
+            functions['insert_booking'] = _time_calls(lambda: insert_booking(*next(seats), 'Booked'), repeat)
+            created = {}
+            with get_connection() as conn:
+                for table, id_column in [('Members', 'Member_ID'), ('Trainers', 'Trainer_ID'),
+                                         ('Classes', 'Class_ID'), ('Class_Bookings', 'Booking_ID')]:
+                    created[table] = [row[0] for row in conn.execute(
+                        f'SELECT {id_column} FROM {table} ORDER BY {id_column} DESC LIMIT ?', (repeat,))]
+            # Delete the bench rows again; Members/Classes cascade into their children
+            for table in ('Class_Bookings', 'Classes', 'Members', 'Trainers'):
+                ids = iter(created[table])
+                functions[f'delete_record({table})'] = _time_calls(lambda: delete_record(table, next(ids)), repeat)
+        finally:
+            get_pool().close_all()
+            configure(db_path=previous_db)
+            shutil.rmtree(workdir, ignore_errors=True)
 
-def delete_record(table_name, id_column, record_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(f'DELETE FROM {table_name} WHERE {id_column} = ?', (record_id,))
-        conn.commit()
-        rows_affected = cursor.rowcount
-        conn.close()
-        if rows_affected > 0:
-            return True, f"Record deleted successfully!"
-        else:
-            return False, "Record not found!"
-    except Exception as e:
-        conn.close()
-        return False, f"Error: {str(e)}"
+        report['scales'].append({'scale': scale, 'inserted': inserted, 'rows': counts,
+                                 'generate_seconds': generate_seconds, 'functions': functions})
+        logger.info("Benchmark at scale %s done (%d bookings)", scale, counts['Class_Bookings'])
 
-# JOIN QUERIES
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return report
 
-def get_member_memberships_join():
-    """JOIN: Get members with their active membership plans"""
-    conn = get_connection()
-    query = '''
-    SELECT 
-        m.Member_ID,
-        m.First_Name || ' ' || m.Last_Name AS Member_Name,
-        m.Email,
-        mp.Plan_Name,
-        mp.Price,
-        mm.Start_Date,
-        mm.End_Date,
-        mm.Payment_Status,
-        CASE WHEN mm.Is_Active = 1 THEN 'Active' ELSE 'Inactive' END AS Status
-    FROM Members m
-    JOIN Member_Memberships mm ON m.Member_ID = mm.Member_ID
-    JOIN Membership_Plans mp ON mm.Plan_ID = mp.Plan_ID
-    ORDER BY m.Member_ID
-    '''
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+def compare_benchmark_reports(baseline, current, threshold=1.25):
+    """(scale, function, baseline ms, current ms, ratio) for every function whose
+    best time grew by more than `threshold` times at a scale both reports ran"""
+    baseline_scales = {entry['scale']: entry['functions'] for entry in baseline['scales']}
+    regressions = []
+    for entry in current['scales']:
+        before = baseline_scales.get(entry['scale'], {})
+        for name, timing in entry['functions'].items():
+            if name not in before or not before[name]['best_ms']:
+                continue
+            ratio = timing['best_ms'] / before[name]['best_ms']
+            if ratio > threshold:
+                regressions.append((entry['scale'], name, before[name]['best_ms'], timing['best_ms'], round(ratio, 2)))
+    return regressions
 
-def get_class_schedule_join():
-    """JOIN: Get class schedule with trainer information"""
-    conn = get_connection()
-    query = '''
-    SELECT 
-        c.Class_ID,
-        c.Class_Name,
-        c.Class_Type,
-        t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
-        t.Specialization,
-        c.Schedule_Day,
-        c.Schedule_Time,
-        c.Duration_Minutes,
-        c.Max_Capacity
-    FROM Classes c
-    JOIN Trainers t ON c.Trainer_ID = t.Trainer_ID
-    ORDER BY 
-        CASE c.Schedule_Day
-            WHEN 'Monday' THEN 1
-            WHEN 'Tuesday' THEN 2
-            WHEN 'Wednesday' THEN 3
-            WHEN 'Thursday' THEN 4
-            WHEN 'Friday' THEN 5
-            WHEN 'Saturday' THEN 6
-            WHEN 'Sunday' THEN 7
-        END,
-        c.Schedule_Time
-    '''
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+def benchmark_analytics(memberships=1000000, seed=42):
+    """Time loading and analysing about `memberships` synthetic membership records.
 
-def get_member_bookings_join():
-    """JOIN: Get member bookings with class and trainer details"""
-    conn = get_connection()
-    query = '''
-    SELECT 
-        m.First_Name || ' ' || m.Last_Name AS Member_Name,
-        c.Class_Name,
-        c.Class_Type,
-        t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
-        c.Schedule_Day,
-        c.Schedule_Time,
-        cb.Booking_Date,
-        cb.Attendance_Status
-    FROM Class_Bookings cb
-    JOIN Members m ON cb.Member_ID = m.Member_ID
-    JOIN Classes c ON cb.Class_ID = c.Class_ID
-    JOIN Trainers t ON c.Trainer_ID = t.Trainer_ID
-    ORDER BY cb.Booking_Date DESC, m.Last_Name
-    '''
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+    Members are generated until the renewal chains reach the target; returns the
+    actual record count, load and compute seconds and the ledger size in MB.
+    """
+    workdir = tempfile.mkdtemp(prefix='gym_bench_')
+    db_path = os.path.join(workdir, 'bench.db')
+    conn = sqlite3.connect(db_path, timeout=CONFIG['busy_timeout_ms'] / 1000, check_same_thread=False)
+    apply_pragmas(conn, CONFIG)
+    _apply_migrations(conn)
+    no_classes = {'Trainers': 0, 'Classes': 0, 'Class_Bookings': 0}
+    records = 0
+    while records < memberships:
+        # Size each round from the chain length seen so far (about 6 records per member)
+        members = conn.execute('SELECT COUNT(*) FROM Members').fetchone()[0]
+        per_member = records / members if records else 6
+        wanted = max(1000, int((memberships - records) / per_member))
+        generate_synthetic_data(conn, seed=seed + records, rows=dict(no_classes, Members=wanted))
+        records = conn.execute('SELECT COUNT(*) FROM Member_Memberships').fetchone()[0]
 
-def get_trainer_workload_join():
-    """JOIN: Get trainer workload (number of classes per trainer)"""
-    conn = get_connection()
-    query = '''
-    SELECT 
-        t.Trainer_ID,
-        t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
-        t.Specialization,
-        COUNT(c.Class_ID) AS Number_of_Classes,
-        GROUP_CONCAT(c.Class_Name, ', ') AS Classes_Teaching
-    FROM Trainers t
-    LEFT JOIN Classes c ON t.Trainer_ID = c.Trainer_ID
-    GROUP BY t.Trainer_ID, t.First_Name, t.Last_Name, t.Specialization
-    ORDER BY Number_of_Classes DESC
-    '''
-    df = pd.read_sql_query(query, conn)
+    started = time.perf_counter()
+    ledger = _load_membership_ledger(conn)
+    load_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    analytics = compute_membership_analytics(ledger, date.today())
+    compute_seconds = time.perf_counter() - started
     conn.close()
-    return df
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'memberships': len(ledger),
+        'members': int(analytics['cohorts']['Members'].sum()),
+        'months': len(analytics['monthly']),
+        'ledger_mb': round(ledger.memory_usage(deep=True).sum() / 2 ** 20, 1),
+        'load_seconds': round(load_seconds, 2),
+        'compute_seconds': round(compute_seconds, 3),
+    }
 
-# UTILITY FUNCTIONS
+# STREAMLIT UI
 
-def get_all_records(table_name):
-    """Get all records from a table"""
-    conn = get_connection()
-    df = pd.read_sql_query(f'SELECT * FROM {table_name}', conn)
-    conn.close()
-    return df
+def render_table_browser(table_name, key):
+    """Paged st.dataframe over one table; only the visible page is queried"""
+    columns = get_table_columns(table_name)
 
-def get_members():
-    return get_all_records('Members')
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        search = st.text_input("🔍 Search", key=f"{key}_search")
+    with col2:
+        sort_column = st.selectbox("Sort by", columns, key=f"{key}_sort")
+    with col3:
+        page_size = st.selectbox("Rows", [25, 50, 100, 250], index=1, key=f"{key}_size")
+    with col4:
+        descending = st.checkbox("Descending", key=f"{key}_desc")
 
-def get_trainers():
-    return get_all_records('Trainers')
+    with st.expander("Filter by column"):
+        filter_column = st.selectbox("Column", ["(none)"] + columns, key=f"{key}_filter_col")
+        filter_value = st.text_input("Equals", key=f"{key}_filter_val")
+    filters = {filter_column: filter_value} if filter_column != "(none)" and filter_value else None
 
-def get_classes():
-    return get_all_records('Classes')
+    # Cursor stack: one keyset cursor per page visited, reset when the query changes
+    signature = (search, sort_column, page_size, descending, filter_column, filter_value)
+    state = st.session_state.get(f"{key}_pages")
+    if state is None or state['signature'] != signature:
+        state = {'signature': signature, 'cursors': [None]}
+        st.session_state[f"{key}_pages"] = state
 
-def get_bookings():
-    return get_all_records('Class_Bookings')
+    df, next_cursor = get_records_page(table_name, page_size, after=state['cursors'][-1], filters=filters,
+                                       search=search, sort_column=sort_column, descending=descending)
+    total = count_records(table_name, filters, search)
+    st.dataframe(df, use_container_width=True)
 
-def get_membership_plans():
-    return get_all_records('Membership_Plans')
+    col1, col2, col3 = st.columns([1, 4, 1])
+    with col1:
+        if st.button("⬅️ Previous", key=f"{key}_prev", disabled=len(state['cursors']) == 1):
+            state['cursors'].pop()
+            st.rerun()
+    with col2:
+        pages = max(1, -(-total // page_size))
+        st.caption(f"Page {len(state['cursors'])} of {pages} · {total} matching rows")
+    with col3:
+        if st.button("Next ➡️", key=f"{key}_next", disabled=next_cursor is None):
+            state['cursors'].append(next_cursor)
+            st.rerun()
+    return total
 
-# STREAMLIT UI
 
 def main():
     st.set_page_config(
@@ -436,8 +4085,11 @@ def main():
         layout="wide"
     )
     
-    create_tables()
-    insert_sample_data()
+    stats_before = connection_stats()
+    bootstrap_database()
+    sync_table_generations()
+    start_expiry_worker()
+    start_change_log_pruner()
 
     st.title("💪 Fitness & Gym Membership Management System")
     st.markdown("**CMPE 351 - Database Systems Project | Nehir Gürsoy 122200051**")
@@ -446,26 +4098,38 @@ def main():
     st.sidebar.title("MENU")
     menu = st.sidebar.radio(
         "Select Operation:",
-        ["🏠 Home", "➕ Insert", "❌ Delete", "✏️ Update", "🔍 JOIN", "📊 View Tables"]
+        ["🏠 Home", "🚪 Check-In", "📅 Schedule", "➕ Insert", "❌ Delete", "✏️ Update", "🔍 JOIN", "📊 View Tables",
+         "📈 Analytics", "🔁 Retention", "⚙️ Performance"]
     )
     
     # HOME PAGE
     if menu == "🏠 Home":
         st.header("Welcome to Gym Management System!")
         
+        metrics = get_dashboard_metrics(date.today().isoformat(),
+                                        table_generation('Members', 'Trainers', 'Classes',
+                                                         'Member_Memberships', 'Class_Bookings'))
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            member_count = len(get_members())
-            st.metric("Total Members", member_count)
+            st.metric("Total Members", metrics['total_members'])
         
         with col2:
-            trainer_count = len(get_trainers())
-            st.metric("Total Trainers", trainer_count)
+            st.metric("Total Trainers", metrics['total_trainers'])
         
         with col3:
-            class_count = len(get_classes())
-            st.metric("Total Classes", class_count)
+            st.metric("Total Classes", metrics['total_classes'])
+        
+        col4, col5, col6 = st.columns(3)
+        
+        with col4:
+            st.metric("Active Memberships", metrics['active_memberships'])
+        
+        with col5:
+            st.metric("Bookings Today", metrics['bookings_today'])
+        
+        with col6:
+            st.metric("No-Show Rate", f"{metrics['no_show_rate_pct']}%")
         
         st.markdown("---")
         st.subheader("System Features")
@@ -476,19 +4140,69 @@ def main():
         st.write("✅ Class Booking System")
         st.write("✅ Comprehensive Reporting")
     
+    # SCHEDULE
+    elif menu == "📅 Schedule":
+        st.header("Class Schedule")
+        sync_class_sessions()
+        col1, col2 = st.columns(2)
+        with col1:
+            day = st.date_input("Week containing", value=date.today(), key="schedule_week")
+        with col2:
+            trainer_options = {"All trainers": None, **get_trainer_options()}
+            trainer_id = trainer_options[st.selectbox("Trainer", list(trainer_options.keys()))]
+        monday = week_start(day)
+        sessions = get_class_sessions(monday, monday + timedelta(days=6), trainer_id)
+
+        for offset, column in enumerate(st.columns(7)):
+            session_day = monday + timedelta(days=offset)
+            with column:
+                st.markdown(f"**{WEEKDAYS[offset]}**  \n{session_day.isoformat()}")
+                for session in sessions[sessions['Session_Date'] == session_day.isoformat()].itertuples():
+                    st.markdown(f"`{session.Start_Time}-{session.End_Time or '?'}` **{session.Class_Name}**  \n"
+                                f"{session.Trainer_Name} · {session.Seats_Left} seat(s) left")
+        st.caption(f"{len(sessions)} session(s). Sessions are generated "
+                   f"{CONFIG['session_window_days']} days ahead; bookings must fall on one of them.")
+
+        conflicts = audit_trainer_conflicts()
+        if not conflicts.empty:
+            with st.expander(f"⚠️ {len(conflicts)} trainer conflict(s) in the timetable"):
+                st.dataframe(conflicts, use_container_width=True)
+
+    # CHECK-IN
+    elif menu == "🚪 Check-In":
+        st.header("Front Desk Check-In")
+
+        with st.form("check_in_form", clear_on_submit=True):
+            identifier = st.text_input("Member ID, email or phone*")
+            submitted = st.form_submit_button("🚪 Check In", type="primary")
+            if submitted:
+                if identifier:
+                    admitted, message = check_in(identifier)
+                    if admitted:
+                        st.success(f"✅ Admitted - {message}")
+                    else:
+                        st.error(f"⛔ Refused - {message}")
+                else:
+                    st.error("Please enter a member ID, email or phone!")
+
+        desk = get_check_in_desk()
+        st.caption(f"{desk.pending()} check-in(s) waiting to be written (flushed every {CHECKIN_FLUSH_SECONDS:g}s)")
+
+        st.subheader("Recent Check-Ins")
+        render_table_browser("Check_Ins", key="view_check_ins")
+
     # INSERT DATA
     elif menu == "➕ Insert":
         st.header("Insert New Data")
         
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(["👤 Member", "📋 Membership Plan", "🏋️ Trainer", "📅 Class", "🎫 Booking"])
+        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["👤 Member", "📋 Membership Plan", "🏋️ Trainer", "📅 Class", "🎫 Booking",
+                                                      "📥 Bulk Import"])
         
         with tab1:
             st.subheader("Add New Member")
             st.info("⚠️ Every member must have a membership plan. Please select a plan below.")
             
-            plans_df = get_membership_plans()
-            plan_options = {f"{row['Plan_Name']} - ${row['Price']} ({row['Duration_Months']} months)": row['Plan_ID'] 
-                          for _, row in plans_df.iterrows()}
+            plan_options = get_plan_options()
             
             with st.form("insert_member_form"):
                 st.markdown("**Member Information**")
@@ -517,27 +4231,9 @@ def main():
                 submitted = st.form_submit_button("Add Member with Membership")
                 if submitted:
                     if first_name and last_name and email and phone and selected_plan:
-                        success, message = insert_member(first_name, last_name, email, phone, dob, join_date, status)
+                        success, message = enroll_member(first_name, last_name, email, phone, dob, join_date, status,
+                                                          plan_options[selected_plan], start_date, payment_status)
                         if success:
-                            conn = get_connection()
-                            cursor = conn.cursor()
-                            cursor.execute("SELECT Member_ID FROM Members WHERE Email = ?", (email,))
-                            member_id = cursor.fetchone()[0]
-                            
-                            plan_id = plan_options[selected_plan]
-                            cursor.execute("SELECT Duration_Months FROM Membership_Plans WHERE Plan_ID = ?", (plan_id,))
-                            duration = cursor.fetchone()[0]
-                            
-                            end_date = start_date + timedelta(days=duration * 30)
-                            
-                            cursor.execute('''
-                                INSERT INTO Member_Memberships (Member_ID, Plan_ID, Start_Date, End_Date, Payment_Status, Is_Active)
-                                VALUES (?, ?, ?, ?, ?, 1)
-                            ''', (member_id, plan_id, start_date, end_date, payment_status))
-                            
-                            conn.commit()
-                            conn.close()
-                            
                             st.success(f"✅ Member added successfully with {selected_plan}!")
                             st.balloons()
                         else:
@@ -594,9 +4290,7 @@ def main():
         
         with tab4:
             st.subheader("Add New Class")
-            trainers_df = get_trainers()
-            trainer_options = {f"{row['First_Name']} {row['Last_Name']} ({row['Specialization']})": row['Trainer_ID'] 
-                             for _, row in trainers_df.iterrows()}
+            trainer_options = get_trainer_options()
             
             with st.form("insert_class_form"):
                 class_name = st.text_input("Class Name*")
@@ -627,13 +4321,13 @@ def main():
         
         with tab5:
             st.subheader("Add New Booking")
-            members_df = get_members()
-            classes_df = get_classes()
-            
-            member_options = {f"{row['First_Name']} {row['Last_Name']} (ID: {row['Member_ID']})": row['Member_ID'] 
-                            for _, row in members_df.iterrows()}
-            class_options = {f"{row['Class_Name']} - {row['Schedule_Day']} {row['Schedule_Time']}": row['Class_ID'] 
-                           for _, row in classes_df.iterrows()}
+            # Search box lives outside the form so typing refreshes the matches
+            member_search = st.text_input("🔍 Find member (first/last name, email or phone prefix)",
+                                          key="booking_member_search")
+            member_options = search_members(member_search)
+            if len(member_options) == MEMBER_SEARCH_LIMIT:
+                st.caption(f"Showing the first {MEMBER_SEARCH_LIMIT} matches - keep typing to narrow down.")
+            class_options = get_class_options()
             
             with st.form("insert_booking_form"):
                 col1, col2 = st.columns(2)
@@ -643,19 +4337,44 @@ def main():
                 with col2:
                     booking_date = st.date_input("Booking Date*", value=date.today())
                     status = st.selectbox("Attendance Status", ["Booked", "Attended", "Cancelled", "No-Show"])
-                
+                join_waitlist = st.checkbox("Add to the waitlist if the class is full", value=True)
+
                 submitted = st.form_submit_button("Create Booking")
                 if submitted:
                     if member and class_sel:
                         member_id = member_options[member]
                         class_id = class_options[class_sel]
-                        success, message = insert_booking(member_id, class_id, booking_date, status)
+                        success, message = book_class(member_id, class_id, booking_date, status, join_waitlist)
                         if success:
                             st.success(message)
                         else:
                             st.error(message)
                     else:
                         st.error("Please fill in all required fields!")
+
+        with tab6:
+            st.subheader("Bulk Import from CSV / Parquet")
+            st.info("💡 Column headers must match the table's column names. Dates use YYYY-MM-DD.")
+
+            import_table = st.selectbox("Target table*", list(IMPORT_SPECS.keys()), key="import_table")
+            st.caption(f"Expected columns: {', '.join(IMPORT_SPECS[import_table]['columns'])}")
+            uploaded = st.file_uploader("File*", type=["csv", "parquet"], key="import_file")
+            chunk_size = st.number_input("Rows per transaction", min_value=100, max_value=100000,
+                                         value=IMPORT_CHUNK_SIZE, step=1000)
+
+            if st.button("📥 Import", type="primary", disabled=uploaded is None):
+                file_format = 'parquet' if uploaded.name.lower().endswith('.parquet') else 'csv'
+                try:
+                    result = import_records(import_table, uploaded, file_format, int(chunk_size))
+                except ValueError as e:
+                    st.error(f"Error: {str(e)}")
+                else:
+                    st.success(f"✅ Imported {result['inserted']} of {result['read']} rows in {result['seconds']}s "
+                               f"({result['rows_per_sec']} rows/sec)")
+                    if result['rejected']:
+                        st.warning(f"⚠️ {result['rejected']} row(s) rejected")
+                        st.dataframe(pd.DataFrame(result['rejections'][:1000], columns=['Row', 'Reason']),
+                                     use_container_width=True)
     
     # DELETE DATA
     elif menu == "❌ Delete":
@@ -666,10 +4385,8 @@ def main():
         
         with tab1:
             st.subheader("Delete Member Data")
-            members_df = get_members()
-            
-            if not members_df.empty:
-                st.dataframe(members_df, use_container_width=True)
+            if table_has_rows("Members"):
+                render_table_browser("Members", key="del_members")
                 
                 delete_type = st.radio("What to delete?", ["Entire Member Record", "Specific Field Data"], horizontal=True)
                 
@@ -677,7 +4394,7 @@ def main():
                     st.warning("⚠️ This will delete the member and all their memberships and bookings (CASCADE)")
                     member_id = st.number_input("Member ID to delete", min_value=1, step=1)
                     if st.button("🗑️ Delete Entire Member", type="primary"):
-                        success, msg = delete_record("Members", "Member_ID", member_id)
+                        success, msg = delete_record("Members", member_id)
                         if success:
                             st.success(msg)
                             st.rerun()
@@ -690,31 +4407,24 @@ def main():
                     st.caption("Note: Phone will be set to empty. Other fields cannot be cleared as they're required.")
                     
                     if st.button("Clear Field"):
-                        conn = get_connection()
-                        cursor = conn.cursor()
                         try:
                             # For phone, we need a default value since it's UNIQUE NOT NULL
-                            cursor.execute(f"UPDATE Members SET {field} = ? WHERE Member_ID = ?", 
-                                         (f'CLEARED-{member_id}', member_id))
-                            conn.commit()
-                            if cursor.rowcount > 0:
+                            updated = members_repo.clear(member_id, field)
+                        except Exception as e:
+                            st.error(f"Error: {str(e)}")
+                        else:
+                            if updated > 0:
                                 st.success(f"✅ {field} cleared!")
                                 st.rerun()
                             else:
                                 st.error("Member not found!")
-                        except Exception as e:
-                            st.error(f"Error: {str(e)}")
-                        finally:
-                            conn.close()
             else:
                 st.info("No members in database.")
         
         with tab2:
             st.subheader("Delete Trainer Data")
-            trainers_df = get_trainers()
-            
-            if not trainers_df.empty:
-                st.dataframe(trainers_df, use_container_width=True)
+            if table_has_rows("Trainers"):
+                render_table_browser("Trainers", key="del_trainers")
                 
                 delete_type = st.radio("What to delete?", ["Entire Trainer Record", "Specific Field Data"], horizontal=True, key="del_trainer")
                 
@@ -722,7 +4432,7 @@ def main():
                     st.warning("⚠️ Cannot delete if trainer has members or classes assigned (RESTRICT)")
                     trainer_id = st.number_input("Trainer ID to delete", min_value=1, step=1)
                     if st.button("🗑️ Delete Entire Trainer", type="primary"):
-                        success, msg = delete_record("Trainers", "Trainer_ID", trainer_id)
+                        success, msg = delete_record("Trainers", trainer_id)
                         if success:
                             st.success(msg)
                             st.rerun()
@@ -735,30 +4445,23 @@ def main():
                     st.caption("Note: Only non-critical fields can be cleared")
                     
                     if st.button("Clear Field", key="clear_trainer"):
-                        conn = get_connection()
-                        cursor = conn.cursor()
                         try:
-                            cursor.execute(f"UPDATE Trainers SET {field} = ? WHERE Trainer_ID = ?", 
-                                         (f'CLEARED-{trainer_id}', trainer_id))
-                            conn.commit()
-                            if cursor.rowcount > 0:
+                            updated = trainers_repo.clear(trainer_id, field)
+                        except Exception as e:
+                            st.error(f"Error: {str(e)}")
+                        else:
+                            if updated > 0:
                                 st.success(f"✅ {field} cleared!")
                                 st.rerun()
                             else:
                                 st.error("Trainer not found!")
-                        except Exception as e:
-                            st.error(f"Error: {str(e)}")
-                        finally:
-                            conn.close()
             else:
                 st.info("No trainers in database.")
         
         with tab3:
             st.subheader("Delete Class Data")
-            classes_df = get_classes()
-            
-            if not classes_df.empty:
-                st.dataframe(classes_df, use_container_width=True)
+            if table_has_rows("Classes"):
+                render_table_browser("Classes", key="del_classes")
                 
                 delete_type = st.radio("What to delete?", ["Entire Class Record", "Specific Field Data"], horizontal=True, key="del_class")
                 
@@ -766,84 +4469,78 @@ def main():
                     st.warning("⚠️ This will also delete all bookings for this class (CASCADE)")
                     class_id = st.number_input("Class ID to delete", min_value=1, step=1)
                     if st.button("🗑️ Delete Entire Class", type="primary"):
-                        success, msg = delete_record("Classes", "Class_ID", class_id)
+                        success, msg = delete_record("Classes", class_id)
                         if success:
                             st.success(msg)
                             st.rerun()
                         else:
                             st.error(msg)
                 else:
-                    st.info("Clear specific field data (capacity can be reduced)")
+                    st.info("Change specific field data (raising capacity admits members from the waitlist)")
                     class_id = st.number_input("Class ID", min_value=1, step=1, key="cl_id_field")
                     field = st.selectbox("Field to modify", ["Max_Capacity"])
                     
                     if field == "Max_Capacity":
-                        new_value = st.number_input("New Capacity (0 to close class)", min_value=0, value=0)
+                        new_value = st.number_input("New Capacity", min_value=1, value=1)
                         if st.button("Update Capacity", key="update_class_cap"):
-                            conn = get_connection()
-                            cursor = conn.cursor()
                             try:
-                                cursor.execute(f"UPDATE Classes SET {field} = ? WHERE Class_ID = ?", 
-                                             (new_value, class_id))
-                                conn.commit()
-                                if cursor.rowcount > 0:
+                                updated = update_class(class_id, field, new_value)
+                            except Exception as e:
+                                st.error(f"Error: {str(e)}")
+                            else:
+                                if updated > 0:
                                     st.success(f"✅ Capacity updated to {new_value}!")
                                     st.rerun()
                                 else:
                                     st.error("Class not found!")
-                            except Exception as e:
-                                st.error(f"Error: {str(e)}")
-                            finally:
-                                conn.close()
             else:
                 st.info("No classes in database.")
         
         with tab4:
             st.subheader("Delete Booking Data")
-            bookings_df = get_bookings()
-            
-            if not bookings_df.empty:
-                st.dataframe(bookings_df, use_container_width=True)
+            if table_has_rows("Class_Bookings"):
+                render_table_browser("Class_Bookings", key="del_bookings")
                 
-                delete_type = st.radio("What to delete?", ["Entire Booking Record", "Cancel Booking"], horizontal=True, key="del_booking")
+                delete_type = st.radio("What to delete?", ["Entire Booking Record", "Cancel Booking", "Trainer Off Sick"],
+                                       horizontal=True, key="del_booking")
                 
                 if delete_type == "Entire Booking Record":
                     st.warning("⚠️ Permanently remove booking from system")
                     booking_id = st.number_input("Booking ID to delete", min_value=1, step=1)
                     if st.button("🗑️ Delete Entire Booking", type="primary"):
-                        success, msg = delete_record("Class_Bookings", "Booking_ID", booking_id)
+                        success, msg = delete_record("Class_Bookings", booking_id)
                         if success:
                             st.success(msg)
                             st.rerun()
                         else:
                             st.error(msg)
-                else:
-                    st.info("Change booking status to 'Cancelled' instead of deleting")
+                elif delete_type == "Cancel Booking":
+                    st.info("Change booking status to 'Cancelled' instead of deleting; the next waitlisted member gets the seat")
                     booking_id = st.number_input("Booking ID", min_value=1, step=1, key="bk_id_field")
-                    
+
                     if st.button("Cancel Booking", key="cancel_booking"):
-                        conn = get_connection()
-                        cursor = conn.cursor()
-                        try:
-                            cursor.execute("UPDATE Class_Bookings SET Attendance_Status = 'Cancelled' WHERE Booking_ID = ?", 
-                                         (booking_id,))
-                            conn.commit()
-                            if cursor.rowcount > 0:
-                                st.success("✅ Booking cancelled!")
-                                st.rerun()
-                            else:
-                                st.error("Booking not found!")
-                        finally:
-                            conn.close()
+                        success, msg = cancel_booking(booking_id)
+                        if success:
+                            st.success(msg)
+                        else:
+                            st.error(msg)
+                else:
+                    st.info("Cancel every booking for a trainer's classes on one day and clear their waitlists")
+                    trainer_options = get_trainer_options()
+                    trainer = st.selectbox("Trainer*", list(trainer_options.keys()), key="sick_trainer")
+                    sick_date = st.date_input("Date*", value=date.today(), key="sick_date")
+
+                    if st.button("Cancel Trainer's Classes", key="cancel_trainer_day"):
+                        result = cancel_trainer_day(trainer_options[trainer], sick_date)
+                        st.success(f"✅ {result['cancelled']} booking(s) cancelled, "
+                                   f"{result['waitlist_cleared']} waitlist entr(y/ies) cleared")
             else:
                 st.info("No bookings in database.")
         
         with tab5:
             st.subheader("Delete Membership Plan Data")
-            plans_df = get_membership_plans()
-            
-            if not plans_df.empty:
-                st.dataframe(plans_df, use_container_width=True)
+            if table_has_rows("Membership_Plans"):
+                render_table_browser("Membership_Plans", key="del_plans")
                 
                 delete_type = st.radio("What to delete?", ["Entire Plan Record", "Specific Field Data"], horizontal=True, key="del_plan")
                 
@@ -851,7 +4548,7 @@ def main():
                     st.warning("⚠️ Cannot delete if plan is assigned to members (RESTRICT)")
                     plan_id = st.number_input("Plan ID to delete", min_value=1, step=1)
                     if st.button("🗑️ Delete Entire Plan", type="primary"):
-                        success, msg = delete_record("Membership_Plans", "Plan_ID", plan_id)
+                        success, msg = delete_record("Membership_Plans", plan_id)
                         if success:
                             st.success(msg)
                             st.rerun()
@@ -868,21 +4565,16 @@ def main():
                         new_value = st.text_area("New Benefits", value="Plan discontinued")
                     
                     if st.button("Update Field", key="update_plan_field"):
-                        conn = get_connection()
-                        cursor = conn.cursor()
                         try:
-                            cursor.execute(f"UPDATE Membership_Plans SET {field} = ? WHERE Plan_ID = ?", 
-                                         (new_value, plan_id))
-                            conn.commit()
-                            if cursor.rowcount > 0:
+                            updated = plans_repo.update(plan_id, field, new_value)
+                        except Exception as e:
+                            st.error(f"Error: {str(e)}")
+                        else:
+                            if updated > 0:
                                 st.success(f"✅ {field} updated!")
                                 st.rerun()
                             else:
                                 st.error("Plan not found!")
-                        except Exception as e:
-                            st.error(f"Error: {str(e)}")
-                        finally:
-                            conn.close()
             else:
                 st.info("No plans in database.")
     
@@ -896,10 +4588,8 @@ def main():
         # Update Member
         with tab1:
             st.subheader("Update Member")
-            members_df = get_members()
-            
-            if not members_df.empty:
-                st.dataframe(members_df, use_container_width=True)
+            if table_has_rows("Members"):
+                render_table_browser("Members", key="upd_members")
                 
                 with st.form("update_member_form"):
                     st.markdown("**Step 1: Select Member**")
@@ -916,30 +4606,24 @@ def main():
                     
                     submitted = st.form_submit_button("✅ Update Member", type="primary")
                     if submitted and new_value:
-                        conn = get_connection()
-                        cursor = conn.cursor()
                         try:
-                            cursor.execute(f'UPDATE Members SET {field} = ? WHERE Member_ID = ?', (new_value, member_id))
-                            conn.commit()
-                            if cursor.rowcount > 0:
+                            updated = members_repo.update(member_id, field, new_value)
+                        except sqlite3.IntegrityError:
+                            st.error("Error: This value already exists (must be unique)!")
+                        else:
+                            if updated > 0:
                                 st.success(f"✅ Member {field} updated!")
                                 st.rerun()
                             else:
                                 st.error("Member not found!")
-                        except sqlite3.IntegrityError:
-                            st.error("Error: This value already exists (must be unique)!")
-                        finally:
-                            conn.close()
             else:
                 st.info("No members in database.")
         
         # Update Trainer
         with tab2:
             st.subheader("Update Trainer")
-            trainers_df = get_trainers()
-            
-            if not trainers_df.empty:
-                st.dataframe(trainers_df, use_container_width=True)
+            if table_has_rows("Trainers"):
+                render_table_browser("Trainers", key="upd_trainers")
                 
                 with st.form("update_trainer_form"):
                     st.markdown("**Step 1: Select Trainer**")
@@ -956,20 +4640,16 @@ def main():
                     
                     submitted = st.form_submit_button("✅ Update Trainer", type="primary")
                     if submitted and new_value:
-                        conn = get_connection()
-                        cursor = conn.cursor()
                         try:
-                            cursor.execute(f'UPDATE Trainers SET {field} = ? WHERE Trainer_ID = ?', (new_value, trainer_id))
-                            conn.commit()
-                            if cursor.rowcount > 0:
+                            updated = trainers_repo.update(trainer_id, field, new_value)
+                        except sqlite3.IntegrityError:
+                            st.error("Error: This value already exists (must be unique)!")
+                        else:
+                            if updated > 0:
                                 st.success(f"✅ Trainer {field} updated!")
                                 st.rerun()
                             else:
                                 st.error("Trainer not found!")
-                        except sqlite3.IntegrityError:
-                            st.error("Error: This value already exists (must be unique)!")
-                        finally:
-                            conn.close()
             else:
                 st.info("No trainers in database.")
         
@@ -979,7 +4659,7 @@ def main():
             plans_df = get_membership_plans()
             
             if not plans_df.empty:
-                st.dataframe(plans_df, use_container_width=True)
+                render_table_browser("Membership_Plans", key="upd_plans")
                 
                 with st.form("update_plan_form"):
                     st.markdown("**Step 1: Select Plan**")
@@ -988,9 +4668,9 @@ def main():
                     if selection_method == "Plan ID":
                         plan_id = st.number_input("Plan ID*", min_value=1, step=1)
                     else:
-                        name_list = plans_df['Plan_Name'].tolist()
-                        selected_name = st.selectbox("Select Plan Name*", name_list)
-                        plan_id = plans_df[plans_df['Plan_Name'] == selected_name]['Plan_ID'].values[0]
+                        plan_names = build_options(plans_df, plans_df['Plan_Name'], 'Plan_ID')
+                        selected_name = st.selectbox("Select Plan Name*", list(plan_names.keys()))
+                        plan_id = plan_names[selected_name]
                     
                     st.markdown("**Step 2: Choose Field to Update**")
                     field = st.selectbox("Field*", ['Plan_Name', 'Duration_Months', 'Price', 'Benefits_Description'])
@@ -1005,20 +4685,16 @@ def main():
                     
                     submitted = st.form_submit_button("✅ Update Plan", type="primary")
                     if submitted and new_value:
-                        conn = get_connection()
-                        cursor = conn.cursor()
                         try:
-                            cursor.execute(f'UPDATE Membership_Plans SET {field} = ? WHERE Plan_ID = ?', (new_value, plan_id))
-                            conn.commit()
-                            if cursor.rowcount > 0:
+                            updated = plans_repo.update(plan_id, field, new_value)
+                        except Exception as e:
+                            st.error(f"Error: {str(e)}")
+                        else:
+                            if updated > 0:
                                 st.success(f"✅ Plan {field} updated!")
                                 st.rerun()
                             else:
                                 st.error("Plan not found!")
-                        except Exception as e:
-                            st.error(f"Error: {str(e)}")
-                        finally:
-                            conn.close()
             else:
                 st.info("No plans in database.")
         
@@ -1028,7 +4704,7 @@ def main():
             classes_df = get_classes()
             
             if not classes_df.empty:
-                st.dataframe(classes_df, use_container_width=True)
+                render_table_browser("Classes", key="upd_classes")
                 
                 with st.form("update_class_form"):
                     st.markdown("**Step 1: Select Class**")
@@ -1037,9 +4713,9 @@ def main():
                     if selection_method == "Class ID":
                         class_id = st.number_input("Class ID*", min_value=1, step=1)
                     else:
-                        name_list = classes_df['Class_Name'].tolist()
-                        selected_name = st.selectbox("Select Class Name*", name_list)
-                        class_id = classes_df[classes_df['Class_Name'] == selected_name]['Class_ID'].values[0]
+                        class_names = build_options(classes_df, classes_df['Class_Name'], 'Class_ID')
+                        selected_name = st.selectbox("Select Class Name*", list(class_names.keys()))
+                        class_id = class_names[selected_name]
                     
                     st.markdown("**Step 2: Choose Field to Update**")
                     field = st.selectbox("Field*", ['Class_Name', 'Schedule_Day', 'Schedule_Time', 'Duration_Minutes', 'Max_Capacity'])
@@ -1057,30 +4733,26 @@ def main():
                     
                     submitted = st.form_submit_button("✅ Update Class", type="primary")
                     if submitted and new_value:
-                        conn = get_connection()
-                        cursor = conn.cursor()
                         try:
-                            cursor.execute(f'UPDATE Classes SET {field} = ? WHERE Class_ID = ?', (new_value, class_id))
-                            conn.commit()
-                            if cursor.rowcount > 0:
+                            updated = update_class(class_id, field, new_value)
+                        except sqlite3.IntegrityError:
+                            st.error("Error: Class name must be unique!")
+                        except TrainerConflictError as e:
+                            st.error(f"Error: {str(e)}")
+                        else:
+                            if updated > 0:
                                 st.success(f"✅ Class {field} updated!")
                                 st.rerun()
                             else:
                                 st.error("Class not found!")
-                        except sqlite3.IntegrityError:
-                            st.error("Error: Class name must be unique!")
-                        finally:
-                            conn.close()
             else:
                 st.info("No classes in database.")
         
         # Update Booking
         with tab5:
             st.subheader("Update Booking")
-            bookings_df = get_bookings()
-            
-            if not bookings_df.empty:
-                st.dataframe(bookings_df, use_container_width=True)
+            if table_has_rows("Class_Bookings"):
+                render_table_browser("Class_Bookings", key="upd_bookings")
                 
                 with st.form("update_booking_form"):
                     st.markdown("**Step 1: Select Booking**")
@@ -1094,18 +4766,11 @@ def main():
                     
                     submitted = st.form_submit_button("✅ Update Booking", type="primary")
                     if submitted:
-                        conn = get_connection()
-                        cursor = conn.cursor()
-                        try:
-                            cursor.execute(f'UPDATE Class_Bookings SET {field} = ? WHERE Booking_ID = ?', (new_value, booking_id))
-                            conn.commit()
-                            if cursor.rowcount > 0:
-                                st.success(f"✅ Booking updated!")
-                                st.rerun()
-                            else:
-                                st.error("Booking not found!")
-                        finally:
-                            conn.close()
+                        success, msg = update_booking_status(booking_id, new_value)
+                        if success:
+                            st.success(msg)
+                        else:
+                            st.error(msg)
             else:
                 st.info("No bookings in database.")
     
@@ -1113,11 +4778,12 @@ def main():
     elif menu == "🔍 JOIN":
         st.header("JOIN Query Results")
         
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
             "👥 Members & Memberships", 
             "📅 Class Schedule", 
             "🎫 Member Bookings", 
             "📊 Trainer Workload",
+            "📈 Class Utilization",
             "🔧 Custom JOIN"
         ])
         
@@ -1144,12 +4810,24 @@ def main():
         
         with tab4:
             st.subheader("Trainer Workload Analysis")
-            st.markdown("**JOIN: Trainers ⟕ Classes (LEFT JOIN with GROUP BY)**")
+            st.markdown("**JOIN: Trainers ⋈ Trainer_Workload (summary kept up to date by triggers)**")
             df = get_trainer_workload_join()
             st.dataframe(df, use_container_width=True)
             st.info(f"Total Trainers: {len(df)}")
-        
+
         with tab5:
+            st.subheader("Weekly Class Utilization")
+            st.markdown("**JOIN: Classes ⋈ Trainers ⟕ Class_Weekly_Utilization**")
+            day = st.date_input("Week containing", value=date.today(), key="utilization_week")
+            st.caption(f"Week starting Monday {week_start(day).isoformat()}")
+            df = get_class_utilization(day)
+            st.dataframe(df, use_container_width=True)
+            booked = int(df['Bookings'].sum())
+            capacity = int(df['Max_Capacity'].sum())
+            st.info(f"Total Bookings: {booked} of {capacity} seats "
+                    f"({round(100 * booked / capacity, 1) if capacity else 0}%)")
+
+        with tab6:
             st.subheader("🔧 Custom JOIN Builder")
             st.info("💡 Select tables you want to join and we'll show the combined data")
             
@@ -1176,95 +4854,21 @@ def main():
             with col2:
                 if len(selected_tables) >= 2:
                     st.markdown("**JOIN Type:**")
-                    join_type = st.radio("Type", ["INNER JOIN", "LEFT JOIN"], horizontal=True)
+                    join_type = st.radio("Type", list(JOIN_TYPES), horizontal=True)
                 else:
                     st.warning("⚠️ Select at least 2 tables to join")
             
             if st.button("🔍 Execute JOIN Query", type="primary") and len(selected_tables) >= 2:
                 try:
-                    conn = get_connection()
-                    
-                    # Build query based on selected tables
                     table_names = [available_tables[t] for t in selected_tables]
-                    
-                    # Smart JOIN logic based on common patterns
-                    if "Members" in table_names and "Member_Memberships" in table_names:
-                        if "Membership_Plans" in table_names:
-                            # Members + Memberships + Plans
-                            query = f'''
-                            SELECT m.*, mm.Start_Date, mm.End_Date, mm.Payment_Status, 
-                                   mp.Plan_Name, mp.Price
-                            FROM Members m
-                            {join_type} Member_Memberships mm ON m.Member_ID = mm.Member_ID
-                            {join_type} Membership_Plans mp ON mm.Plan_ID = mp.Plan_ID
-                            '''
-                        else:
-                            # Members + Memberships
-                            query = f'''
-                            SELECT m.*, mm.Start_Date, mm.End_Date, mm.Payment_Status, mm.Is_Active
-                            FROM Members m
-                            {join_type} Member_Memberships mm ON m.Member_ID = mm.Member_ID
-                            '''
-                    
-                    elif "Classes" in table_names and "Trainers" in table_names:
-                        if "Class_Bookings" in table_names:
-                            # Classes + Trainers + Bookings
-                            query = f'''
-                            SELECT c.Class_Name, c.Schedule_Day, c.Schedule_Time,
-                                   t.First_Name || ' ' || t.Last_Name AS Trainer,
-                                   cb.Booking_Date, cb.Attendance_Status
-                            FROM Classes c
-                            {join_type} Trainers t ON c.Trainer_ID = t.Trainer_ID
-                            {join_type} Class_Bookings cb ON c.Class_ID = cb.Class_ID
-                            '''
-                        else:
-                            # Classes + Trainers
-                            query = f'''
-                            SELECT c.*, t.First_Name || ' ' || t.Last_Name AS Trainer_Name,
-                                   t.Specialization
-                            FROM Classes c
-                            {join_type} Trainers t ON c.Trainer_ID = t.Trainer_ID
-                            '''
-                    
-                    elif "Members" in table_names and "Class_Bookings" in table_names:
-                        if "Classes" in table_names:
-                            # Members + Bookings + Classes
-                            query = f'''
-                            SELECT m.First_Name || ' ' || m.Last_Name AS Member,
-                                   c.Class_Name, c.Schedule_Day, c.Schedule_Time,
-                                   cb.Booking_Date, cb.Attendance_Status
-                            FROM Members m
-                            {join_type} Class_Bookings cb ON m.Member_ID = cb.Member_ID
-                            {join_type} Classes c ON cb.Class_ID = c.Class_ID
-                            '''
-                        else:
-                            # Members + Bookings
-                            query = f'''
-                            SELECT m.*, cb.Booking_Date, cb.Attendance_Status
-                            FROM Members m
-                            {join_type} Class_Bookings cb ON m.Member_ID = cb.Member_ID
-                            '''
-                    
-                    elif "Trainers" in table_names and "Classes" in table_names:
-                        # Trainers + Classes
-                        query = f'''
-                        SELECT t.First_Name || ' ' || t.Last_Name AS Trainer,
-                               t.Specialization,
-                               c.Class_Name, c.Schedule_Day, c.Schedule_Time
-                        FROM Trainers t
-                        {join_type} Classes c ON t.Trainer_ID = c.Trainer_ID
-                        '''
-                    
-                    else:
-                        # Generic JOIN for other combinations
-                        query = f"SELECT * FROM {table_names[0]}"
+                    query, joined = build_custom_join(table_names, join_type)
+                    if not joined:
                         st.info("⚠️ This combination requires manual JOIN conditions. Showing first table only.")
                     
                     st.markdown(f"**Executing Query:**")
                     st.code(query, language="sql")
                     
-                    df = pd.read_sql_query(query, conn)
-                    conn.close()
+                    df = run_query(query)
                     
                     st.success(f"✅ JOIN executed successfully! Found {len(df)} records")
                     st.dataframe(df, use_container_width=True)
@@ -1292,53 +4896,453 @@ def main():
     elif menu == "📊 View Tables":
         st.header("View All Tables")
         
-        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-            "👤 Members", 
-            "📋 Membership Plans", 
+        tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+            "👤 Members",
+            "📋 Membership Plans",
             "🔗 Member Memberships",
-            "🏋️ Trainers", 
-            "📅 Classes", 
-            "🎫 Bookings"
+            "🏋️ Trainers",
+            "📅 Classes",
+            "🎫 Bookings",
+            "⬇️ Export"
         ])
         
         with tab1:
             st.subheader("Members Table")
-            df = get_members()
-            st.dataframe(df, use_container_width=True)
-            st.info(f"Total Members: {len(df)}")
+            total = render_table_browser("Members", key="view_members")
+            st.info(f"Total Members: {total}")
         
         with tab2:
             st.subheader("Membership Plans Table")
-            df = get_membership_plans()
-            st.dataframe(df, use_container_width=True)
-            st.info(f"Total Plans: {len(df)}")
+            total = render_table_browser("Membership_Plans", key="view_plans")
+            st.info(f"Total Plans: {total}")
         
         with tab3:
             st.subheader("Member Memberships Table")
-            df = get_all_records('Member_Memberships')
-            st.dataframe(df, use_container_width=True)
-            st.info(f"Total Membership Records: {len(df)}")
+            total = render_table_browser("Member_Memberships", key="view_memberships")
+            st.info(f"Total Membership Records: {total}")
         
         with tab4:
             st.subheader("Trainers Table")
-            df = get_trainers()
-            st.dataframe(df, use_container_width=True)
-            st.info(f"Total Trainers: {len(df)}")
+            total = render_table_browser("Trainers", key="view_trainers")
+            st.info(f"Total Trainers: {total}")
         
         with tab5:
             st.subheader("Classes Table")
-            df = get_classes()
-            st.dataframe(df, use_container_width=True)
-            st.info(f"Total Classes: {len(df)}")
+            total = render_table_browser("Classes", key="view_classes")
+            st.info(f"Total Classes: {total}")
         
         with tab6:
             st.subheader("Class Bookings Table")
-            df = get_bookings()
-            st.dataframe(df, use_container_width=True)
-            st.info(f"Total Bookings: {len(df)}")
+            total = render_table_browser("Class_Bookings", key="view_bookings")
+            st.info(f"Total Bookings: {total}")
+
+            st.subheader("Waitlist")
+            total = render_table_browser("Waitlist", key="view_waitlist")
+            st.info(f"Members Waiting: {total}")
+
+        with tab7:
+            st.subheader("Export Table or Report")
+            col1, col2 = st.columns(2)
+            with col1:
+                export_source = st.selectbox("Source*", list(EXPORT_SOURCES.keys()), key="export_source")
+            with col2:
+                export_format = st.selectbox("Format*", EXPORT_FORMATS, key="export_format")
+
+            if st.button("📦 Prepare Export", type="primary"):
+                file_name = f"{export_source.replace(' & ', '_').replace(' ', '_').lower()}.{export_format}"
+                path = os.path.join(tempfile.mkdtemp(prefix='gym_export_'), file_name)
+                try:
+                    result = export_records(export_source, path, export_format)
+                except ValueError as e:
+                    st.error(f"Error: {str(e)}")
+                else:
+                    st.session_state['export_result'] = result
+
+            result = st.session_state.get('export_result')
+            if result and os.path.exists(result['path']):
+                st.success(f"✅ {result['rows']} rows from {result['source']} written in {result['seconds']}s")
+                with open(result['path'], 'rb') as f:
+                    st.download_button("⬇️ Download", f, file_name=os.path.basename(result['path']))
+
+    # ANALYTICS
+    elif menu == "📈 Analytics":
+        st.header("Revenue & Churn Analytics")
+        analytics = get_membership_analytics()
+        monthly = analytics['monthly']
+
+        if monthly['Active_Members'].sum() == 0:
+            st.info("No memberships recorded yet")
+        else:
+            latest = monthly.iloc[-1]
+            previous = monthly.iloc[-2] if len(monthly) > 1 else latest
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("MRR", f"${latest['MRR']:,.2f}", f"{latest['MRR'] - previous['MRR']:,.2f}")
+            with col2:
+                st.metric("Active Members", int(latest['Active_Members']))
+            with col3:
+                st.metric(f"Churn ({previous['Month']})", f"{previous['Churn_Rate_Pct']}%")
+            with col4:
+                st.metric(f"Renewal Rate ({previous['Month']})", f"{previous['Renewal_Rate_Pct']}%")
+
+            recent = monthly.tail(ANALYTICS_CHART_MONTHS).set_index('Month')
+            st.subheader("Monthly Recurring Revenue")
+            st.line_chart(recent[['MRR', 'Pending_MRR']])
+            st.subheader("New Members vs Churned")
+            st.bar_chart(recent[['New_Members', 'Churned']])
+            st.dataframe(monthly.iloc[::-1], use_container_width=True)
+
+            st.subheader("Churn by Join Cohort")
+            st.dataframe(analytics['cohorts'].iloc[::-1], use_container_width=True)
+            st.subheader("Revenue and Renewals by Plan")
+            st.dataframe(analytics['plans'], use_container_width=True)
+
+        st.caption(f"Computed once per day from Member_Memberships. A membership followed by another "
+                   f"within {RENEWAL_GRACE_DAYS} days of its End_Date counts as renewed.")
+        if st.button("🔄 Recompute Now"):
+            _cached_membership_analytics.clear()
+            st.rerun()
+
+    # RETENTION
+    elif menu == "🔁 Retention":
+        st.header("Cohort Retention")
+        retention = get_cohort_retention()
+
+        if retention.empty:
+            st.info("No members recorded yet")
+        else:
+            cohorts = retention['Cohort'].drop_duplicates()
+            recent = retention[retention['Cohort'].isin(cohorts.tail(RETENTION_CHART_MONTHS))
+                               & (retention['Months_Since_Join'] < RETENTION_CHART_MONTHS)]
+            heatmap = alt.Chart(recent).mark_rect().encode(
+                x=alt.X('Months_Since_Join:O', title="Months since joining"),
+                y=alt.Y('Cohort:O', title="Join month"),
+                color=alt.Color('Retention_Pct:Q', title="Retention %", scale=alt.Scale(scheme='blues')),
+                tooltip=['Cohort', 'Months_Since_Join', 'Cohort_Size', 'Active_Members', 'Retention_Pct'],
+            )
+            st.altair_chart(heatmap, use_container_width=True)
+
+            st.subheader("Retention % by Join Month")
+            matrix = retention.pivot(index='Cohort', columns='Months_Since_Join', values='Retention_Pct')
+            matrix.insert(0, 'Members', retention.groupby('Cohort')['Cohort_Size'].first())
+            st.dataframe(matrix.iloc[::-1], use_container_width=True)
+
+        st.caption("Share of each join-month cohort with at least one attended class in each month "
+                   "since joining. Only the newest month is recounted on the daily refresh.")
+        if st.button("🔄 Recount All Months"):
+            refresh_cohort_retention(full=True)
+            _cached_cohort_retention.clear()
+            st.rerun()
+
+    # PERFORMANCE
+    elif menu == "⚙️ Performance":
+        st.header("Query Performance")
+        query_stats = get_query_stats()
+        summary = query_stats.summary()
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Statements Seen", len(summary))
+        with col2:
+            st.metric("Queries Run", sum(row['Calls'] for row in summary))
+        with col3:
+            st.metric("Slow Queries Logged", len(query_stats.slow))
+        st.caption(f"Since {query_stats.since:%Y-%m-%d %H:%M:%S}. Percentiles cover the last "
+                   f"{query_stats.window} runs of each statement; anything over "
+                   f"{CONFIG['slow_query_ms']}ms is logged with its query plan.")
+
+        st.subheader("Statements by Total Time")
+        if summary:
+            st.dataframe(pd.DataFrame(summary), use_container_width=True)
+        else:
+            st.info("No queries recorded yet")
+
+        st.subheader("Slow Queries")
+        if not query_stats.slow:
+            st.info("No slow queries recorded")
+        for slow_query in reversed(list(query_stats.slow)):
+            with st.expander(f"{slow_query['at']} - {slow_query['ms']}ms, {slow_query['rows']} rows "
+                             f"from {slow_query['caller']}"):
+                st.code(slow_query['statement'], language="sql")
+                if slow_query['plan']:
+                    st.code('\n'.join(slow_query['plan']))
+
+        if st.button("🔄 Reset Statistics"):
+            query_stats.reset()
+            st.rerun()
     
     st.markdown("---")
     st.markdown("**CMPE 351 - Database Systems Project** | Nehir Gürsoy 122200051")
 
+    stats_after = connection_stats()
+    st.sidebar.caption(f"🔌 DB connections opened this rerun: {stats_after['opened'] - stats_before['opened']} "
+                       f"(checkouts: {stats_after['checkouts'] - stats_before['checkouts']})")
+
+# COMMAND LINE
+
+def cmd_bench_concurrency(args):
+    for tuned in (False, True):
+        result = benchmark_concurrent_bookings(args.threads, args.bookings, tuned=tuned)
+        print(f"{result['mode']:>8}: {result['bookings']} bookings from {result['threads']} desks in "
+              f"{result['seconds']}s ({result['bookings_per_sec']}/s, {result['errors']} lock errors)")
+    return 0
+
+def cmd_bench_waitlist(args):
+    result = benchmark_waitlist_promotion(args.queued, args.cancellations, args.capacity, args.bulk)
+    print(f"{result['cancellations']} cancellations against {result['queued']} queued: "
+          f"p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms, max {result['max_ms']}ms "
+          f"({result['promoted']} promoted)")
+    print(f"bulk: {result['bulk_cancelled']} cancelled, {result['bulk_promoted']} promoted in {result['bulk_ms']}ms")
+    return 0
+
+def cmd_bench_status(args):
+    for row in benchmark_membership_status(tuple(args.sizes), args.repeat):
+        print(f"{row['ids']:>6} ids: COUNT(*) loop {row['count_loop_ms']}ms, EXISTS loop {row['exists_loop_ms']}ms, "
+              f"batch {row['batch_ms']}ms{'' if row['agree'] else '  (RESULTS DIFFER)'}")
+    return 0
+
+def cmd_bench_checkin(args):
+    result = benchmark_check_in(args.members, args.check_ins)
+    print(f"index of {result['members']} members built in {result['build_ms']}ms")
+    print(f"{result['check_ins']} check-ins: p50 {result['p50_us']}us, p99 {result['p99_us']}us, "
+          f"{result['per_sec']}/s ({result['admitted']} admitted, {result['logged']} logged in {result['flushes']} flushes)")
+    return 0
+
+def cmd_bench_queries(args):
+    for row in benchmark_hot_queries(args.repeat):
+        print(f"{row['query']:<45} p50 {row['p50_us']:>8}us  p95 {row['p95_us']:>8}us  ({row['rows']} rows)")
+    return 0
+
+def cmd_generate_data(args):
+    run_migrations()
+    rows = dict(item.split('=', 1) for item in args.rows or [])
+    with get_connection() as conn:
+        inserted = generate_synthetic_data(conn, args.scale, args.seed, rows)
+    for table, count in inserted.items():
+        print(f"{table}: {count} row(s) inserted")
+    return 0
+
+def cmd_bench_functions(args):
+    report = benchmark_public_functions(tuple(args.scales), args.seed, args.repeat, args.out)
+    for entry in report['scales']:
+        print(f"scale {entry['scale']}: {entry['rows']['Members']} members, "
+              f"{entry['rows']['Class_Bookings']} bookings (generated in {entry['generate_seconds']}s)")
+        for name, timing in entry['functions'].items():
+            failed = f"  ({timing['failed']} failed)" if timing['failed'] else ''
+            print(f"  {name:<45} best {timing['best_ms']:>10}ms  median {timing['median_ms']:>10}ms{failed}")
+    if args.out:
+        print(f"Report written to {args.out}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_benchmark_reports(json.load(f), report, args.threshold)
+        for scale, name, before, after, ratio in regressions:
+            print(f"REGRESSION scale {scale} {name}: {before}ms -> {after}ms ({ratio}x)")
+        return 1 if regressions else 0
+    return 0
+
+def cmd_bench_analytics(args):
+    result = benchmark_analytics(args.memberships, args.seed)
+    print(f"{result['memberships']} memberships of {result['members']} members over {result['months']} months: "
+          f"loaded in {result['load_seconds']}s ({result['ledger_mb']} MB), "
+          f"analysed in {result['compute_seconds']}s")
+    return 0
+
+def cmd_migrate(args):
+    applied = run_migrations()
+    for version, description in applied:
+        print(f"Applied {version}: {description}")
+    if args.seed:
+        insert_sample_data()
+    print(f"Schema version {get_schema_version()} ({len(applied)} migration(s) applied)")
+    return 0
+
+def cmd_import(args):
+    file_format = args.format or ('parquet' if args.file.lower().endswith('.parquet') else 'csv')
+    run_migrations()
+    result = import_records(args.table, args.file, file_format, args.chunk_size)
+    print(f"{result['table']}: {result['inserted']} inserted, {result['rejected']} rejected, "
+          f"{result['read']} read in {result['seconds']}s ({result['rows_per_sec']} rows/sec)")
+    for row, reason in result['rejections'][:20]:
+        print(f"  row {row}: {reason}")
+    if result['rejected'] > 20:
+        print(f"  ... {result['rejected'] - 20} more")
+    if args.rejects:
+        pd.DataFrame(result['rejections'], columns=['Row', 'Reason']).to_csv(args.rejects, index=False)
+    return 0 if not result['rejected'] else 2
+
+def cmd_export(args):
+    file_format = args.format or os.path.splitext(args.out)[1].lstrip('.').lower() or 'csv'
+    result = export_records(args.source, args.out, file_format, args.chunk_size)
+    print(f"{result['source']}: {result['rows']} rows written to {result['path']} in {result['seconds']}s")
+    return 0
+
+def cmd_expire_memberships(args):
+    run_migrations()
+    while True:
+        expire_memberships(args.today, args.batch_size, args.full)
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+def cmd_sync_sessions(args):
+    run_migrations()
+    while True:
+        sync_class_sessions(args.today, args.full)
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+def cmd_cohort_retention(args):
+    run_migrations()
+    result = refresh_cohort_retention(args.today, args.full)
+    print(f"{result['cells']} cohort/month cell(s) recounted from {result['since'] or 'the start'} "
+          f"to {result['until']} in {result['seconds']}s")
+    return 0
+
+def cmd_changes(args):
+    if args.prune:
+        print(f"Pruned {prune_consumed_changes(min_entries=1)} change log entr(y/ies) read by every consumer")
+        return 0
+    if args.prune_before:
+        print(f"Pruned {prune_change_log(args.prune_before)} change log entr(y/ies)")
+        return 0
+    shown = 0
+    for seq, table_name, row_id, op in changes_since(args.since, args.table or None):
+        print(f"{seq}\t{op}\t{table_name}\t{row_id}")
+        shown += 1
+        if args.limit and shown >= args.limit:
+            break
+    return 0
+
+def cmd_audit_timetable(args):
+    run_migrations()
+    conflicts = audit_trainer_conflicts()
+    for row in conflicts.itertuples():
+        print(f"Trainer {row.Trainer_ID} ({row.Trainer_Name}): #{row.Class_ID} {row.Class_Name} [{row.Slot}] "
+              f"overlaps #{row.Other_Class_ID} {row.Other_Class_Name} [{row.Other_Slot}]")
+    print(f"{len(conflicts)} overlapping pair(s)")
+    return 1 if len(conflicts) else 0
+
+def cmd_check_indexes(args):
+    run_migrations()
+    failures = 0
+    for name, ok, plan in check_query_plans():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+        for line in plan:
+            print(f"       {line}")
+        failures += not ok
+    return 1 if failures else 0
+
+def cli(argv):
+    parser = argparse.ArgumentParser(description="Gym Management System maintenance commands")
+    parser.add_argument('--db', help="Database path (overrides GYM_DB_PATH / config file)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    bench = commands.add_parser('bench-concurrency', help="Concurrent booking inserts, default vs tuned pragmas")
+    bench.add_argument('--threads', type=int, default=8)
+    bench.add_argument('--bookings', type=int, default=200, help="Bookings per thread")
+    bench.set_defaults(func=cmd_bench_concurrency)
+
+    bench_wait = commands.add_parser('bench-waitlist', help="Cancel-and-promote latency with a long waitlist")
+    bench_wait.add_argument('--queued', type=int, default=5000, help="Members waiting for the session")
+    bench_wait.add_argument('--cancellations', type=int, default=200, help="Single cancellations to time")
+    bench_wait.add_argument('--capacity', type=int, default=20)
+    bench_wait.add_argument('--bulk', type=int, default=100, help="Bookings in the bulk cancellation")
+    bench_wait.set_defaults(func=cmd_bench_waitlist)
+
+    bench_status = commands.add_parser('bench-status', help="Membership status: per-member queries vs batch lookup")
+    bench_status.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10000], help="Numbers of IDs to look up")
+    bench_status.add_argument('--repeat', type=int, default=5, help="Runs per measurement (best is kept)")
+    bench_status.set_defaults(func=cmd_bench_status)
+
+    bench_checkin = commands.add_parser('bench-checkin', help="In-memory check-in admission latency")
+    bench_checkin.add_argument('--members', type=int, default=10000)
+    bench_checkin.add_argument('--check-ins', type=int, default=20000)
+    bench_checkin.set_defaults(func=cmd_bench_checkin)
+
+    bench_queries = commands.add_parser('bench-queries', help="Latency of repository lookups and hot queries")
+    bench_queries.add_argument('--repeat', type=int, default=200, help="Runs per statement")
+    bench_queries.set_defaults(func=cmd_bench_queries)
+
+    generate = commands.add_parser('generate-data', help="Append seeded synthetic members, classes and bookings")
+    generate.add_argument('--scale', type=float, default=0.01,
+                          help="Fraction of the production size (1.0 = 200k members / 5M bookings)")
+    generate.add_argument('--seed', type=int, default=42)
+    generate.add_argument('--rows', nargs='+', metavar='TABLE=N', help="Override the row count of single tables")
+    generate.set_defaults(func=cmd_generate_data)
+
+    bench_functions = commands.add_parser('bench-functions', help="Time public functions on synthetic data at several scales")
+    bench_functions.add_argument('--scales', type=float, nargs='+', default=list(BENCHMARK_SCALES))
+    bench_functions.add_argument('--seed', type=int, default=42)
+    bench_functions.add_argument('--repeat', type=int, default=3, help="Calls per function")
+    bench_functions.add_argument('--out', help="Write the JSON report here")
+    bench_functions.add_argument('--baseline', help="Earlier JSON report; exit 1 if anything got slower")
+    bench_functions.add_argument('--threshold', type=float, default=1.25, help="Slowdown ratio counted as a regression")
+    bench_functions.set_defaults(func=cmd_bench_functions)
+
+    bench_analytics = commands.add_parser('bench-analytics', help="Revenue/churn analytics over synthetic memberships")
+    bench_analytics.add_argument('--memberships', type=int, default=1000000)
+    bench_analytics.add_argument('--seed', type=int, default=42)
+    bench_analytics.set_defaults(func=cmd_bench_analytics)
+
+    migrate = commands.add_parser('migrate', help="Apply pending schema migrations")
+    migrate.add_argument('--seed', action='store_true', help="Also insert sample data into an empty database")
+    migrate.set_defaults(func=cmd_migrate)
+
+    importer = commands.add_parser('import', help="Bulk import a CSV/Parquet file into a table")
+    importer.add_argument('table', choices=list(IMPORT_SPECS.keys()))
+    importer.add_argument('file')
+    importer.add_argument('--format', choices=['csv', 'parquet'], help="Default: from the file extension")
+    importer.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help="Rows per transaction")
+    importer.add_argument('--rejects', help="Write rejected rows (row, reason) to this CSV")
+    importer.set_defaults(func=cmd_import)
+
+    exporter = commands.add_parser('export', help="Stream a table or JOIN report to CSV/JSONL/Parquet")
+    exporter.add_argument('source', choices=list(EXPORT_SOURCES.keys()))
+    exporter.add_argument('out')
+    exporter.add_argument('--format', choices=EXPORT_FORMATS, help="Default: from the output file extension")
+    exporter.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help="Rows fetched per chunk")
+    exporter.set_defaults(func=cmd_export)
+
+    expire = commands.add_parser('expire-memberships', help="Deactivate memberships past their End_Date (cron job)")
+    expire.add_argument('--today', help="Treat this YYYY-MM-DD as today (default: the real date)")
+    expire.add_argument('--batch-size', type=int, default=EXPIRY_BATCH_SIZE, help="Rows updated per transaction")
+    expire.add_argument('--full', action='store_true', help="Ignore the watermark and scan every End_Date")
+    expire.add_argument('--every', type=int, help="Keep running, repeating every N seconds")
+    expire.set_defaults(func=cmd_expire_memberships)
+
+    sessions = commands.add_parser('sync-sessions', help="Extend Class_Sessions over the booking window (daily job)")
+    sessions.add_argument('--today', help="Treat this YYYY-MM-DD as today (default: the real date)")
+    sessions.add_argument('--full', action='store_true', help="Regenerate every session from today on")
+    sessions.add_argument('--every', type=int, help="Keep running, repeating every N seconds")
+    sessions.set_defaults(func=cmd_sync_sessions)
+
+    retention = commands.add_parser('cohort-retention', help="Recount the cohort retention matrix (daily job)")
+    retention.add_argument('--today', help="Treat this YYYY-MM-DD as today (default: the real date)")
+    retention.add_argument('--full', action='store_true', help="Recount every month, not just the newest")
+    retention.set_defaults(func=cmd_cohort_retention)
+
+    changes = commands.add_parser('changes', help="Print change log entries after a sequence number")
+    changes.add_argument('--since', type=int, default=0, help="Last Seq already processed")
+    changes.add_argument('--table', action='append', help="Only this table (repeatable)")
+    changes.add_argument('--limit', type=int, help="Stop after this many entries")
+    changes.add_argument('--prune-before', type=int, help="Delete entries with Seq below this instead")
+    changes.add_argument('--prune', action='store_true', help="Delete the entries every consumer has read instead")
+    changes.set_defaults(func=cmd_changes)
+
+    audit = commands.add_parser('audit-timetable', help="Report every pair of classes that double-books a trainer")
+    audit.set_defaults(func=cmd_audit_timetable)
+
+    check = commands.add_parser('check-indexes', help="Assert every hot query uses its index (EXPLAIN QUERY PLAN)")
+    check.set_defaults(func=cmd_check_indexes)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    configure(db_path=args.db)
+    return args.func(args)
+
 if __name__ == "__main__":
+    from streamlit import runtime
+    if len(sys.argv) > 1 and not runtime.exists():
+        sys.exit(cli(sys.argv[1:]))
     main()
\ No newline at end of file